@@ -0,0 +1,179 @@
+from typing import Any, Dict, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import os
+import logging
+
+import numpy as np
+
+import analytics_warehouse
+import usage_events
+
+logger = logging.getLogger(__name__)
+
+# Weekly cohorts of residents by the week (Monday, UTC) they were first seen.
+# A resident is the tracker's persistent visitor_id, falling back to the
+# session for events recorded before visitor ids existed. For each cohort and
+# week offset we report how many came back, and how many had applied by then.
+APPLY_EVENT_TYPES = ("program_application_submitted", "application_created")
+DEFAULT_WEEKS = 12
+REFRESH_MINUTES = int(os.environ.get('ANALYTICS_COHORT_REFRESH_MINUTES', '60'))
+COLLECTION = "analytics_cohorts"
+
+WEEK = np.timedelta64(7, "D")
+EPOCH_MONDAY = np.datetime64("1970-01-05")
+
+
+def _week_start(ts: datetime) -> datetime:
+    day = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return day - timedelta(days=day.weekday())
+
+
+def _frame_columns(frame) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    return (
+        frame["timestamp"].to_numpy(dtype="datetime64[ns]"),
+        frame["user_session"].to_numpy(dtype=object),
+        frame["visitor_id"].to_numpy(dtype=object) if "visitor_id" in frame else np.full(len(frame), None, dtype=object),
+        frame["event_type"].to_numpy(dtype=object),
+    )
+
+
+async def _mongo_columns(db, start: datetime, end: datetime) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    timestamps, sessions, visitors, event_types = [], [], [], []
+    cursor = usage_events.collection(db).find(
+        {"timestamp": {"$gte": start, "$lt": end}},
+        {"_id": 0, "timestamp": 1, "user_session": 1, "visitor_id": 1, "meta": 1, "event_type": 1}
+    ).batch_size(5000)
+    async for document in cursor:
+        event = usage_events.from_document(document)
+        timestamps.append(event["timestamp"])
+        sessions.append(event.get("user_session"))
+        visitors.append(event.get("visitor_id"))
+        event_types.append(event.get("event_type"))
+    return (
+        np.array(timestamps, dtype="datetime64[ns]"),
+        np.array(sessions, dtype=object),
+        np.array(visitors, dtype=object),
+        np.array(event_types, dtype=object),
+    )
+
+
+async def _load_events(db, start: datetime, end: datetime) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(timestamps, resident ids, is-application flags) for events in [start, end)"""
+    # Prefer the Parquet snapshot up to its watermark so this doesn't scan the
+    # live collection, and read only the events after it from Mongo; snapshots
+    # may be manual (ANALYTICS_WAREHOUSE_INTERVAL_MINUTES=0) and arbitrarily old
+    state = await db.analytics_warehouse_state.find_one({"_id": "usage_events"}) or {}
+    watermark = state.get("watermark")
+    has_files = watermark and (await asyncio.to_thread(analytics_warehouse.describe))["usage_events"]["files"]
+    split = min(max(watermark, start), end) if has_files else start
+
+    parts = []
+    if split > start:
+        columns = ["timestamp", "event_type", "user_session", "visitor_id"]
+        frame = await asyncio.to_thread(analytics_warehouse.load, "usage_events", start, split, columns)
+        parts.append(_frame_columns(frame))
+    if split < end:
+        parts.append(await _mongo_columns(db, split, end))
+    timestamps, sessions, visitors, event_types = (np.concatenate(column) for column in zip(*parts))
+
+    has_visitor = np.array([isinstance(v, str) and v != "" for v in visitors], dtype=bool)
+    residents = np.where(has_visitor, visitors, sessions)
+    is_apply = np.isin(event_types, APPLY_EVENT_TYPES)
+    return timestamps, residents, is_apply
+
+
+def compute_matrix(timestamps: np.ndarray, residents: np.ndarray, is_apply: np.ndarray, first_week: int, weeks: int, current_week: int) -> Dict[str, Any]:
+    """
+    Vectorized cohort matrices. Week numbers count from 1970-01-05; cohorts
+    are first_week..first_week+weeks-1. Only residents first seen inside the
+    window are counted, so callers should load some history before it.
+    """
+    retained = np.zeros((weeks, weeks), dtype=np.int64)
+    applied = np.zeros((weeks, weeks), dtype=np.int64)
+    if len(timestamps):
+        week = ((timestamps - EPOCH_MONDAY) // WEEK).astype(np.int64)
+        _, resident = np.unique(residents.astype(str), return_inverse=True)
+
+        first_seen = np.full(resident.max() + 1, np.iinfo(np.int64).max)
+        np.minimum.at(first_seen, resident, week)
+        cohort = first_seen[resident] - first_week
+        offset = week - first_seen[resident]
+        in_window = (cohort >= 0) & (cohort < weeks) & (offset < weeks)
+
+        # Each resident counts once per active week
+        active = np.unique(np.stack([resident[in_window], offset[in_window]]), axis=1)
+        np.add.at(retained, (first_seen[active[0]] - first_week, active[1]), 1)
+
+        # Cumulative conversion: first application week, then running sum
+        first_apply = np.full(len(first_seen), np.iinfo(np.int64).max)
+        np.minimum.at(first_apply, resident[is_apply], week[is_apply])
+        converted = np.flatnonzero(first_apply != np.iinfo(np.int64).max)
+        apply_cohort = first_seen[converted] - first_week
+        apply_offset = first_apply[converted] - first_seen[converted]
+        keep = (apply_cohort >= 0) & (apply_cohort < weeks) & (apply_offset < weeks)
+        np.add.at(applied, (apply_cohort[keep], apply_offset[keep]), 1)
+        applied = np.cumsum(applied, axis=1)
+
+    sizes = retained[:, 0]
+    # Offsets that haven't happened yet for a cohort are reported as null
+    elapsed = current_week - (first_week + np.arange(weeks))
+    future = np.arange(weeks)[None, :] > elapsed[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        retention = np.where(sizes[:, None] > 0, retained / sizes[:, None] * 100, 0.0).round(1)
+        conversion = np.where(sizes[:, None] > 0, applied / sizes[:, None] * 100, 0.0).round(1)
+
+    def masked(matrix):
+        return [[None if future[i, j] else matrix[i, j].item() for j in range(weeks)] for i in range(weeks)]
+
+    return {
+        "cohort_sizes": sizes.tolist(),
+        "returning": masked(retained),
+        "retention_rate": masked(retention),
+        "applied": masked(applied),
+        "application_rate": masked(conversion),
+    }
+
+
+async def compute(db, weeks: int = DEFAULT_WEEKS, now: Optional[datetime] = None) -> Dict[str, Any]:
+    now = now or datetime.utcnow()
+    window_start = _week_start(now) - timedelta(weeks=weeks - 1)
+    # Residents seen in the prior window were not new in it
+    history_start = window_start - timedelta(weeks=weeks)
+    timestamps, residents, is_apply = await _load_events(db, history_start, now)
+
+    first_week = int((np.datetime64(window_start) - EPOCH_MONDAY) // WEEK)
+    current_week = int((np.datetime64(now) - EPOCH_MONDAY) // WEEK)
+    matrices = await asyncio.to_thread(compute_matrix, timestamps, residents, is_apply, first_week, weeks, current_week)
+
+    return {
+        "weeks": weeks,
+        "cohorts": [(window_start + timedelta(weeks=i)).strftime('%Y-%m-%d') for i in range(weeks)],
+        **matrices,
+        "events_scanned": int(len(timestamps)),
+        "computed_at": now,
+    }
+
+
+async def refresh(db, weeks: int = DEFAULT_WEEKS) -> Dict[str, Any]:
+    result = await compute(db, weeks)
+    await db[COLLECTION].replace_one({"_id": weeks}, result, upsert=True)
+    return result
+
+
+async def get_cohorts(db, weeks: int = DEFAULT_WEEKS) -> Dict[str, Any]:
+    """The stored result for `weeks` if the worker refreshed it recently, else a fresh one"""
+    stored = await db[COLLECTION].find_one({"_id": weeks}, {"_id": 0})
+    if stored and stored["computed_at"] > datetime.utcnow() - timedelta(minutes=REFRESH_MINUTES * 2):
+        return stored
+    return await refresh(db, weeks)
+
+
+async def refresh_loop(db):
+    """Background task recomputing the default cohort report every ANALYTICS_COHORT_REFRESH_MINUTES"""
+    while True:
+        try:
+            await refresh(db)
+        except Exception as e:
+            logger.error(f"Cohort refresh failed: {e}")
+        await asyncio.sleep(REFRESH_MINUTES * 60)
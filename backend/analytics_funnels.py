@@ -0,0 +1,219 @@
+from collections import defaultdict
+from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta
+import time
+import uuid
+
+from pymongo import UpdateOne, DeleteOne
+
+# Funnels are ordered event steps evaluated per session as events arrive.
+# Each (funnel, session) keeps one small progress document that expires after
+# SESSION_STATE_TTL_DAYS without activity, so state stays bounded. Step
+# counts are attributed to the UTC day the session entered the funnel.
+FUNNELS = "analytics_funnels"
+SESSIONS = "analytics_funnel_sessions"
+DAILY = "analytics_funnel_daily"
+SESSION_STATE_TTL_DAYS = 7
+DEFINITION_CACHE_SECONDS = 60
+
+DEFAULT_FUNNELS = [
+    {
+        "name": "Programs tab to program application",
+        "steps": [
+            {"event_type": "page_view", "page": "programs"},
+            {"event_type": "program_application_submitted"}
+        ],
+        "window_hours": 72
+    },
+    {
+        "name": "Financial calculator to application",
+        "steps": [
+            {"event_type": "page_view", "page": "calculator"},
+            {"event_type": "program_application_submitted"}
+        ],
+        "window_hours": 72
+    }
+]
+
+_definitions: List[Dict[str, Any]] = []
+_definitions_loaded_at = 0.0
+
+
+async def ensure_indexes(db):
+    await db[SESSIONS].create_index([("funnel_id", 1), ("user_session", 1)], unique=True)
+    await db[SESSIONS].create_index("updated_at", expireAfterSeconds=SESSION_STATE_TTL_DAYS * 24 * 3600)
+    await db[DAILY].create_index([("funnel_id", 1), ("organization_id", 1), ("day", 1)], unique=True)
+
+
+async def seed_default_funnels(db):
+    if await db[FUNNELS].count_documents({}) == 0:
+        await db[FUNNELS].insert_many([new_funnel(**funnel) for funnel in DEFAULT_FUNNELS])
+        return
+    # Earlier seeds ended the calculator funnel on application_created, which
+    # no rendered component sends; point it at program applications instead
+    calculator = next(f for f in DEFAULT_FUNNELS if f["name"] == "Financial calculator to application")
+    await db[FUNNELS].update_many(
+        {"name": calculator["name"], "steps.event_type": "application_created"},
+        {"$set": {"steps": calculator["steps"]}}
+    )
+
+
+def new_funnel(name: str, steps: List[Dict[str, Any]], window_hours: int = 72, organization_id: Optional[str] = None) -> Dict[str, Any]:
+    if len(steps) < 2:
+        raise ValueError("A funnel needs at least two steps")
+    for step in steps:
+        if not step.get("event_type"):
+            raise ValueError("Every funnel step needs an event_type")
+    return {
+        "id": str(uuid.uuid4()),
+        "name": name,
+        "steps": steps,
+        "window_hours": window_hours,
+        "organization_id": organization_id,
+        "is_active": True,
+        "created_at": datetime.utcnow()
+    }
+
+
+def invalidate_definitions():
+    global _definitions_loaded_at
+    _definitions_loaded_at = 0.0
+
+
+async def _active_funnels(db) -> List[Dict[str, Any]]:
+    global _definitions, _definitions_loaded_at
+    if time.monotonic() - _definitions_loaded_at > DEFINITION_CACHE_SECONDS:
+        _definitions = await db[FUNNELS].find({"is_active": True}, {"_id": 0}).to_list(None)
+        _definitions_loaded_at = time.monotonic()
+    return _definitions
+
+
+def _matches(step: Dict[str, Any], event: Dict[str, Any]) -> bool:
+    if event.get("event_type") != step["event_type"]:
+        return False
+    if step.get("page") and event.get("page") != step["page"]:
+        return False
+    metadata = event.get("metadata") or {}
+    return all(metadata.get(k) == v for k, v in (step.get("metadata") or {}).items())
+
+
+def _day(ts: datetime) -> datetime:
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+async def apply_events(db, events: List[dict]):
+    """Advance every active funnel for the sessions in a batch of events"""
+    funnels = await _active_funnels(db)
+    if not funnels or not events:
+        return
+
+    by_session = defaultdict(list)
+    for event in events:
+        if event.get("user_session"):
+            by_session[event["user_session"]].append(event)
+
+    stored = {}
+    async for doc in db[SESSIONS].find({
+        "funnel_id": {"$in": [f["id"] for f in funnels]},
+        "user_session": {"$in": list(by_session)}
+    }):
+        stored[(doc["funnel_id"], doc["user_session"])] = doc
+
+    state_writes = []
+    step_counts = defaultdict(int)  # (funnel_id, organization_id, day, step) -> n
+
+    for session, session_events in by_session.items():
+        session_events.sort(key=lambda e: e["timestamp"])
+        for funnel in funnels:
+            steps = funnel["steps"]
+            window = timedelta(hours=funnel.get("window_hours", 72))
+            doc = stored.get((funnel["id"], session))
+            step = doc["step"] if doc else 0
+            started_at = doc["started_at"] if doc else None
+            organization_id = doc["organization_id"] if doc else None
+            changed = False
+
+            for event in session_events:
+                if funnel.get("organization_id") and event.get("organization_id") != funnel["organization_id"]:
+                    continue
+                if step and event["timestamp"] - started_at > window:
+                    step, started_at, changed = 0, None, True
+                if not _matches(steps[step], event):
+                    continue
+                if step == 0:
+                    started_at = event["timestamp"]
+                    organization_id = event.get("organization_id")
+                step_counts[(funnel["id"], organization_id, _day(started_at), step)] += 1
+                step += 1
+                changed = True
+                if step == len(steps):
+                    # Converted; the session may enter the funnel again later
+                    step, started_at = 0, None
+
+            if not changed:
+                continue
+            key = {"funnel_id": funnel["id"], "user_session": session}
+            if step == 0:
+                if doc:
+                    state_writes.append(DeleteOne(key))
+            else:
+                state_writes.append(UpdateOne(
+                    key,
+                    {"$set": {
+                        "step": step,
+                        "started_at": started_at,
+                        "organization_id": organization_id,
+                        "updated_at": datetime.utcnow()
+                    }},
+                    upsert=True
+                ))
+
+    if state_writes:
+        await db[SESSIONS].bulk_write(state_writes, ordered=False)
+    if step_counts:
+        await db[DAILY].bulk_write([
+            UpdateOne(
+                {"funnel_id": funnel_id, "organization_id": organization_id, "day": day},
+                {"$inc": {f"steps.{step}": count}},
+                upsert=True
+            )
+            for (funnel_id, organization_id, day, step), count in step_counts.items()
+        ], ordered=False)
+
+
+async def funnel_report(
+    db,
+    funnel: Dict[str, Any],
+    start: datetime,
+    end: datetime,
+    organization_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Sessions reaching each step for sessions that entered during [start, end)"""
+    query = {"funnel_id": funnel["id"], "day": {"$gte": _day(start), "$lt": end}}
+    if organization_id:
+        query["organization_id"] = organization_id
+
+    totals = [0] * len(funnel["steps"])
+    async for doc in db[DAILY].find(query, {"steps": 1}):
+        for step, count in (doc.get("steps") or {}).items():
+            if int(step) < len(totals):
+                totals[int(step)] += count
+
+    entered = totals[0]
+    return {
+        "funnel_id": funnel["id"],
+        "name": funnel["name"],
+        "start": _day(start),
+        "end": end,
+        "steps": [
+            {
+                "step": i + 1,
+                **funnel["steps"][i],
+                "sessions": count,
+                "conversion_from_previous": round(count / totals[i - 1] * 100, 1) if i and totals[i - 1] else None,
+                "conversion_from_start": round(count / entered * 100, 1) if entered else 0
+            }
+            for i, count in enumerate(totals)
+        ],
+        "overall_conversion": round(totals[-1] / entered * 100, 1) if entered else 0
+    }
@@ -0,0 +1,123 @@
+from collections import Counter
+from typing import List, Dict, Any
+from datetime import datetime, timedelta
+import logging
+
+from pymongo import UpdateOne
+
+import usage_events
+
+logger = logging.getLogger(__name__)
+
+# Pre-aggregated event counts keyed by (organization, event_type, page, bucket).
+# Buckets are the start of the hour / day in UTC.
+HOURLY = "analytics_rollups_hourly"
+DAILY = "analytics_rollups_daily"
+ROLLUP_KEY = ["organization_id", "event_type", "page", "bucket"]
+
+
+def hour_bucket(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(ts: datetime) -> datetime:
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+async def ensure_indexes(db):
+    for name in (HOURLY, DAILY):
+        await db[name].create_index([(field, 1) for field in ROLLUP_KEY], unique=True)
+        await db[name].create_index([("event_type", 1), ("bucket", 1)])
+
+
+def _increments(events: List[dict], bucket_fn) -> List[UpdateOne]:
+    counts = Counter(
+        (e.get("organization_id"), e.get("event_type"), e.get("page"), bucket_fn(e["timestamp"]))
+        for e in events
+    )
+    return [
+        UpdateOne(
+            {"organization_id": org, "event_type": event_type, "page": page, "bucket": bucket},
+            {"$inc": {"count": count}},
+            upsert=True
+        )
+        for (org, event_type, page, bucket), count in counts.items()
+    ]
+
+
+async def apply_events(db, events: List[dict]):
+    """Fold a batch of freshly inserted events into the hourly and daily rollups"""
+    if not events:
+        return
+    await db[HOURLY].bulk_write(_increments(events, hour_bucket), ordered=False)
+    await db[DAILY].bulk_write(_increments(events, day_bucket), ordered=False)
+
+
+async def backfill(db, start: datetime, end: datetime, default_organization_id: str) -> Dict[str, Any]:
+    """
+    Recompute rollups for [start, end) from raw usage events, replacing what
+    is there. Both bounds are widened to whole days so daily rows stay exact.
+    Events ingested for the same range while this runs may be counted twice;
+    run it for past ranges or during quiet periods.
+    """
+    start = day_bucket(start)
+    end = day_bucket(end) + (timedelta(days=1) if end != day_bucket(end) else timedelta())
+
+    group_key = {
+        "organization_id": {"$ifNull": [f"${usage_events.field('organization_id')}", default_organization_id]},
+        "event_type": f"${usage_events.field('event_type')}",
+        "page": f"${usage_events.field('page')}",
+    }
+
+    await db[HOURLY].delete_many({"bucket": {"$gte": start, "$lt": end}})
+    await usage_events.collection(db).aggregate([
+        {"$match": {"timestamp": {"$gte": start, "$lt": end}}},
+        {"$group": {
+            "_id": {**group_key, "bucket": {"$dateTrunc": {"date": "$timestamp", "unit": "hour"}}},
+            "count": {"$sum": 1}
+        }},
+        {"$project": {"_id": 0, **{f: f"$_id.{f}" for f in ROLLUP_KEY}, "count": 1}},
+        {"$merge": {"into": HOURLY, "on": ROLLUP_KEY, "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]).to_list(None)
+
+    await db[DAILY].delete_many({"bucket": {"$gte": start, "$lt": end}})
+    await db[HOURLY].aggregate([
+        {"$match": {"bucket": {"$gte": start, "$lt": end}}},
+        {"$group": {
+            "_id": {
+                "organization_id": "$organization_id",
+                "event_type": "$event_type",
+                "page": "$page",
+                "bucket": {"$dateTrunc": {"date": "$bucket", "unit": "day"}}
+            },
+            "count": {"$sum": "$count"}
+        }},
+        {"$project": {"_id": 0, **{f: f"$_id.{f}" for f in ROLLUP_KEY}, "count": 1}},
+        {"$merge": {"into": DAILY, "on": ROLLUP_KEY, "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]).to_list(None)
+
+    hourly_rows = await db[HOURLY].count_documents({"bucket": {"$gte": start, "$lt": end}})
+    daily_rows = await db[DAILY].count_documents({"bucket": {"$gte": start, "$lt": end}})
+    logger.info(f"Rollup backfill {start:%Y-%m-%d}..{end:%Y-%m-%d}: {hourly_rows} hourly, {daily_rows} daily rows")
+    return {"start": start, "end": end, "hourly_rows": hourly_rows, "daily_rows": daily_rows}
+
+
+async def daily_counts(db, event_type: str, since: datetime) -> List[Dict[str, Any]]:
+    """Per-day totals for an event type, shaped like the old raw aggregation"""
+    return await db[DAILY].aggregate([
+        {"$match": {"event_type": event_type, "bucket": {"$gte": day_bucket(since)}}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$bucket"}},
+            "count": {"$sum": "$count"}
+        }},
+        {"$sort": {"_id": 1}}
+    ]).to_list(None)
+
+
+async def top_pages(db, event_type: str, since: datetime, limit: int = 10) -> List[Dict[str, Any]]:
+    return await db[DAILY].aggregate([
+        {"$match": {"event_type": event_type, "bucket": {"$gte": day_bucket(since)}}},
+        {"$group": {"_id": "$page", "count": {"$sum": "$count"}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit}
+    ]).to_list(limit)
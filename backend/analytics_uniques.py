@@ -0,0 +1,130 @@
+from collections import defaultdict
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+import logging
+
+from bson import Binary
+from pymongo.errors import DuplicateKeyError
+
+from hyperloglog import HyperLogLog
+import usage_events
+
+logger = logging.getLogger(__name__)
+
+# One HyperLogLog sketch per (organization, page, day, kind) where kind is
+# "session" (user_session) or "visitor" (persistent visitor_id from the tracker).
+COLLECTION = "analytics_hll"
+PRECISION = 12  # 4096 registers, ~1.6% standard error, <=4KB per sketch
+KINDS = {"session": "user_session", "visitor": "visitor_id"}
+MAX_MERGE_ATTEMPTS = 5
+
+
+async def ensure_indexes(db):
+    await db[COLLECTION].create_index(
+        [("organization_id", 1), ("kind", 1), ("day", 1), ("page", 1)], unique=True
+    )
+
+
+def _day(ts: datetime) -> datetime:
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+async def _merge_into(db, key: Dict[str, Any], sketch: HyperLogLog):
+    """Merge a sketch into its stored counterpart with optimistic concurrency"""
+    collection = db[COLLECTION]
+    for _ in range(MAX_MERGE_ATTEMPTS):
+        stored = await collection.find_one(key)
+        if stored is None:
+            try:
+                await collection.insert_one({**key, "registers": Binary(sketch.to_bytes()), "version": 1})
+                return
+            except DuplicateKeyError:
+                continue
+
+        merged = HyperLogLog.from_bytes(stored["registers"], PRECISION)
+        before = merged.registers.copy()
+        merged.merge(sketch)
+        if (merged.registers == before).all():
+            return
+
+        result = await collection.update_one(
+            {"_id": stored["_id"], "version": stored["version"]},
+            {"$set": {"registers": Binary(merged.to_bytes())}, "$inc": {"version": 1}}
+        )
+        if result.modified_count:
+            return
+    logger.warning(f"Gave up merging HyperLogLog sketch for {key} after {MAX_MERGE_ATTEMPTS} attempts")
+
+
+async def apply_events(db, events: List[dict]):
+    """Add the sessions/visitors in a batch of events to the per-day, per-page sketches"""
+    values = defaultdict(list)
+    for event in events:
+        for kind, field in KINDS.items():
+            value = event.get(field)
+            if value:
+                key = (event.get("organization_id"), kind, _day(event["timestamp"]), event.get("page"))
+                values[key].append(value)
+
+    for (organization_id, kind, day, page), ids in values.items():
+        sketch = HyperLogLog(PRECISION)
+        sketch.add_many(ids)
+        await _merge_into(db, {"organization_id": organization_id, "kind": kind, "day": day, "page": page}, sketch)
+
+
+async def estimate_uniques(
+    db,
+    start: datetime,
+    end: datetime,
+    organization_id: Optional[str] = None,
+    page: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Estimated distinct sessions and visitors for [start, end), overall and per
+    day, by merging the stored daily sketches.
+    """
+    query = {"day": {"$gte": _day(start), "$lt": end}}
+    if organization_id:
+        query["organization_id"] = organization_id
+    if page:
+        query["page"] = page
+
+    totals = {kind: HyperLogLog(PRECISION) for kind in KINDS}
+    daily = defaultdict(lambda: {kind: HyperLogLog(PRECISION) for kind in KINDS})
+
+    async for doc in db[COLLECTION].find(query, {"kind": 1, "day": 1, "registers": 1}):
+        sketch = HyperLogLog.from_bytes(doc["registers"], PRECISION)
+        daily[doc["day"]][doc["kind"]].merge(sketch)
+        totals[doc["kind"]].merge(sketch)
+
+    return {
+        "unique_sessions": totals["session"].count(),
+        "unique_visitors": totals["visitor"].count(),
+        "by_day": [
+            {
+                "date": day.strftime('%Y-%m-%d'),
+                "unique_sessions": sketches["session"].count(),
+                "unique_visitors": sketches["visitor"].count()
+            }
+            for day, sketches in sorted(daily.items())
+        ],
+        "relative_error": round(HyperLogLog(PRECISION).relative_error, 4)
+    }
+
+
+async def backfill(db, start: datetime, end: datetime, default_organization_id: str, batch_size: int = 5000):
+    """Rebuild sketches for [start, end) from raw usage_metrics (merging is idempotent)"""
+    batch = []
+    cursor = usage_events.collection(db).find(
+        {"timestamp": {"$gte": start, "$lt": end}},
+        {"_id": 0, "meta": 1, "organization_id": 1, "page": 1, "timestamp": 1, "user_session": 1, "visitor_id": 1}
+    ).batch_size(batch_size)
+    async for document in cursor:
+        event = usage_events.from_document(document)
+        if not event.get("organization_id"):
+            event["organization_id"] = default_organization_id
+        batch.append(event)
+        if len(batch) >= batch_size:
+            await apply_events(db, batch)
+            batch = []
+    await apply_events(db, batch)
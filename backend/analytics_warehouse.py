@@ -0,0 +1,265 @@
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import json
+import os
+import uuid
+import logging
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+import usage_events
+
+logger = logging.getLogger(__name__)
+
+# Columnar copies of analytics-relevant collections for ad-hoc reporting, so
+# heavy group-bys run on local Parquet files instead of the operational
+# database. Append-only datasets are partitioned by UTC day:
+#   ANALYTICS_WAREHOUSE_DIR/<dataset>/date=YYYY-MM-DD/part-0.parquet
+# Each snapshot rewrites the partitions from the previous watermark day
+# onwards, which also picks up late-arriving (client-timestamped) events.
+# Mutable datasets are small and rewritten whole as <dataset>/snapshot.parquet.
+WAREHOUSE_ROOT = Path(os.environ.get('ANALYTICS_WAREHOUSE_DIR', 'analytics_warehouse'))
+SNAPSHOT_INTERVAL_MINUTES = int(os.environ.get('ANALYTICS_WAREHOUSE_INTERVAL_MINUTES', '0'))
+REWRITE_DAYS = 2  # trailing days re-exported on every run
+
+DATASETS = {
+    "usage_events": {"collection": usage_events.collection, "time_field": "timestamp", "partitioned": True},
+    "loan_calculations": {"collection": lambda db: db.loan_calculations, "time_field": "calculated_at", "partitioned": True},
+    "income_qualifications": {"collection": lambda db: db.income_qualifications, "time_field": "calculated_at", "partitioned": True},
+    "utility_assistance_calculations": {"collection": lambda db: db.utility_assistance_calculations, "time_field": "calculated_at", "partitioned": True},
+    "applications": {"collection": lambda db: db.applications, "time_field": "created_at", "partitioned": False},
+}
+
+BUCKETS = ("hour", "day", "week", "month")
+METRICS = ("count", "sum", "mean", "min", "max", "nunique")
+
+_snapshot_lock = asyncio.Lock()
+
+
+def _day(ts: datetime) -> datetime:
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _partition_dir(dataset: str, day: datetime) -> Path:
+    return WAREHOUSE_ROOT / dataset / f"date={day:%Y-%m-%d}"
+
+
+def _to_frame(documents: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Flatten Mongo documents into a DataFrame with Parquet-friendly columns"""
+    frame = pd.DataFrame([usage_events.from_document(d) for d in documents])
+    frame = frame.drop(columns=["_id"], errors="ignore")
+    for column in frame.columns:
+        if frame[column].map(lambda v: isinstance(v, (dict, list))).any():
+            # Free-form metadata has no fixed schema; keep it as JSON text
+            frame[column] = frame[column].map(
+                lambda v: json.dumps(v, default=str) if isinstance(v, (dict, list)) else v
+            )
+    return frame
+
+
+def _write_atomic(frame: pd.DataFrame, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    frame.to_parquet(tmp_path, engine="pyarrow", index=False)
+    os.replace(tmp_path, path)
+
+
+async def _snapshot_partitioned(db, name: str, spec: Dict[str, Any], watermark: Optional[datetime], now: datetime) -> Dict[str, Any]:
+    collection = spec["collection"](db)
+    time_field = spec["time_field"]
+
+    if watermark is None:
+        # Missing and null times sort first; they can't be placed in a partition anyway
+        first = await collection.find_one({time_field: {"$ne": None}}, {time_field: 1}, sort=[(time_field, 1)])
+        if not first:
+            return {"partitions": 0, "rows": 0, "watermark": None}
+        day = _day(first[time_field])
+    else:
+        day = _day(watermark) - timedelta(days=REWRITE_DAYS - 1)
+
+    partitions = rows = 0
+    while day <= now:
+        next_day = day + timedelta(days=1)
+        documents = await collection.find({time_field: {"$gte": day, "$lt": next_day}}).to_list(None)
+        path = _partition_dir(name, day) / "part-0.parquet"
+        if documents:
+            await asyncio.to_thread(_write_atomic, _to_frame(documents), path)
+            partitions += 1
+            rows += len(documents)
+        elif path.exists():
+            path.unlink()
+        day = next_day
+
+    return {"partitions": partitions, "rows": rows, "watermark": now}
+
+
+async def _snapshot_full(db, name: str, spec: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    documents = await spec["collection"](db).find({}).to_list(None)
+    if documents:
+        await asyncio.to_thread(_write_atomic, _to_frame(documents), WAREHOUSE_ROOT / name / "snapshot.parquet")
+    return {"partitions": 1 if documents else 0, "rows": len(documents), "watermark": now}
+
+
+async def snapshot(db, datasets: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Export the selected (default: all) datasets to Parquet"""
+    if _snapshot_lock.locked():
+        return {"status": "skipped", "reason": "A snapshot is already running"}
+
+    async with _snapshot_lock:
+        started_at = datetime.utcnow()
+        results = {}
+        for name in datasets or DATASETS:
+            spec = DATASETS[name]
+            state = await db.analytics_warehouse_state.find_one({"_id": name}) or {}
+            if spec["partitioned"]:
+                result = await _snapshot_partitioned(db, name, spec, state.get("watermark"), started_at)
+            else:
+                result = await _snapshot_full(db, name, spec, started_at)
+            if result["watermark"]:
+                await db.analytics_warehouse_state.update_one(
+                    {"_id": name},
+                    {"$set": {"watermark": result["watermark"], "last_rows": result["rows"], "updated_at": datetime.utcnow()}},
+                    upsert=True
+                )
+            results[name] = result
+
+        duration = (datetime.utcnow() - started_at).total_seconds()
+        logger.info(f"Analytics warehouse snapshot finished in {duration:.1f}s: {results}")
+        return {"status": "completed", "started_at": started_at, "duration_seconds": duration, "datasets": results}
+
+
+async def snapshot_loop(db):
+    """Background task refreshing the warehouse every ANALYTICS_WAREHOUSE_INTERVAL_MINUTES"""
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL_MINUTES * 60)
+        try:
+            await snapshot(db)
+        except Exception as e:
+            logger.error(f"Analytics warehouse snapshot failed: {e}")
+
+
+def describe() -> Dict[str, Any]:
+    """Partitions and size on disk per dataset"""
+    summary = {}
+    for name in DATASETS:
+        files = sorted((WAREHOUSE_ROOT / name).rglob("*.parquet"))
+        partitions = [f.parent.name[len("date="):] for f in files if f.parent.name.startswith("date=")]
+        summary[name] = {
+            "files": len(files),
+            "bytes": sum(f.stat().st_size for f in files),
+            "first_partition": partitions[0] if partitions else None,
+            "last_partition": partitions[-1] if partitions else None,
+        }
+    return summary
+
+
+def _read(path: Path, columns: Optional[List[str]]) -> pd.DataFrame:
+    if columns:
+        # Older partitions may predate a column; it comes back as missing values
+        available = set(pq.read_schema(path).names)
+        columns = [c for c in columns if c in available]
+    return pd.read_parquet(path, columns=columns)
+
+
+def load(dataset: str, start: datetime, end: datetime, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read the rows of a dataset whose time field falls in [start, end)"""
+    spec = DATASETS[dataset]
+    time_field = spec["time_field"]
+    if spec["partitioned"]:
+        first, last = f"date={_day(start):%Y-%m-%d}", f"date={end:%Y-%m-%d}"
+        files = [
+            f for f in sorted((WAREHOUSE_ROOT / dataset).glob("date=*/part-*.parquet"))
+            if first <= f.parent.name <= last
+        ]
+    else:
+        files = [f for f in [WAREHOUSE_ROOT / dataset / "snapshot.parquet"] if f.exists()]
+    if not files:
+        return pd.DataFrame(columns=columns or [time_field])
+
+    if columns and time_field not in columns:
+        columns = [time_field, *columns]
+    frame = pd.concat([_read(f, columns) for f in files], ignore_index=True)
+    mask = (frame[time_field] >= start) & (frame[time_field] < end)
+    return frame.loc[mask]
+
+
+def _bucket(series: pd.Series, bucket: str) -> pd.Series:
+    if bucket == "hour":
+        return series.dt.floor("h")
+    if bucket == "day":
+        return series.dt.floor("D")
+    if bucket == "week":
+        return (series - pd.to_timedelta(series.dt.weekday, unit="D")).dt.floor("D")
+    return series.dt.to_period("M").dt.to_timestamp()
+
+
+def query(
+    dataset: str,
+    start: datetime,
+    end: datetime,
+    group_by: Optional[List[str]] = None,
+    bucket: Optional[str] = None,
+    metric: str = "count",
+    value_field: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    limit: int = 1000
+) -> Dict[str, Any]:
+    """
+    Group-by/time-bucket aggregation over the Parquet snapshot. Filters are
+    equality matches (a list value matches any of its items). Raises
+    ValueError for unknown datasets, columns or metrics.
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown dataset '{dataset}'")
+    if bucket and bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {', '.join(METRICS)}")
+    if metric != "count" and not value_field:
+        raise ValueError(f"metric '{metric}' needs a value_field")
+
+    group_by = list(group_by or [])
+    filters = filters or {}
+    time_field = DATASETS[dataset]["time_field"]
+    frame = load(dataset, start, end)
+
+    for column in [*group_by, *filters, *([value_field] if value_field else [])]:
+        if column not in frame.columns and not frame.empty:
+            raise ValueError(f"Unknown column '{column}' in dataset '{dataset}'")
+
+    for column, value in filters.items():
+        if frame.empty:
+            break
+        frame = frame[frame[column].isin(value if isinstance(value, list) else [value])]
+
+    keys = list(group_by)
+    if bucket:
+        frame = frame.assign(bucket=_bucket(pd.to_datetime(frame[time_field]), bucket))
+        keys.insert(0, "bucket")
+
+    result_column = metric if metric == "count" else f"{metric}_{value_field}"
+    if frame.empty:
+        rows = []
+    elif not keys:
+        value = len(frame) if metric == "count" else getattr(frame[value_field], metric)()
+        rows = [{result_column: value.item() if hasattr(value, "item") else value}]
+    else:
+        grouped = frame.groupby(keys, dropna=False)
+        aggregated = grouped.size() if metric == "count" else grouped[value_field].agg(metric)
+        result = aggregated.rename(result_column).reset_index()
+        if bucket:
+            result = result.sort_values("bucket")
+        else:
+            result = result.sort_values(result_column, ascending=False)
+        rows = json.loads(result.head(limit).to_json(orient="records", date_format="iso"))
+
+    return {
+        "dataset": dataset,
+        "start": start,
+        "end": end,
+        "rows_matched": int(len(frame)),
+        "results": rows,
+    }
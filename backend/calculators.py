@@ -0,0 +1,167 @@
+from typing import Dict
+
+import numpy as np
+
+# Vectorized versions of the financial calculator formulas. Inputs are
+# broadcast against each other, so one call prices any number of scenarios.
+# Income tables (see reference_data) are 8-element arrays for household
+# sizes 1-8.
+
+# Mission 180 typically serves 80% AMI and below
+AMI_QUALIFYING_SHARE = 0.8
+
+
+def payment_factor(interest_rates, loan_term_years) -> np.ndarray:
+    """Monthly payment per dollar borrowed (annual percentage rates)"""
+    monthly_rate = np.asarray(interest_rates, dtype=np.float64) / 100 / 12
+    num_payments = np.asarray(loan_term_years, dtype=np.int64) * 12
+    growth = np.power(1 + monthly_rate, num_payments)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        amortized = monthly_rate * growth / (growth - 1)
+    return np.where(monthly_rate == 0, 1 / num_payments, amortized)
+
+
+def loan_payments(loan_amounts, interest_rates, loan_term_years) -> Dict[str, np.ndarray]:
+    """
+    Fixed-rate monthly payment, total interest and total cost per scenario.
+    Rates are annual percentages; a 0% rate repays principal evenly.
+    """
+    amounts, rates, years = np.broadcast_arrays(
+        np.asarray(loan_amounts, dtype=np.float64),
+        np.asarray(interest_rates, dtype=np.float64),
+        np.asarray(loan_term_years, dtype=np.int64)
+    )
+    num_payments = years * 12
+    monthly_payment = amounts * payment_factor(rates, years)
+
+    total_cost = monthly_payment * num_payments
+    return {
+        "loan_amount": amounts,
+        "interest_rate": rates,
+        "loan_term_years": years,
+        "monthly_payment": monthly_payment.round(2),
+        "total_interest": (total_cost - amounts).round(2),
+        "total_cost": total_cost.round(2),
+    }
+
+
+def amortization_schedule(
+    loan_amount: float,
+    interest_rate: float,
+    loan_term_years: int,
+    extra_monthly_payment: float = 0.0,
+    extra_payment_start: int = 1,
+    one_time_payment: float = 0.0,
+    one_time_payment_period: int = 0
+) -> Dict[str, np.ndarray]:
+    """
+    Per-period payment/principal/interest/balance for a fixed-rate loan with
+    optional recurring extra payments from period `extra_payment_start` and a
+    single lump sum in `one_time_payment_period`. Periods are 1-based months;
+    the schedule ends early once extra payments retire the balance.
+    """
+    monthly_rate = interest_rate / 100 / 12
+    num_payments = loan_term_years * 12
+    scheduled = float(loan_payments(loan_amount, interest_rate, loan_term_years)["monthly_payment"])
+
+    period = np.arange(1, num_payments + 1)
+    payment = np.full(num_payments, scheduled)
+    payment[period >= extra_payment_start] += extra_monthly_payment
+    if one_time_payment and 1 <= one_time_payment_period <= num_payments:
+        payment[one_time_payment_period - 1] += one_time_payment
+
+    # B_k = g^k * (B_0 - sum_{j<=k} payment_j * g^-j), with g = 1 + monthly rate
+    growth = np.power(1 + monthly_rate, period)
+    balance = growth * (loan_amount - np.cumsum(payment / growth))
+
+    # Stop at the first period that clears the loan (or the last one, which
+    # absorbs rounding of the scheduled payment) and shrink that payment
+    cleared = np.flatnonzero(balance <= 0.005)
+    last = int(cleared[0]) if len(cleared) else num_payments - 1
+    period, payment, balance = period[:last + 1], payment[:last + 1], balance[:last + 1]
+
+    opening = np.concatenate(([loan_amount], balance[:-1]))
+    interest = opening * monthly_rate
+    payment[-1] = opening[-1] + interest[-1]
+    balance[-1] = 0.0
+
+    return {
+        "period": period,
+        "payment": payment.round(2),
+        "principal": (payment - interest).round(2),
+        "interest": interest.round(2),
+        "balance": balance.clip(min=0).round(2),
+    }
+
+
+def household_index(household_sizes) -> np.ndarray:
+    """Row into the 1-8 person tables; anything else uses the 8-person row"""
+    sizes = np.asarray(household_sizes, dtype=np.int64)
+    return np.where((sizes >= 1) & (sizes <= 8), sizes - 1, 7)
+
+
+def income_qualification(household_sizes, annual_incomes, ami_by_household_size: np.ndarray) -> Dict[str, np.ndarray]:
+    sizes, incomes = np.broadcast_arrays(np.asarray(household_sizes), np.asarray(annual_incomes, dtype=np.float64))
+    area_median_income = np.asarray(ami_by_household_size, dtype=np.float64)[household_index(sizes)]
+    max_income_limit = area_median_income * AMI_QUALIFYING_SHARE
+    return {
+        "area_median_income": area_median_income,
+        "max_income_limit": max_income_limit.round(2),
+        "qualification_percentage": (incomes / max_income_limit * 100).round(1),
+        "qualifies": incomes <= max_income_limit,
+    }
+
+
+def utility_assistance(household_sizes, monthly_incomes, monthly_utility_costs, fpl_150_monthly: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Share of the utility bill covered for households at or below 150% FPL:
+    75% above a 10% utility burden, 50% above 6%, 25% otherwise. Burden is
+    NaN where income is not positive.
+    """
+    sizes, incomes, costs = np.broadcast_arrays(
+        np.asarray(household_sizes),
+        np.asarray(monthly_incomes, dtype=np.float64),
+        np.asarray(monthly_utility_costs, dtype=np.float64)
+    )
+    max_income = np.asarray(fpl_150_monthly, dtype=np.float64)[household_index(sizes)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        burden = np.where(incomes > 0, costs / incomes * 100, np.nan)
+
+    eligible = incomes <= max_income
+    percentage = np.select([burden > 10, burden > 6], [75, 50], default=25)
+    percentage = np.where(eligible, percentage, 0)
+    return {
+        "max_income_for_assistance": max_income,
+        "utility_burden": burden.round(1),
+        "eligible": eligible,
+        "assistance_percentage": percentage,
+        "assistance_amount": (costs * percentage / 100).round(2),
+    }
+
+
+def max_affordable_price(
+    monthly_housing_budget,
+    interest_rates,
+    loan_term_years,
+    down_payment=0.0,
+    property_tax_rate=0.0,
+    monthly_insurance=0.0
+) -> np.ndarray:
+    """
+    Highest purchase price whose principal, interest, property tax (annual
+    rate on the price) and insurance fit the monthly budget. Inverts the
+    payment formula used by loan_payments: budget = f * (price - down) +
+    tax_rate / 12 * price + insurance, with f the payment per dollar borrowed.
+    """
+    budget, rates, years, down, tax_rate, insurance = np.broadcast_arrays(
+        np.asarray(monthly_housing_budget, dtype=np.float64),
+        np.asarray(interest_rates, dtype=np.float64),
+        np.asarray(loan_term_years, dtype=np.int64),
+        np.asarray(down_payment, dtype=np.float64),
+        np.asarray(property_tax_rate, dtype=np.float64),
+        np.asarray(monthly_insurance, dtype=np.float64)
+    )
+    factor = payment_factor(rates, years)
+    price = (budget - insurance + factor * down) / (factor + tax_rate / 12)
+    # Never below what the down payment alone buys
+    return np.maximum(price, np.where(budget >= insurance, down, 0.0)).round(2)
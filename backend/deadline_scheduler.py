@@ -0,0 +1,344 @@
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+from datetime import date, datetime, timedelta, timezone
+import asyncio
+import heapq
+import os
+import socket
+import uuid
+import logging
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Timed jobs (deadline reminders, deactivating expired items) kept in the
+# scheduled_jobs collection, so they survive restarts and any worker can
+# schedule one. Exactly one worker fires them: whoever holds the lease in
+# scheduler_leases, renewed every LEASE_SECONDS / 3. The leader keeps the
+# jobs due within LOOKAHEAD_SECONDS in a heap and sleeps until the earliest,
+# re-reading the table every POLL_SECONDS for jobs other workers added.
+# Sync tasks (re-planning jobs from alerts, programs, notifications) run on
+# the leader when it takes over and every SYNC_MINUTES.
+# Each job is claimed with a conditional update before it runs, so a job
+# that was rescheduled or cancelled in the meantime is skipped; handlers
+# should still be idempotent since a leader can die mid-job.
+JOBS = "scheduled_jobs"
+LEASES = "scheduler_leases"
+LEASE_SECONDS = float(os.environ.get('SCHEDULER_LEASE_SECONDS', '30'))
+POLL_SECONDS = float(os.environ.get('SCHEDULER_POLL_SECONDS', '30'))
+SYNC_MINUTES = float(os.environ.get('SCHEDULER_SYNC_MINUTES', '15'))
+LOOKAHEAD_SECONDS = 3600
+MAX_ATTEMPTS = 5
+STUCK_SECONDS = 600
+
+# Days before a deadline to remind people, e.g. "7,1"
+REMINDER_DAYS = sorted(
+    (int(d) for d in os.environ.get('DEADLINE_REMINDER_DAYS', '7,1').split(',') if d.strip()),
+    reverse=True
+)
+
+
+class JobScheduler:
+    def __init__(self, db, name: str = "deadline_scheduler"):
+        self.db = db
+        self.name = name
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[None]]] = {}
+        self._sync_tasks: List[Callable[[], Awaitable[Any]]] = []
+        self._heap: List = []
+        self._queued: Dict[str, datetime] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.is_leader = False
+        self._stats = {"fired": 0, "failed": 0, "retried": 0, "skipped": 0, "leader_since": None}
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any]], Awaitable[None]]):
+        self._handlers[kind] = handler
+
+    def every_sync(self, task: Callable[[], Awaitable[Any]]):
+        """Run `task` on the leader every SYNC_MINUTES to re-plan jobs from their source"""
+        self._sync_tasks.append(task)
+
+    async def ensure_indexes(self):
+        await self.db[JOBS].create_index([("status", 1), ("run_at", 1)])
+        await self.db[JOBS].create_index([("source", 1), ("status", 1)])
+        await self.db[JOBS].create_index("finished_at", expireAfterSeconds=30 * 24 * 3600)
+
+    async def schedule(self, key: str, kind: str, run_at: datetime, payload: Dict[str, Any], source: Optional[str] = None):
+        """Create the job, or move it to `run_at` if it hasn't run yet"""
+        now = datetime.utcnow()
+        try:
+            await self.db[JOBS].update_one(
+                {"_id": key, "status": {"$in": ["pending", "cancelled"]}},
+                {
+                    "$set": {"kind": kind, "run_at": run_at, "payload": payload, "source": source, "status": "pending", "updated_at": now},
+                    "$unset": {"finished_at": ""},
+                    "$setOnInsert": {"attempts": 0, "created_at": now}
+                },
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return  # already ran (or is running)
+        if self.is_leader and run_at <= now + timedelta(seconds=LOOKAHEAD_SECONDS):
+            self._push(run_at, key)
+            self._wakeup.set()
+
+    async def cancel(self, source: str, keep: Iterable[str] = ()) -> int:
+        """Cancel the pending jobs of `source` except the keys in `keep`"""
+        result = await self.db[JOBS].update_many(
+            {"source": source, "status": "pending", "_id": {"$nin": list(keep)}},
+            {"$set": {"status": "cancelled", "updated_at": datetime.utcnow(), "finished_at": datetime.utcnow()}}
+        )
+        return result.modified_count
+
+    async def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopping = True
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        if self.is_leader:
+            # Hand over right away instead of waiting for the lease to lapse
+            await self.db[LEASES].delete_one({"_id": self.name, "owner": self.worker_id})
+            self.is_leader = False
+
+    async def metrics(self) -> Dict[str, Any]:
+        counts = {row["_id"]: row["count"] async for row in self.db[JOBS].aggregate([
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ])}
+        lease = await self.db[LEASES].find_one({"_id": self.name})
+        return {
+            "worker_id": self.worker_id,
+            "is_leader": self.is_leader,
+            "leader": lease["owner"] if lease else None,
+            "lease_expires_at": lease["expires_at"] if lease else None,
+            "queued_in_memory": len(self._heap),
+            "jobs": counts,
+            **self._stats
+        }
+
+    def _push(self, run_at: datetime, key: str):
+        # A moved job gets a second heap entry; the outdated one is skipped when popped
+        if self._queued.get(key) != run_at:
+            self._queued[key] = run_at
+            heapq.heappush(self._heap, (run_at, key))
+
+    async def _acquire_lease(self) -> bool:
+        now = datetime.utcnow()
+        try:
+            lease = await self.db[LEASES].find_one_and_update(
+                {"_id": self.name, "$or": [{"owner": self.worker_id}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.worker_id, "expires_at": now + timedelta(seconds=LEASE_SECONDS)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            leader = lease is not None and lease["owner"] == self.worker_id
+        except DuplicateKeyError:
+            leader = False  # someone else holds a live lease
+        if leader and not self.is_leader:
+            logger.info(f"{self.name}: {self.worker_id} is now the leader")
+            self._stats["leader_since"] = now
+            self._heap, self._queued = [], {}
+        self.is_leader = leader
+        return leader
+
+    async def _refresh(self):
+        """Reload the jobs due within the lookahead window into the heap"""
+        now = datetime.utcnow()
+        await self.db[JOBS].update_many(
+            {"status": "running", "started_at": {"$lt": now - timedelta(seconds=STUCK_SECONDS)}},
+            {"$set": {"status": "pending"}}
+        )
+        self._heap, self._queued = [], {}
+        cursor = self.db[JOBS].find(
+            {"status": "pending", "run_at": {"$lte": now + timedelta(seconds=LOOKAHEAD_SECONDS)}},
+            {"_id": 1, "run_at": 1}
+        ).sort("run_at", 1).limit(5000)
+        async for job in cursor:
+            self._push(job["run_at"], job["_id"])
+
+    async def _fire_due(self):
+        while self._heap and self._heap[0][0] <= datetime.utcnow() and not self._stopping:
+            run_at, key = heapq.heappop(self._heap)
+            if self._queued.get(key) != run_at:
+                continue
+            del self._queued[key]
+            await self._fire(key)
+
+    async def _fire(self, key: str):
+        now = datetime.utcnow()
+        job = await self.db[JOBS].find_one_and_update(
+            {"_id": key, "status": "pending", "run_at": {"$lte": now}},
+            {"$set": {"status": "running", "started_at": now, "owner": self.worker_id}, "$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            self._stats["skipped"] += 1  # rescheduled, cancelled or taken
+            return
+        handler = self._handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler for job kind '{job['kind']}'")
+            await handler(job["payload"])
+        except Exception as e:
+            logger.error(f"{self.name}: job {key} failed: {e}")
+            if job["attempts"] >= MAX_ATTEMPTS:
+                self._stats["failed"] += 1
+                update = {"status": "failed", "error": str(e), "finished_at": datetime.utcnow()}
+            else:
+                self._stats["retried"] += 1
+                update = {"status": "pending", "error": str(e), "run_at": datetime.utcnow() + timedelta(minutes=2 ** job["attempts"])}
+            await self.db[JOBS].update_one({"_id": key}, {"$set": update})
+            return
+        self._stats["fired"] += 1
+        await self.db[JOBS].update_one({"_id": key}, {"$set": {"status": "done", "finished_at": datetime.utcnow()}})
+
+    async def _sync(self):
+        for task in self._sync_tasks:
+            try:
+                await task()
+            except Exception as e:
+                logger.error(f"{self.name}: sync {getattr(task, '__name__', task)} failed: {e}")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_poll = next_sync = 0.0
+        while not self._stopping:
+            try:
+                was_leader = self.is_leader
+                if await self._acquire_lease():
+                    if not was_leader or loop.time() >= next_sync:
+                        next_sync = loop.time() + SYNC_MINUTES * 60
+                        next_poll = 0.0
+                        await self._sync()
+                    if loop.time() >= next_poll:
+                        next_poll = loop.time() + POLL_SECONDS
+                        await self._refresh()
+                    await self._fire_due()
+            except Exception as e:
+                logger.error(f"{self.name}: scheduler pass failed: {e}")
+
+            timeout = LEASE_SECONDS / 3
+            if self.is_leader:
+                timeout = min(timeout, max(next_poll - loop.time(), 0))
+                if self._heap:
+                    timeout = min(timeout, max((self._heap[0][0] - datetime.utcnow()).total_seconds(), 0))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+
+def as_datetime(value: Any) -> Optional[datetime]:
+    """Naive UTC datetime from a stored datetime, ISO string or date"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo is not None else value
+    if isinstance(value, date):
+        # A date deadline lasts through that day
+        return datetime.combine(value, datetime.min.time()) + timedelta(days=1)
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    elif len(str(value)) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def _stamp(deadline: datetime) -> str:
+    return deadline.strftime('%Y%m%dT%H%M')
+
+
+async def plan_deadline(
+    scheduler: JobScheduler,
+    item_type: str,
+    item_id: str,
+    title: str,
+    deadline: Optional[datetime],
+    active: bool = True
+) -> int:
+    """
+    (Re)schedule the reminders and the expiry job for one item's deadline and
+    cancel any left over from an earlier deadline. Returns the jobs kept.
+    """
+    source = f"{item_type}:{item_id}"
+    deadline = as_datetime(deadline)
+    keep = []
+    if active and deadline is not None:
+        now = datetime.utcnow()
+        payload = {"item_type": item_type, "item_id": item_id, "title": title, "deadline": deadline}
+        for days in REMINDER_DAYS:
+            run_at = deadline - timedelta(days=days)
+            if run_at > now:
+                key = f"{source}:remind:{days}d:{_stamp(deadline)}"
+                await scheduler.schedule(key, "deadline_reminder", run_at, {**payload, "days": days}, source)
+                keep.append(key)
+        # Expired items are deactivated straight away
+        key = f"{source}:expire:{_stamp(deadline)}"
+        await scheduler.schedule(key, f"{item_type}_expire", max(deadline, now), payload, source)
+        keep.append(key)
+    await scheduler.cancel(source, keep)
+    return len(keep)
+
+
+async def plan_notification_expiry(scheduler: JobScheduler, notification: Dict[str, Any]):
+    expires_at = as_datetime(notification.get("expires_at"))
+    if expires_at is None:
+        return
+    source = f"notification:{notification['id']}"
+    key = f"{source}:expire:{_stamp(expires_at)}"
+    await scheduler.schedule(
+        key, "notification_expire", max(expires_at, datetime.utcnow()), {"id": notification["id"]}, source
+    )
+    await scheduler.cancel(source, [key])
+
+
+async def sync_alerts(db, scheduler: JobScheduler) -> int:
+    """Plan jobs for every active alert with a deadline (catches rows written elsewhere)"""
+    planned = 0
+    async for alert in db.alerts.find({"is_active": True, "deadline": {"$ne": None}}, {"_id": 0, "id": 1, "title": 1, "deadline": 1}):
+        planned += await plan_deadline(scheduler, "alert", alert["id"], alert["title"], as_datetime(alert["deadline"]))
+    return planned
+
+
+async def sync_notifications(db, scheduler: JobScheduler) -> int:
+    planned = 0
+    async for notification in db.notifications.find(
+        {"expires_at": {"$ne": None}, "expired": {"$ne": True}}, {"_id": 0, "id": 1, "expires_at": 1}
+    ):
+        await plan_notification_expiry(scheduler, notification)
+        planned += 1
+    return planned
+
+
+async def expire_alert(db, alert_id: str) -> bool:
+    result = await db.alerts.update_one(
+        {"id": alert_id, "is_active": True, "deadline": {"$lte": datetime.utcnow()}},
+        {"$set": {"is_active": False}}
+    )
+    return result.modified_count == 1
+
+
+def reminder_id(item_type: str, item_id: str, deadline: datetime, days: int) -> str:
+    """Stable notification id per reminder, so a replayed job doesn't send it twice"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"deadline-reminder:{item_type}:{item_id}:{_stamp(deadline)}:{days}"))
+
+
+def reminder_text(title: str, deadline: datetime, days: int) -> Dict[str, str]:
+    when = "tomorrow" if days == 1 else f"in {days} days"
+    return {
+        "title": f"Deadline {when}: {title}",
+        "message": f"{title} closes {when}, on {deadline.strftime('%B %d, %Y')}. Don't miss it!",
+    }
@@ -0,0 +1,158 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, Any
+from datetime import datetime
+import asyncio
+import os
+import logging
+
+import storage
+
+logger = logging.getLogger(__name__)
+
+# Post-upload optimization is opt-in; it needs Pillow (images, plus pillow-heif
+# for HEIC) and pikepdf (PDF linearization). Missing libraries just skip that
+# file type.
+OPTIMIZATION_ENABLED = os.environ.get('DOCUMENT_OPTIMIZATION', 'false').lower() == 'true'
+OPTIMIZER_WORKERS = int(os.environ.get('DOCUMENT_OPTIMIZER_WORKERS', '2'))
+MAX_IMAGE_DIMENSION = int(os.environ.get('DOCUMENT_MAX_IMAGE_DIMENSION', '2400'))
+JPEG_QUALITY = int(os.environ.get('DOCUMENT_JPEG_QUALITY', '82'))
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.heic', '.heif'}
+PDF_EXTENSIONS = {'.pdf'}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pending = set()
+
+
+def _optimize_image(src: Path) -> Optional[Path]:
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+
+    if src.suffix.lower() in {'.heic', '.heif'}:
+        try:
+            from pillow_heif import register_heif_opener
+            register_heif_opener()
+        except ImportError:
+            return None
+
+    with Image.open(src) as image:
+        # Phone cameras store rotation in EXIF; bake it in before stripping metadata
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION))
+
+        if src.suffix.lower() == '.png' and image.mode in ('RGBA', 'LA', 'P'):
+            dest = src.with_name(f"{src.stem}_opt.png")
+            image.save(dest, format='PNG', optimize=True)
+        else:
+            dest = src.with_name(f"{src.stem}_opt.jpg")
+            image.convert('RGB').save(dest, format='JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return dest
+
+
+def _linearize_pdf(src: Path) -> Optional[Path]:
+    try:
+        import pikepdf
+    except ImportError:
+        return None
+
+    dest = src.with_name(f"{src.stem}_opt.pdf")
+    with pikepdf.open(src) as pdf:
+        pdf.save(dest, linearize=True, compress_streams=True,
+                 object_stream_mode=pikepdf.ObjectStreamMode.generate)
+    return dest
+
+
+def optimize_file(file_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Produce an optimized copy of an uploaded file (runs in a worker process).
+    Returns None when the type is unsupported or the result isn't smaller;
+    images that grow are discarded, PDFs are kept for fast first-page view.
+    """
+    src = Path(file_path)
+    suffix = src.suffix.lower()
+
+    if suffix in IMAGE_EXTENSIONS:
+        dest = _optimize_image(src)
+        keep_if_larger = suffix in {'.heic', '.heif'}  # browsers can't display HEIC
+    elif suffix in PDF_EXTENSIONS:
+        dest = _linearize_pdf(src)
+        keep_if_larger = True
+    else:
+        return None
+
+    if dest is None:
+        return None
+
+    original_size = src.stat().st_size
+    optimized_size = dest.stat().st_size
+    if optimized_size >= original_size and not keep_if_larger:
+        dest.unlink()
+        return None
+
+    return {
+        "optimized_path": str(dest),
+        "original_size": original_size,
+        "optimized_size": optimized_size
+    }
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=OPTIMIZER_WORKERS)
+    return _pool
+
+
+async def _optimize_document(db, document_id: str, organization_id: str, file_path: str):
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(_get_pool(), optimize_file, file_path)
+    except Exception as e:
+        logger.error(f"Error optimizing document {document_id}: {e}")
+        return
+
+    if not result:
+        return
+
+    # Only swap in the optimized copy if the document still points at this upload
+    update_result = await db.documents.update_one(
+        {"id": document_id, "file_path": file_path},
+        {
+            "$set": {
+                "file_path": result["optimized_path"],
+                "file_size": result["optimized_size"],
+                "original_file_path": file_path,
+                "original_file_size": result["original_size"],
+                "optimized_at": datetime.utcnow()
+            }
+        }
+    )
+
+    if update_result.matched_count == 0:
+        Path(result["optimized_path"]).unlink(missing_ok=True)
+        return
+
+    await storage.record_usage(db, organization_id, result["optimized_size"], 1)
+    logger.info(
+        f"Optimized document {document_id}: {result['original_size']} -> {result['optimized_size']} bytes"
+    )
+
+
+def schedule_optimization(db, document_id: str, organization_id: str, file_path: str):
+    """Queue an uploaded file for background optimization (no-op when disabled)"""
+    if not OPTIMIZATION_ENABLED:
+        return
+    task = asyncio.create_task(_optimize_document(db, document_id, organization_id, file_path))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+def shutdown():
+    """Stop the worker pool, abandoning queued optimizations"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,273 @@
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import json
+import os
+import secrets
+import logging
+
+import jwt
+from starlette.websockets import WebSocketDisconnect
+
+logger = logging.getLogger(__name__)
+
+# One live connection per client, multiplexing topics:
+#   alerts                tenant alerts for the token's organization
+#   notifications         the token's user plus broadcasts (with unread counts)
+#   applications:<id>     status changes for an application named in the token
+# Clients get a signed token from POST /live/token and connect to the
+# /live WebSocket, or to the /live/stream SSE endpoint where WebSockets are
+# blocked; both carry the same {"topic", "event", "data"} messages.
+# Each connection has a bounded queue. A client that falls behind has its
+# backlog replaced by a single "resync" message per topic (it should refetch)
+# and one that stops reading for SEND_TIMEOUT_SECONDS is disconnected.
+TOKEN_SECRET = os.environ.get('LIVE_CHANNEL_SECRET') or secrets.token_hex(32)
+TOKEN_TTL_MINUTES = int(os.environ.get('LIVE_CHANNEL_TOKEN_MINUTES', '60'))
+TOKEN_AUDIENCE = "live"
+MAX_CONNECTIONS = int(os.environ.get('LIVE_CHANNEL_MAX_CONNECTIONS', '1000'))
+QUEUE_SIZE = 256
+SEND_TIMEOUT_SECONDS = 10
+HEARTBEAT_SECONDS = 15
+MAX_APPLICATIONS = 50  # per token
+
+if not os.environ.get('LIVE_CHANNEL_SECRET'):
+    logger.warning("LIVE_CHANNEL_SECRET is not set; live channel tokens only work on the worker that issued them")
+
+
+class LiveChannelError(Exception):
+    pass
+
+
+def issue_token(user_id: Optional[str], organization_id: str, application_ids: List[str]) -> Dict[str, Any]:
+    """Anonymous tokens (no user_id) only see broadcast notifications"""
+    expires_at = datetime.utcnow() + timedelta(minutes=TOKEN_TTL_MINUTES)
+    claims = {"org": organization_id, "apps": application_ids, "aud": TOKEN_AUDIENCE, "exp": expires_at}
+    if user_id:
+        claims["sub"] = user_id
+    token = jwt.encode(claims, TOKEN_SECRET, algorithm="HS256")
+    return {"token": token, "expires_at": expires_at}
+
+
+def verify_token(token: Optional[str]) -> Dict[str, Any]:
+    if not token:
+        raise LiveChannelError("Missing live channel token")
+    try:
+        return jwt.decode(token, TOKEN_SECRET, algorithms=["HS256"], audience=TOKEN_AUDIENCE)
+    except jwt.PyJWTError as e:
+        raise LiveChannelError(f"Invalid live channel token: {e}")
+
+
+def _internal_topics(claims: Dict[str, Any], topic: str) -> Optional[List[str]]:
+    """Hub keys behind a client topic, or None if the token doesn't allow it"""
+    if topic == "alerts":
+        return [f"alerts:{claims['org']}"]
+    if topic == "notifications":
+        return [f"notifications:{claims['sub']}", "notifications:*"] if claims.get("sub") else ["notifications:*"]
+    if topic.startswith("applications:") and topic.split(":", 1)[1] in claims.get("apps", []):
+        return [topic]
+    return None
+
+
+class LiveConnection:
+    def __init__(self, claims: Dict[str, Any]):
+        self.claims = claims
+        self.user_id: Optional[str] = claims.get("sub")
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.topics: Dict[str, List[str]] = {}
+        self.dropped = 0
+
+    def offer(self, message: Dict[str, Any]) -> bool:
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            pass
+        # Collapse the backlog: state messages are superseded by a refetch
+        stale_topics = {message["topic"]}
+        while not self.queue.empty():
+            stale_topics.add(self.queue.get_nowait()["topic"])
+            self.dropped += 1
+        for topic in sorted(stale_topics):
+            self.queue.put_nowait({"topic": topic, "event": "resync", "data": {}})
+        return False
+
+
+class LiveHub:
+    def __init__(self, max_connections: int = MAX_CONNECTIONS):
+        self.max_connections = max_connections
+        self._connections: Set[LiveConnection] = set()
+        self._by_key: Dict[str, Set[LiveConnection]] = {}
+        self._stats = {"published": 0, "delivered": 0, "resyncs": 0, "rejected": 0, "slow_disconnects": 0}
+
+    def connect(self, claims: Dict[str, Any]) -> LiveConnection:
+        if len(self._connections) >= self.max_connections:
+            self._stats["rejected"] += 1
+            raise LiveChannelError("Too many live connections on this worker")
+        connection = LiveConnection(claims)
+        self._connections.add(connection)
+        return connection
+
+    def disconnect(self, connection: LiveConnection):
+        for topic in list(connection.topics):
+            self.unsubscribe(connection, [topic])
+        self._connections.discard(connection)
+
+    def subscribe(self, connection: LiveConnection, topics: Iterable[str]) -> Tuple[List[str], List[str]]:
+        allowed, denied = [], []
+        for topic in topics:
+            keys = _internal_topics(connection.claims, topic)
+            if keys is None:
+                denied.append(topic)
+                continue
+            connection.topics[topic] = keys
+            for key in keys:
+                self._by_key.setdefault(key, set()).add(connection)
+            allowed.append(topic)
+        return allowed, denied
+
+    def unsubscribe(self, connection: LiveConnection, topics: Iterable[str]):
+        for topic in topics:
+            for key in connection.topics.pop(topic, []):
+                subscribers = self._by_key.get(key)
+                if subscribers is not None:
+                    subscribers.discard(connection)
+                    if not subscribers:
+                        del self._by_key[key]
+
+    def publish(self, key: str, event: str, data: Any):
+        """Fan out to every connection subscribed to hub key `key` (e.g. "alerts:<org>")"""
+        self._stats["published"] += 1
+        topic = "applications:" + key.split(":", 1)[1] if key.startswith("applications:") else key.split(":", 1)[0]
+        for connection in self._by_key.get(key, ()):
+            if connection.offer({"topic": topic, "event": event, "data": data}):
+                self._stats["delivered"] += 1
+            else:
+                self._stats["resyncs"] += 1
+
+    def slow_disconnect(self):
+        self._stats["slow_disconnects"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "connections": len(self._connections),
+            "max_connections": self.max_connections,
+            "topics": len(self._by_key),
+            **self._stats
+        }
+
+
+def encode(message: Dict[str, Any]) -> str:
+    return json.dumps(message, default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v))
+
+
+async def next_batch(connection: LiveConnection, timeout: float) -> List[Dict[str, Any]]:
+    """Wait for at least one message, then take whatever else is already queued"""
+    try:
+        batch = [await asyncio.wait_for(connection.queue.get(), timeout=timeout)]
+    except asyncio.TimeoutError:
+        return []
+    while not connection.queue.empty():
+        batch.append(connection.queue.get_nowait())
+    return batch
+
+
+async def with_unread_counts(
+    connection: LiveConnection,
+    batch: List[Dict[str, Any]],
+    unread_count: Callable[[Optional[str]], Awaitable[int]]
+) -> List[Dict[str, Any]]:
+    """Follow a batch touching notifications with the user's unread count"""
+    if any(message["topic"] == "notifications" and message["event"] != "unread_count" for message in batch):
+        count = await unread_count(connection.user_id)
+        batch.append({"topic": "notifications", "event": "unread_count", "data": {"unread_count": count}})
+    return batch
+
+
+async def serve_websocket(
+    hub: LiveHub,
+    websocket,
+    unread_count: Callable[[Optional[str]], Awaitable[int]]
+):
+    """Run one WebSocket: client ops in, topic messages out, until either side stops"""
+    try:
+        claims = verify_token(websocket.query_params.get("token"))
+    except LiveChannelError as e:
+        await websocket.close(code=4401, reason=str(e))
+        return
+    try:
+        connection = hub.connect(claims)
+    except LiveChannelError as e:
+        await websocket.close(code=1013, reason=str(e))  # try again later
+        return
+
+    await websocket.accept()
+
+    async def receive():
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                await websocket.send_text(encode({"op": "error", "detail": "Messages must be JSON"}))
+                continue
+            op, topics = message.get("op"), message.get("topics") or []
+            if op == "subscribe":
+                allowed, denied = hub.subscribe(connection, topics)
+                await websocket.send_text(encode({"op": "subscribed", "topics": allowed, "denied": denied}))
+                if "notifications" in allowed:
+                    count = await unread_count(connection.user_id)
+                    connection.offer({"topic": "notifications", "event": "unread_count", "data": {"unread_count": count}})
+            elif op == "unsubscribe":
+                hub.unsubscribe(connection, topics)
+                await websocket.send_text(encode({"op": "unsubscribed", "topics": topics}))
+            elif op == "ping":
+                await websocket.send_text(encode({"op": "pong"}))
+
+    async def send():
+        while True:
+            batch = await next_batch(connection, HEARTBEAT_SECONDS)
+            if not batch:
+                continue  # uvicorn pings idle WebSockets itself
+            batch = await with_unread_counts(connection, batch, unread_count)
+            try:
+                await asyncio.wait_for(websocket.send_text(encode({"op": "batch", "messages": batch})), SEND_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                hub.slow_disconnect()
+                await websocket.close(code=1008, reason="Client too slow")
+                return
+
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(send())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() and not isinstance(task.exception(), WebSocketDisconnect):
+                logger.error(f"Live channel connection failed: {task.exception()}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        hub.disconnect(connection)
+
+
+async def stream(
+    hub: LiveHub,
+    connection: LiveConnection,
+    unread_count: Callable[[Optional[str]], Awaitable[int]],
+    is_disconnected: Callable[[], Awaitable[bool]]
+):
+    """SSE fallback body: the same messages as the WebSocket, one per event"""
+    try:
+        yield "retry: 5000\n\n"
+        yield f"event: subscribed\ndata: {encode({'topics': list(connection.topics)})}\n\n"
+        if "notifications" in connection.topics:
+            count = await unread_count(connection.user_id)
+            connection.offer({"topic": "notifications", "event": "unread_count", "data": {"unread_count": count}})
+        while True:
+            batch = await next_batch(connection, HEARTBEAT_SECONDS)
+            if not batch:
+                if await is_disconnected():
+                    break
+                yield ": ping\n\n"
+                continue
+            for message in await with_unread_counts(connection, batch, unread_count):
+                yield f"data: {encode(message)}\n\n"
+    finally:
+        hub.disconnect(connection)
@@ -0,0 +1,221 @@
+from typing import Any, Dict, Optional
+from datetime import datetime
+import os
+import logging
+
+from pymongo import ReturnDocument
+
+from caching import AsyncTTLCache
+import notification_receipts
+
+logger = logging.getLogger(__name__)
+
+# Unread notification counters, one per recipient plus one for active
+# broadcasts ("*"), so a user's unread count is a key lookup plus their
+# broadcast receipts (see notification_receipts) instead of a scan.
+# A notification contributes to its counter while its `counted` flag is set:
+# unread and not expired for personal ones, not expired for broadcasts (whose
+# read state is per reader). Every transition clears or sets the flag with a
+# conditional update and only adjusts the counter when that update matched,
+# so concurrent requests and workers never double count. Expiry is driven by
+# deadline_scheduler jobs, which also set `expired` so listings can filter on
+# a flag instead of comparing expires_at at query time. Counts are cached
+# in memory for COUNT_CACHE_SECONDS; this worker's own writes refresh the
+# cache immediately. rebuild() recomputes everything from the notifications.
+COLLECTION = "notification_unread_counts"
+BROADCAST = "*"
+# Bumped when what `counted` means changes, so ensure_built() redoes the flags
+COUNTER_VERSION = 2
+COUNT_CACHE_SECONDS = float(os.environ.get('NOTIFICATION_COUNT_CACHE_SECONDS', '5'))
+
+count_cache = AsyncTTLCache(ttl=COUNT_CACHE_SECONDS, max_entries=10000)
+
+
+def _key(user_id: Optional[str]) -> str:
+    return BROADCAST if user_id is None else user_id
+
+
+def should_count(notification: Dict[str, Any], now: Optional[datetime] = None) -> bool:
+    expires_at = notification.get("expires_at")
+    if expires_at is not None and expires_at <= (now or datetime.utcnow()):
+        return False
+    return notification.get("user_id") is None or not notification.get("is_read")
+
+
+async def ensure_indexes(db):
+    # (user_id, counted, seq) comes from notification_receipts
+    await db.notifications.create_index([("counted", 1), ("expires_at", 1)])
+
+
+async def _adjust(db, user_id: Optional[str], delta: int):
+    if not delta:
+        return
+    key = _key(user_id)
+    if user_id is None:
+        # Every reader's cached broadcast count is now stale
+        count_cache.invalidate()
+    counter = await db[COLLECTION].find_one_and_update(
+        {"_id": key},
+        {"$inc": {"count": delta}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    count_cache.set(key, counter["count"])
+
+
+async def _read(db, key: str) -> int:
+    counter = await db[COLLECTION].find_one({"_id": key})
+    return counter["count"] if counter else 0
+
+
+async def unread_count(db, user_id: Optional[str]) -> int:
+    """Unread, unexpired notifications addressed to the user or broadcast"""
+    if user_id is None:
+        # No read receipts without a reader: every active broadcast is unread
+        return max(await count_cache.get(BROADCAST, lambda: _read(db, BROADCAST)), 0)
+    personal = await count_cache.get(user_id, lambda: _read(db, user_id))
+    broadcast = await count_cache.get(
+        ("broadcast", user_id), lambda: notification_receipts.unread_broadcasts(db, user_id)
+    )
+    return broadcast + max(personal, 0)
+
+
+async def created(db, notification: Dict[str, Any]):
+    """Call after inserting a notification that was stamped by prepare()"""
+    if notification.get("counted"):
+        await _adjust(db, notification.get("user_id"), 1)
+
+
+def prepare(notification: Dict[str, Any]) -> Dict[str, Any]:
+    notification["counted"] = should_count(notification)
+    return notification
+
+
+async def mark_read(db, notification_id: str, user_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Mark one notification read for `user_id`. Returns the notification's
+    user_id and seq with `changed` set, or None if it doesn't exist; raises
+    ValueError for a broadcast without a reader.
+    """
+    notification = await db.notifications.find_one(
+        {"id": notification_id}, {"_id": 0, "user_id": 1, "seq": 1}
+    )
+    if not notification:
+        return None
+
+    if notification.get("user_id") is None:
+        if not user_id:
+            raise ValueError("user_id is required to mark a broadcast notification read")
+        notification["changed"] = await notification_receipts.mark_read(db, user_id, notification["seq"])
+        count_cache.invalidate(("broadcast", user_id))
+        return notification
+
+    before = await db.notifications.find_one_and_update(
+        {"id": notification_id},
+        {"$set": {"is_read": True, "counted": False}},
+        projection={"_id": 0, "is_read": 1, "counted": 1}
+    )
+    if before is None:
+        return None
+    if before.get("counted"):
+        await _adjust(db, notification["user_id"], -1)
+    notification["changed"] = not before.get("is_read")
+    return notification
+
+
+async def mark_all_read(db, user_id: str) -> bool:
+    """Mark the user's notifications and every broadcast so far read for them"""
+    result = await db.notifications.update_many(
+        {"user_id": user_id, "counted": True},
+        {"$set": {"is_read": True, "counted": False}}
+    )
+    await _adjust(db, user_id, -result.modified_count)
+    # Unread but already expired; anything counted here arrived after the update above
+    expired = await db.notifications.update_many(
+        {"user_id": user_id, "is_read": False, "counted": {"$ne": True}},
+        {"$set": {"is_read": True}}
+    )
+    broadcasts = await notification_receipts.mark_all_read(db, user_id)
+    count_cache.invalidate(("broadcast", user_id))
+    return bool(result.modified_count or expired.modified_count or broadcasts)
+
+
+async def deleted(db, notification: Dict[str, Any]):
+    """Call with the document returned by find_one_and_delete"""
+    if notification.get("counted"):
+        await _adjust(db, notification.get("user_id"), -1)
+
+
+async def sync(db, notification_id: str):
+    """Re-derive one notification's counted and expired flags after an arbitrary update"""
+    notification = await db.notifications.find_one({"id": notification_id}, {"_id": 0})
+    if not notification:
+        return
+    expires_at = notification.get("expires_at")
+    expired = expires_at is not None and expires_at <= datetime.utcnow()
+    if notification.get("expired", False) != expired:
+        await db.notifications.update_one({"id": notification_id}, {"$set": {"expired": expired}})
+    if should_count(notification):
+        result = await db.notifications.update_one(
+            {"id": notification_id, "counted": {"$ne": True}},
+            {"$set": {"counted": True}}
+        )
+        await _adjust(db, notification.get("user_id"), result.modified_count)
+    else:
+        result = await db.notifications.update_one(
+            {"id": notification_id, "counted": True},
+            {"$set": {"counted": False}}
+        )
+        await _adjust(db, notification.get("user_id"), -result.modified_count)
+
+
+async def expire(db, notification_id: str) -> bool:
+    """Deactivate one notification once its expires_at has passed"""
+    before = await db.notifications.find_one_and_update(
+        {"id": notification_id, "expired": {"$ne": True}, "expires_at": {"$lte": datetime.utcnow()}},
+        {"$set": {"expired": True, "counted": False}},
+        projection={"_id": 0, "user_id": 1, "counted": 1}
+    )
+    if before is None:
+        return False
+    if before.get("counted"):
+        await _adjust(db, before.get("user_id"), -1)
+    return True
+
+
+async def rebuild(db) -> Dict[str, Any]:
+    """
+    Recompute every counted flag and counter from the notifications. Writes
+    racing with a rebuild can leave a counter off by their delta until the
+    next one, so run it at startup or from the admin endpoint.
+    """
+    now = datetime.utcnow()
+    active = {"$and": [
+        {"$or": [{"expires_at": None}, {"expires_at": {"$gt": now}}]},
+        {"$or": [{"user_id": None}, {"is_read": False}]}
+    ]}
+    await db.notifications.update_many({"$nor": [active]}, {"$set": {"counted": False}})
+    await db.notifications.update_many(active, {"$set": {"counted": True}})
+    await db.notifications.update_many({"expires_at": {"$ne": None, "$lte": now}}, {"$set": {"expired": True}})
+
+    counts = {BROADCAST: 0}
+    async for row in db.notifications.aggregate([
+        {"$match": {"counted": True}},
+        {"$group": {"_id": "$user_id", "count": {"$sum": 1}}}
+    ]):
+        counts[_key(row["_id"])] = row["count"]
+
+    await db[COLLECTION].delete_many({"_id": {"$nin": list(counts)}})
+    for key, count in counts.items():
+        await db[COLLECTION].replace_one({"_id": key}, {"count": count, "rebuilt_at": now}, upsert=True)
+    await db[COLLECTION].update_one({"_id": BROADCAST}, {"$set": {"version": COUNTER_VERSION}})
+    count_cache.invalidate()
+    logger.info(f"Rebuilt unread notification counters for {len(counts)} recipients")
+    return {"recipients": len(counts), "active_broadcasts": counts[BROADCAST], "rebuilt_at": now}
+
+
+async def ensure_built(db):
+    """Build the counters once for notifications that predate them (or this COUNTER_VERSION)"""
+    marker = await db[COLLECTION].find_one({"_id": BROADCAST})
+    if not marker or marker.get("version", 1) < COUNTER_VERSION:
+        await rebuild(db)
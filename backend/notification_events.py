@@ -0,0 +1,167 @@
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from datetime import datetime
+import asyncio
+import itertools
+import json
+import os
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# In-process pub/sub behind GET /notifications/stream. Routes that change
+# notifications publish an event addressed to a user (or None for broadcast)
+# and every open stream for that user gets it, plus a fresh unread count.
+# Event ids are "<worker epoch>-<sequence>"; a reconnect carrying Last-Event-ID
+# from this worker is replayed from a ring buffer, anything else (another
+# worker, a restart, an id older than the buffer) gets a resync instead.
+# Streams also re-read their unread count every RESYNC_SECONDS, which bounds
+# how stale a stream can be for changes made through another worker.
+HEARTBEAT_SECONDS = float(os.environ.get('NOTIFICATION_STREAM_HEARTBEAT_SECONDS', '15'))
+RESYNC_SECONDS = float(os.environ.get('NOTIFICATION_STREAM_RESYNC_SECONDS', '300'))
+MAX_CONNECTIONS = int(os.environ.get('NOTIFICATION_STREAM_MAX_CONNECTIONS', '500'))
+REPLAY_BUFFER = 1000
+SUBSCRIBER_QUEUE = 100
+RECONNECT_MS = 5000
+
+
+class StreamLimitReached(Exception):
+    pass
+
+
+class _Subscriber:
+    def __init__(self, user_id: Optional[str]):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE)
+        self.overflowed = False
+
+    def wants(self, target: Optional[str]) -> bool:
+        return target is None or target == self.user_id
+
+
+class NotificationBroker:
+    def __init__(self, max_connections: int = MAX_CONNECTIONS):
+        self.max_connections = max_connections
+        self.epoch = uuid.uuid4().hex[:8]
+        self._sequence = itertools.count(1)
+        self._recent: deque = deque(maxlen=REPLAY_BUFFER)
+        self._subscribers: Set[_Subscriber] = set()
+        self._stats = {"published": 0, "delivered": 0, "overflowed": 0, "rejected": 0}
+        self._listeners: List[Callable[[Optional[str], str, Dict[str, Any]], None]] = []
+
+    def add_listener(self, listener: Callable[[Optional[str], str, Dict[str, Any]], None]):
+        """Also hand every published event to `listener` (e.g. another transport)"""
+        self._listeners.append(listener)
+
+    def publish(self, target: Optional[str], event: str, data: Dict[str, Any]):
+        """Fan an event out to every stream of `target` (all streams when None)"""
+        event_id = f"{self.epoch}-{next(self._sequence)}"
+        entry = (event_id, target, event, data)
+        self._recent.append(entry)
+        self._stats["published"] += 1
+        for listener in self._listeners:
+            listener(target, event, data)
+        for subscriber in self._subscribers:
+            if subscriber.overflowed or not subscriber.wants(target):
+                continue
+            try:
+                subscriber.queue.put_nowait(entry)
+                self._stats["delivered"] += 1
+            except asyncio.QueueFull:
+                # A stalled client is cut off; it reconnects with Last-Event-ID
+                subscriber.overflowed = True
+                self._stats["overflowed"] += 1
+
+    def subscribe(self, user_id: Optional[str], last_event_id: Optional[str] = None) -> Tuple[_Subscriber, Optional[List[Tuple]]]:
+        """
+        Register a stream and return it with the events it missed since
+        `last_event_id` (None when those can't be recovered). Both happen
+        without yielding to the loop, so nothing is delivered twice.
+        """
+        if len(self._subscribers) >= self.max_connections:
+            self._stats["rejected"] += 1
+            raise StreamLimitReached()
+        subscriber = _Subscriber(user_id)
+        self._subscribers.add(subscriber)
+        return subscriber, self._replay(user_id, last_event_id)
+
+    def unsubscribe(self, subscriber: _Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def _replay(self, user_id: Optional[str], last_event_id: Optional[str]) -> Optional[List[Tuple]]:
+        """Buffered events after `last_event_id`, or None when they can't be recovered"""
+        epoch, _, sequence = (last_event_id or "").partition("-")
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        last = int(sequence)
+        if self._recent and int(self._recent[0][0].split("-")[1]) > last + 1:
+            return None
+        return [
+            entry for entry in self._recent
+            if int(entry[0].split("-")[1]) > last and (entry[1] is None or entry[1] == user_id)
+        ]
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "connections": len(self._subscribers),
+            "max_connections": self.max_connections,
+            "buffered_events": len(self._recent),
+            **self._stats
+        }
+
+
+def _encode(value: Any) -> str:
+    return json.dumps(value, default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v))
+
+
+def format_event(event: str, data: Dict[str, Any], event_id: Optional[str] = None) -> str:
+    lines = [f"id: {event_id}"] if event_id else []
+    lines += [f"event: {event}", f"data: {_encode(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream(
+    broker: NotificationBroker,
+    subscriber: _Subscriber,
+    replayed: Optional[List[Tuple]],
+    unread_count: Callable[[Optional[str]], Awaitable[int]],
+    is_disconnected: Callable[[], Awaitable[bool]]
+):
+    """SSE body for one subscriber; always unsubscribes when the client goes away"""
+    user_id = subscriber.user_id
+    try:
+        yield f"retry: {RECONNECT_MS}\n\n"
+        for event_id, _, event, data in replayed or []:
+            yield format_event(event, data, event_id)
+        count = await unread_count(user_id)
+        yield format_event("unread_count", {"unread_count": count, "resync": replayed is None})
+
+        loop = asyncio.get_running_loop()
+        resync_at = loop.time() + RESYNC_SECONDS
+        while not subscriber.overflowed:
+            try:
+                event_id, _, event, data = await asyncio.wait_for(subscriber.queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    break
+                if loop.time() >= resync_at:
+                    resync_at = loop.time() + RESYNC_SECONDS
+                    latest = await unread_count(user_id)
+                    if latest != count:
+                        count = latest
+                        yield format_event("unread_count", {"unread_count": count})
+                        continue
+                yield ": ping\n\n"
+                continue
+
+            yield format_event(event, data, event_id)
+            # Coalesce a burst of events into one count refresh
+            while not subscriber.queue.empty():
+                event_id, _, event, data = subscriber.queue.get_nowait()
+                yield format_event(event, data, event_id)
+            count = await unread_count(user_id)
+            yield format_event("unread_count", {"unread_count": count})
+            resync_at = loop.time() + RESYNC_SECONDS
+    finally:
+        broker.unsubscribe(subscriber)
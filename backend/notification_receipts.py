@@ -0,0 +1,130 @@
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+import logging
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# Per-user read state for broadcast notifications without a row per user and
+# broadcast. Broadcasts get an increasing `seq`; each reader has one document
+#   {_id: user_id, watermark: n, read: [seq, ...]}
+# where every broadcast with seq <= watermark counts as read, plus the
+# listed ones above it. Mark-all-read moves the watermark to the latest seq;
+# single reads go into `read` and the watermark advances past them once no
+# unread active broadcast sits below. Unread broadcasts for a user are then
+# one range query on (user_id, counted, seq).
+COLLECTION = "notification_read_state"
+SEQUENCES = "notification_sequences"
+SEQUENCE_ID = "broadcast"
+
+
+async def ensure_indexes(db):
+    await db.notifications.create_index([("user_id", 1), ("counted", 1), ("seq", 1)])
+    await db.notifications.create_index("seq", sparse=True)
+
+
+async def next_sequence(db) -> int:
+    sequence = await db[SEQUENCES].find_one_and_update(
+        {"_id": SEQUENCE_ID},
+        {"$inc": {"value": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return sequence["value"]
+
+
+async def current_sequence(db) -> int:
+    sequence = await db[SEQUENCES].find_one({"_id": SEQUENCE_ID})
+    return sequence["value"] if sequence else 0
+
+
+async def assign_missing_sequences(db) -> int:
+    """Number broadcasts created before read receipts existed, oldest first"""
+    assigned = 0
+    cursor = db.notifications.find(
+        {"user_id": None, "seq": {"$exists": False}}, {"_id": 1}
+    ).sort("created_at", 1)
+    async for notification in cursor:
+        await db.notifications.update_one(
+            {"_id": notification["_id"], "seq": {"$exists": False}},
+            {"$set": {"seq": await next_sequence(db)}}
+        )
+        assigned += 1
+    if assigned:
+        logger.info(f"Assigned read-receipt sequences to {assigned} broadcast notifications")
+    return assigned
+
+
+async def read_state(db, user_id: str) -> Dict[str, Any]:
+    state = await db[COLLECTION].find_one({"_id": user_id})
+    return state or {"_id": user_id, "watermark": 0, "read": []}
+
+
+def is_read(state: Dict[str, Any], seq: Optional[int]) -> bool:
+    return seq is not None and (seq <= state["watermark"] or seq in state["read"])
+
+
+def unread_filter(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Query for the active broadcasts this reader hasn't read"""
+    seq: Dict[str, Any] = {"$gt": state["watermark"]}
+    if state["read"]:
+        seq["$nin"] = state["read"]
+    return {"user_id": None, "counted": True, "seq": seq}
+
+
+async def unread_broadcasts(db, user_id: str) -> int:
+    return await db.notifications.count_documents(unread_filter(await read_state(db, user_id)))
+
+
+async def mark_read(db, user_id: str, seq: int) -> bool:
+    """Record that the user read one broadcast; returns False if it already was"""
+    state = await read_state(db, user_id)
+    if is_read(state, seq):
+        return False
+    state = await db[COLLECTION].find_one_and_update(
+        {"_id": user_id},
+        {"$addToSet": {"read": seq}, "$setOnInsert": {"watermark": 0}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    await _compact(db, state)
+    return True
+
+
+async def mark_all_read(db, user_id: str) -> bool:
+    """Mark every broadcast so far read; returns False if nothing changed"""
+    latest = await current_sequence(db)
+    state = await read_state(db, user_id)
+    if state["watermark"] >= latest and not state["read"]:
+        return False
+    await db[COLLECTION].update_one(
+        {"_id": user_id},
+        {"$max": {"watermark": latest}, "$pull": {"read": {"$lte": latest}}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+    return True
+
+
+async def _compact(db, state: Dict[str, Any]):
+    """Advance the watermark over read (or no longer active) broadcasts"""
+    read: List[int] = state.get("read", [])
+    if not read:
+        return
+    watermark = state["watermark"]
+    cursor = db.notifications.find(
+        {"user_id": None, "counted": True, "seq": {"$gt": watermark}}, {"_id": 0, "seq": 1}
+    ).sort("seq", 1).limit(len(read) + 1)
+    advanced = watermark
+    async for notification in cursor:
+        if notification["seq"] not in read:
+            break
+        advanced = notification["seq"]
+    else:
+        # Every active broadcast above the watermark is read
+        advanced = max(read)
+    if advanced > watermark:
+        await db[COLLECTION].update_one(
+            {"_id": state["_id"], "watermark": watermark},
+            {"$set": {"watermark": advanced}, "$pull": {"read": {"$lte": advanced}}}
+        )
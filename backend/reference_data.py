@@ -0,0 +1,189 @@
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# HUD area median incomes and HHS poverty guidelines for every area and year
+# we serve. The CSV sources in reference_data/ are packed into versioned
+# NumPy arrays:
+#   REFERENCE_DATA_DIR/<version>/ami.npy  float32 [area, year, household size 1-8]
+#   REFERENCE_DATA_DIR/<version>/fpl.npy  float32 [region, year, size 1-8 + additional person]
+#   REFERENCE_DATA_DIR/<version>/index.json  area/region/year labels
+#   REFERENCE_DATA_DIR/CURRENT  name of the active version
+# The arrays are opened with mmap_mode="r", so every worker process shares
+# one copy in the page cache. Versions are content hashes; repacking the same
+# sources is a no-op. Missing values are NaN.
+SOURCE_DIR = Path(__file__).parent / "reference_data"
+REFERENCE_DATA_DIR = Path(os.environ.get('REFERENCE_DATA_DIR', SOURCE_DIR / "packed"))
+HOUSEHOLD_SIZES = 8
+RELOAD_CHECK_SECONDS = 60
+
+DEFAULT_AREA = "METRO19260M19260"  # Danville, VA MSA
+DEFAULT_POVERTY_REGION = "48_states"
+
+
+class ReferenceTables:
+    def __init__(self, version_dir: Path):
+        self.version = version_dir.name
+        self.ami = np.load(version_dir / "ami.npy", mmap_mode="r")
+        self.fpl = np.load(version_dir / "fpl.npy", mmap_mode="r")
+        index = json.loads((version_dir / "index.json").read_text())
+        self.built_at = index["built_at"]
+        self.areas: List[Dict[str, str]] = index["areas"]
+        self.area_years: List[int] = index["area_years"]
+        self.regions: List[str] = index["regions"]
+        self.region_years: List[int] = index["region_years"]
+        self._area_index = {area["code"]: i for i, area in enumerate(self.areas)}
+        self._region_index = {region: i for i, region in enumerate(self.regions)}
+
+    def _row(self, table: np.ndarray, labels: Dict[str, int], years: List[int], key: str, year: Optional[int], kind: str) -> np.ndarray:
+        if key not in labels:
+            raise KeyError(f"Unknown {kind} '{key}'")
+        rows = table[labels[key]]
+        available = [i for i, y in enumerate(years) if not np.isnan(rows[i]).all()]
+        if year is None:
+            if not available:
+                raise KeyError(f"No data for {kind} '{key}'")
+            return np.array(rows[available[-1]])
+        if year not in years or years.index(year) not in available:
+            raise KeyError(f"No {year} data for {kind} '{key}'")
+        return np.array(rows[years.index(year)])
+
+    def ami_by_household_size(self, area_code: str, year: Optional[int] = None) -> np.ndarray:
+        """Median income for household sizes 1-8 (latest year when `year` is None)"""
+        return self._row(self.ami, self._area_index, self.area_years, area_code, year, "area")
+
+    def fpl_monthly_150(self, region: str, year: Optional[int] = None) -> np.ndarray:
+        """Monthly 150% poverty guideline for household sizes 1-8"""
+        row = self._row(self.fpl, self._region_index, self.region_years, region, year, "poverty guideline region")
+        return (row[:HOUSEHOLD_SIZES] * 1.5 / 12).round()
+
+    def years_for_area(self, area_code: str) -> List[int]:
+        rows = self.ami[self._area_index[area_code]]
+        return [y for i, y in enumerate(self.area_years) if not np.isnan(rows[i]).all()]
+
+    def has_area(self, area_code: str) -> bool:
+        return area_code in self._area_index
+
+    def has_region(self, region: str) -> bool:
+        return region in self._region_index
+
+
+def _source_hash(*paths: Path) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def pack(
+    income_limits_csv: Path = SOURCE_DIR / "income_limits.csv",
+    poverty_guidelines_csv: Path = SOURCE_DIR / "poverty_guidelines.csv",
+    activate: bool = True
+) -> str:
+    """Pack the CSV sources into a new version directory and return its name"""
+    version = _source_hash(income_limits_csv, poverty_guidelines_csv)
+    target = REFERENCE_DATA_DIR / version
+
+    if not target.exists():
+        ami_rows = pd.read_csv(income_limits_csv, dtype={"area_code": str})
+        fpl_rows = pd.read_csv(poverty_guidelines_csv, dtype={"region": str})
+        ami_columns = [f"ami_{n}" for n in range(1, HOUSEHOLD_SIZES + 1)]
+        fpl_columns = [f"size_{n}" for n in range(1, HOUSEHOLD_SIZES + 1)] + ["additional_person"]
+
+        areas = ami_rows.drop_duplicates("area_code").sort_values("area_code")
+        area_codes = areas["area_code"].tolist()
+        area_years = sorted(ami_rows["year"].unique().tolist())
+        ami = np.full((len(area_codes), len(area_years), HOUSEHOLD_SIZES), np.nan, dtype=np.float32)
+        ami[
+            ami_rows["area_code"].map({c: i for i, c in enumerate(area_codes)}).to_numpy(),
+            ami_rows["year"].map({y: i for i, y in enumerate(area_years)}).to_numpy()
+        ] = ami_rows[ami_columns].to_numpy(dtype=np.float32)
+
+        regions = sorted(fpl_rows["region"].unique().tolist())
+        region_years = sorted(fpl_rows["year"].unique().tolist())
+        fpl = np.full((len(regions), len(region_years), HOUSEHOLD_SIZES + 1), np.nan, dtype=np.float32)
+        fpl[
+            fpl_rows["region"].map({r: i for i, r in enumerate(regions)}).to_numpy(),
+            fpl_rows["year"].map({y: i for i, y in enumerate(region_years)}).to_numpy()
+        ] = fpl_rows[fpl_columns].to_numpy(dtype=np.float32)
+
+        staging = REFERENCE_DATA_DIR / f".{version}.{os.getpid()}.tmp"
+        staging.mkdir(parents=True, exist_ok=True)
+        np.save(staging / "ami.npy", ami)
+        np.save(staging / "fpl.npy", fpl)
+        (staging / "index.json").write_text(json.dumps({
+            "built_at": datetime.utcnow().isoformat(),
+            "areas": [
+                {"code": row.area_code, "name": row.area_name, "state": row.state}
+                for row in areas.itertuples()
+            ],
+            "area_years": [int(y) for y in area_years],
+            "regions": regions,
+            "region_years": [int(y) for y in region_years],
+        }))
+        try:
+            staging.rename(target)
+        except OSError:
+            # Another process packed the same sources first
+            shutil.rmtree(staging, ignore_errors=True)
+        logger.info(f"Packed reference data version {version}: {len(area_codes)} areas, {len(regions)} poverty regions")
+
+    if activate:
+        pointer = REFERENCE_DATA_DIR / f".CURRENT.{os.getpid()}.tmp"
+        pointer.write_text(version)
+        os.replace(pointer, REFERENCE_DATA_DIR / "CURRENT")
+    return version
+
+
+_tables: Optional[ReferenceTables] = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def tables() -> ReferenceTables:
+    """
+    The active tables for this process. The CURRENT pointer is re-read at most
+    every RELOAD_CHECK_SECONDS so a newly packed version is picked up by every
+    worker without a restart. Packs the bundled sources on first use.
+    """
+    global _tables, _checked_at
+    if _tables is not None and time.monotonic() - _checked_at < RELOAD_CHECK_SECONDS:
+        return _tables
+
+    with _lock:
+        current = REFERENCE_DATA_DIR / "CURRENT"
+        version = current.read_text().strip() if current.exists() else pack()
+        if _tables is None or _tables.version != version:
+            _tables = ReferenceTables(REFERENCE_DATA_DIR / version)
+            logger.info(f"Loaded reference data version {version}")
+        _checked_at = time.monotonic()
+        return _tables
+
+
+def describe() -> Dict[str, Any]:
+    active = tables()
+    return {
+        "version": active.version,
+        "built_at": active.built_at,
+        "areas": [{**area, "years": active.years_for_area(area["code"])} for area in active.areas],
+        "poverty_guideline_regions": active.regions,
+    }
+
+
+if __name__ == "__main__":
+    # python reference_data.py [income_limits.csv poverty_guidelines.csv]
+    paths = [Path(p) for p in sys.argv[1:3]]
+    print(pack(*paths))
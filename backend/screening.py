@@ -0,0 +1,109 @@
+from io import BytesIO
+from typing import Any, Dict, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+import calculators
+
+# Bulk eligibility screening for intake events. Each uploaded row is a
+# household with a size and an income (annual or monthly); an optional
+# monthly_utility_cost adds a utility assistance estimate. Any other columns
+# (names, ids) are passed through to the results unchanged.
+MAX_ROWS = 5000
+# Generous for MAX_ROWS households with a few pass-through columns
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+STREAM_CHUNK_ROWS = 500
+RESULT_COLUMNS = [
+    "household_size", "annual_income", "monthly_income",
+    "area_median_income", "max_income_limit", "qualification_percentage", "qualifies",
+    "monthly_utility_cost", "utility_burden", "utility_eligible",
+    "assistance_percentage", "assistance_amount", "error",
+]
+
+
+def parse_households(content: bytes, filename: str) -> pd.DataFrame:
+    """Read a CSV or NDJSON upload; raises ValueError when it can't be used"""
+    name = (filename or "").lower()
+    try:
+        if name.endswith((".ndjson", ".jsonl", ".json")):
+            frame = pd.read_json(BytesIO(content), lines=True)
+        else:
+            frame = pd.read_csv(BytesIO(content))
+    except ValueError as e:
+        raise ValueError(f"Could not parse {filename or 'upload'}: {e}")
+
+    frame.columns = [str(c).strip().lower() for c in frame.columns]
+    if "household_size" not in frame.columns:
+        raise ValueError("Missing household_size column")
+    if "annual_income" not in frame.columns and "monthly_income" not in frame.columns:
+        raise ValueError("Need an annual_income or monthly_income column")
+    if len(frame) > MAX_ROWS:
+        raise ValueError(f"At most {MAX_ROWS} households per upload")
+    return frame
+
+
+def screen(frame: pd.DataFrame, ami_by_household_size: np.ndarray, fpl_150_monthly: np.ndarray) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Evaluate AMI qualification and utility assistance for every row at once"""
+    def numeric(column):
+        if column not in frame.columns:
+            return pd.Series(np.nan, index=frame.index)
+        return pd.to_numeric(frame[column], errors="coerce")
+
+    sizes = numeric("household_size")
+    annual = numeric("annual_income").fillna(numeric("monthly_income") * 12)
+    monthly = numeric("monthly_income").fillna(annual / 12)
+    utility_cost = numeric("monthly_utility_cost")
+
+    error = pd.Series(None, index=frame.index, dtype=object)
+    error[annual.isna()] = "invalid income"
+    error[(sizes.isna()) | (sizes < 1) | (sizes != sizes.round())] = "invalid household_size"
+    valid = error.isna().to_numpy()
+
+    sizes_array = sizes.fillna(1).to_numpy(dtype=np.int64)
+    qualification = calculators.income_qualification(sizes_array, annual.fillna(0).to_numpy(), ami_by_household_size)
+    utility = calculators.utility_assistance(
+        sizes_array, monthly.fillna(0).to_numpy(), utility_cost.fillna(0).to_numpy(), fpl_150_monthly
+    )
+    # Burden is undefined without a positive income, as in the single-household calculator
+    has_utility = valid & utility_cost.notna().to_numpy() & (monthly.to_numpy() > 0)
+
+    results = frame.drop(columns=[c for c in RESULT_COLUMNS if c in frame.columns]).copy()
+    results["household_size"] = sizes.where(valid).astype("Int64")
+    results["annual_income"] = annual.round(2)
+    results["monthly_income"] = monthly.round(2)
+    for column in ("area_median_income", "max_income_limit", "qualification_percentage", "qualifies"):
+        results[column] = pd.Series(qualification[column], index=frame.index).where(valid)
+    results["monthly_utility_cost"] = utility_cost
+    for column, source in (
+        ("utility_burden", "utility_burden"),
+        ("utility_eligible", "eligible"),
+        ("assistance_percentage", "assistance_percentage"),
+        ("assistance_amount", "assistance_amount"),
+    ):
+        results[column] = pd.Series(utility[source], index=frame.index).where(has_utility)
+    results["assistance_percentage"] = results["assistance_percentage"].astype("Int64")
+    results["error"] = error
+
+    summary = {
+        "households": int(len(frame)),
+        "invalid_rows": int((~valid).sum()),
+        "income_qualified": int(qualification["qualifies"][valid].sum()),
+        "utility_screened": int(has_utility.sum()),
+        "utility_eligible": int(utility["eligible"][has_utility].sum()),
+        "total_monthly_assistance": round(float(utility["assistance_amount"][has_utility].sum()), 2),
+        "by_household_size": {
+            str(size): int(count)
+            for size, count in zip(*np.unique(sizes_array[valid], return_counts=True))
+        },
+    }
+    return results, summary
+
+
+def stream_results(results: pd.DataFrame, output_format: str) -> Iterator[str]:
+    for start in range(0, len(results), STREAM_CHUNK_ROWS):
+        chunk = results.iloc[start:start + STREAM_CHUNK_ROWS]
+        if output_format == "csv":
+            yield chunk.to_csv(index=False, header=start == 0)
+        else:
+            yield chunk.to_json(orient="records", lines=True)
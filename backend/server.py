@@ -1,12 +1,21 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Header, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Header, Depends, Request, Query, WebSocket
 from dotenv import load_dotenv
+from fastapi.responses import StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
+import itertools
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, ValidationError, conint, confloat
+from typing import Any, Dict, List, Optional
+from collections import OrderedDict, defaultdict
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
+import numpy as np
+import json
 import uuid
 from datetime import datetime, timedelta
 
@@ -15,6 +24,26 @@ from supabase_config import get_supabase_client
 from supabase_service import SupabaseService
 from supabase_models import *
 
+import storage
+import document_optimizer
+import storage_gc
+from write_behind import WriteBehindBuffer
+import analytics_rollups
+import analytics_uniques
+import analytics_funnels
+import analytics_warehouse
+import analytics_cohorts
+import usage_events
+from caching import AsyncTTLCache, LRUCache
+import calculators
+import screening
+import reference_data
+import notification_events
+import notification_counts
+import notification_receipts
+import deadline_scheduler
+import live_channel
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
@@ -23,6 +52,95 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Analytics events are buffered in-process and written with insert_many
+async def write_usage_metrics(events: List[dict]):
+    inserted = events
+    try:
+        await usage_events.collection(db).insert_many(
+            [usage_events.to_document(event) for event in events], ordered=False
+        )
+    except BulkWriteError as e:
+        # Duplicate client event ids (retried beacons) are expected; anything else is not
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != 11000 for err in errors):
+            raise
+        duplicate_indexes = {err["index"] for err in errors}
+        inserted = [event for i, event in enumerate(events) if i not in duplicate_indexes]
+    
+    # Derived aggregates are best-effort: a failure here must not re-insert the raw batch
+    for sink in USAGE_METRIC_SINKS:
+        try:
+            await sink(db, inserted)
+        except Exception as e:
+            logger.error(f"Failed to update {sink.__module__}: {e}")
+
+# Aggregates maintained incrementally from every inserted batch of usage events
+USAGE_METRIC_SINKS = [
+    analytics_rollups.apply_events,
+    analytics_uniques.apply_events,
+    analytics_funnels.apply_events,
+]
+
+usage_metrics_writer = WriteBehindBuffer(
+    "usage_metrics",
+    write_usage_metrics,
+    max_queue=int(os.environ.get('ANALYTICS_QUEUE_SIZE', '20000')),
+    batch_size=int(os.environ.get('ANALYTICS_BATCH_SIZE', '500')),
+    flush_interval=float(os.environ.get('ANALYTICS_FLUSH_SECONDS', '2')),
+    overflow=os.environ.get('ANALYTICS_OVERFLOW_POLICY', 'drop_oldest')
+)
+
+# Calculator results are analytics only, so they're written behind the
+# response through a local spool that survives crashes and restarts
+async def write_calculator_results(records: List[dict]):
+    by_collection = defaultdict(list)
+    for record in records:
+        by_collection[record["collection"]].append(record["document"])
+    for collection_name, documents in by_collection.items():
+        try:
+            await db[collection_name].insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # Replayed spool records carry their original _id
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+
+calculator_results_writer = WriteBehindBuffer(
+    "calculator_results",
+    write_calculator_results,
+    max_queue=int(os.environ.get('CALCULATOR_RESULTS_QUEUE_SIZE', '20000')),
+    batch_size=500,
+    flush_interval=float(os.environ.get('CALCULATOR_RESULTS_FLUSH_SECONDS', '2')),
+    spool_dir=os.environ.get('CALCULATOR_RESULTS_SPOOL_DIR', 'spool/calculator_results')
+)
+
+def record_calculation(collection_name: str, document: dict):
+    document["_id"] = ObjectId()
+    calculator_results_writer.submit({"collection": collection_name, "document": document})
+
+# Concurrent dashboard loads share one computation for a short window
+dashboard_cache = AsyncTTLCache(ttl=float(os.environ.get('ANALYTICS_DASHBOARD_TTL_SECONDS', '30')))
+cohort_cache = AsyncTTLCache(ttl=300)
+
+# Amortization schedules are deterministic; standard terms are requested over and over
+amortization_cache = LRUCache(max_entries=int(os.environ.get('AMORTIZATION_CACHE_SIZE', '512')))
+AMORTIZATION_STREAM_CHUNK = 60  # rows per streamed chunk
+
+# What-if utility assistance surfaces, keyed by household size, utility type and ranges
+utility_grid_cache = LRUCache(max_entries=256)
+UTILITY_TYPES = ("electric", "gas", "water", "combined")
+
+# Open notification streams on this worker, fed by the notification routes
+notification_broker = notification_events.NotificationBroker()
+
+# Live WebSocket / SSE channel; notification events are forwarded to it
+live_hub = live_channel.LiveHub()
+notification_broker.add_listener(
+    lambda target, event, data: live_hub.publish(f"notifications:{target or '*'}", event, data)
+)
+
+# Deadline reminders and expiry, fired by whichever worker holds the lease
+deadline_jobs = deadline_scheduler.JobScheduler(db)
+
 # Supabase configuration
 DNDC_ORG_ID = "97fef08b-4fde-484d-b334-4b9450f9a280"  # DNDC organization ID
 
@@ -35,6 +153,32 @@ async def get_organization_context(x_organization_id: Optional[str] = Header(Non
     org_id = x_organization_id or DNDC_ORG_ID
     return org_id
 
+# Tenants choose their HUD income-limit area and poverty guideline region in
+# organization settings; both default to Danville and the 48 contiguous states
+organization_settings_cache = AsyncTTLCache(ttl=300)
+
+async def get_income_limits(organization_id: str) -> dict:
+    """AMI and monthly 150% FPL tables (household sizes 1-8) for a tenant"""
+    organization = await organization_settings_cache.get(
+        organization_id, lambda: db.organizations.find_one({"id": organization_id}, {"_id": 0, "settings": 1})
+    )
+    settings = (organization or {}).get("settings") or {}
+    tables = reference_data.tables()
+    area_code = settings.get("income_limit_area") or reference_data.DEFAULT_AREA
+    region = settings.get("poverty_guideline_region") or reference_data.DEFAULT_POVERTY_REGION
+    if not tables.has_area(area_code):
+        logger.warning(f"Organization {organization_id} uses unknown income limit area {area_code}")
+        area_code = reference_data.DEFAULT_AREA
+    if not tables.has_region(region):
+        region = reference_data.DEFAULT_POVERTY_REGION
+    return {
+        "area_code": area_code,
+        "poverty_guideline_region": region,
+        "version": tables.version,
+        "ami": tables.ami_by_household_size(area_code),
+        "fpl_150": tables.fpl_monthly_150(region),
+    }
+
 # Helper function to get Supabase service
 def get_supabase_service(organization_id: str) -> SupabaseService:
     """Get SupabaseService instance for the organization"""
@@ -99,6 +243,10 @@ class Document(BaseModel):
     file_path: Optional[str] = None
     original_filename: Optional[str] = None
     file_size: Optional[int] = None
+    organization_id: Optional[str] = None
+    original_file_path: Optional[str] = None
+    original_file_size: Optional[int] = None
+    optimized_at: Optional[datetime] = None
 
 class DocumentUpdate(BaseModel):
     is_uploaded: bool
@@ -128,6 +276,47 @@ class UsageMetric(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     user_info: Optional[dict] = None
     metadata: Optional[dict] = None
+    organization_id: Optional[str] = None
+    client_timestamp: Optional[datetime] = None
+    visitor_id: Optional[str] = None  # persistent across sessions on the same device
+
+# Compact wire format used by the batching AnalyticsTracker, e.g.
+# {"s": "<session>", "v": "<visitor>", "o": "<org id>", "e": [{"i": "<dedup id>", "t": "page_view", "p": "resources", "c": 1718000000000}]}
+class TrackedEvent(BaseModel):
+    id: str = Field(alias="i", min_length=1, max_length=128)
+    event_type: str = Field(alias="t")
+    page: str = Field(alias="p")
+    client_ts: Optional[int] = Field(None, alias="c")  # epoch milliseconds on the client
+    metadata: Optional[dict] = Field(None, alias="m")
+
+class TrackedEventBatch(BaseModel):
+    user_session: str = Field(alias="s")
+    visitor_id: Optional[str] = Field(None, alias="v", max_length=128)
+    organization_id: Optional[str] = Field(None, alias="o")
+    events: List[TrackedEvent] = Field(alias="e", max_length=200)
+
+class FunnelStep(BaseModel):
+    event_type: str
+    page: Optional[str] = None
+    metadata: Optional[dict] = None  # exact-match filters on event metadata
+
+class FunnelCreate(BaseModel):
+    name: str
+    steps: List[FunnelStep] = Field(min_length=2, max_length=10)
+    window_hours: int = Field(72, gt=0, le=24 * 30)
+    organization_id: Optional[str] = None  # None applies the funnel to every tenant
+
+class AnalyticsQuery(BaseModel):
+    dataset: str  # usage_events, applications, loan_calculations, income_qualifications, utility_assistance_calculations
+    days: int = 30
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    group_by: List[str] = []
+    bucket: Optional[str] = None  # hour, day, week, month
+    metric: str = "count"  # count, sum, mean, min, max, nunique
+    value_field: Optional[str] = None
+    filters: Dict[str, Any] = {}
+    limit: int = Field(1000, gt=0, le=10000)
 
 class AdminUser(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -180,6 +369,23 @@ class LoanCalculation(BaseModel):
     total_cost: float
     calculated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class LoanScenario(BaseModel):
+    loan_amount: float = Field(gt=0)
+    interest_rate: float = Field(ge=0, le=30)
+    loan_term_years: int = Field(gt=0, le=40)
+
+class LoanScenarioGrid(BaseModel):
+    # Every combination of the listed values is priced; bounds match LoanScenario
+    loan_amounts: List[confloat(gt=0)] = Field(min_length=1)
+    interest_rates: List[confloat(ge=0, le=30)] = Field(min_length=1)
+    loan_term_years: List[conint(gt=0, le=40)] = Field(min_length=1)
+
+class LoanBatchRequest(BaseModel):
+    scenarios: List[LoanScenario] = []
+    grid: Optional[LoanScenarioGrid] = None
+
+MAX_LOAN_SCENARIOS = 1000
+
 # Phase 3 Models - Smart Notifications
 class Notification(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -218,6 +424,10 @@ class NotificationPreference(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class LiveTokenRequest(BaseModel):
+    user_id: Optional[str] = None  # None: broadcast notifications only
+    application_ids: List[str] = []
+
 # Phase 3 Models - Community Board
 class SuccessStory(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -392,6 +602,38 @@ class PropertyUpdate(BaseModel):
     contact_email: Optional[str] = None
     program_type: Optional[str] = None
 
+class AffordabilityRequest(BaseModel):
+    household_size: int = Field(ge=1)
+    annual_income: float = Field(gt=0)
+    monthly_debts: float = Field(0, ge=0)
+    down_payment: float = Field(0, ge=0)
+    interest_rate: float = Field(4.5, ge=0, le=30)
+    loan_term_years: int = Field(30, gt=0, le=40)
+    property_tax_rate: float = Field(0, ge=0, le=0.1)  # annual, as a fraction of price
+    monthly_insurance: float = Field(0, ge=0)
+    utility_allowance: float = Field(0, ge=0)  # monthly, deducted from the rent budget
+    housing_cost_ratio: float = Field(0.30, gt=0, le=0.5)  # share of gross income for housing
+    debt_to_income_ratio: float = Field(0.43, gt=0, le=0.6)  # cap on housing + other debts
+    min_bedrooms: Optional[int] = None
+    city: Optional[str] = None
+    senior: bool = False
+    tenure: Optional[str] = None  # "own", "rent" or None for both
+    limit: int = Field(25, gt=0, le=100)
+
+# Income rules for program-restricted listings; listings with no
+# program_type are open to everyone
+PROGRAM_RULES = {
+    "mission_180": {"max_ami_share": calculators.AMI_QUALIFYING_SHARE},
+    "rental_assistance": {"max_ami_share": calculators.AMI_QUALIFYING_SHARE},
+    "first_time_buyer": {"max_ami_share": calculators.AMI_QUALIFYING_SHARE},
+    "affordable_rental": {"max_ami_share": calculators.AMI_QUALIFYING_SHARE},
+    "senior_housing": {"max_ami_share": calculators.AMI_QUALIFYING_SHARE, "requires_senior": True},
+}
+
+class ReferenceAreaSelection(BaseModel):
+    income_limit_area: str  # HUD area code, e.g. METRO19260M19260
+    poverty_guideline_region: str = "48_states"
+
 class IncomeQualification(BaseModel):
     household_size: int
     annual_income: float
@@ -399,6 +641,7 @@ class IncomeQualification(BaseModel):
     qualification_percentage: float
     qualifies: bool
     max_income_limit: float
+    area_code: Optional[str] = None  # HUD income limit area the AMI came from
     calculated_at: datetime = Field(default_factory=datetime.utcnow)
 
 class UtilityAssistance(BaseModel):
@@ -482,24 +725,40 @@ async def update_document(document_id: str, update_data: DocumentUpdate):
     return Document(**document)
 
 @api_router.post("/documents/upload/{document_id}")
-async def upload_document(document_id: str, file: UploadFile = File(...)):
+async def upload_document(
+    document_id: str,
+    file: UploadFile = File(...),
+    organization_id: str = Depends(get_organization_context)
+):
     # In a real app, you'd save the file to cloud storage
     # For now, we'll simulate file storage
-    import shutil
-    from pathlib import Path
-    
-    # Create uploads directory if it doesn't exist
-    upload_dir = Path("uploads")
-    upload_dir.mkdir(exist_ok=True)
-    
-    # Generate unique filename
-    file_extension = Path(file.filename).suffix
-    unique_filename = f"{document_id}_{uuid.uuid4().hex[:8]}{file_extension}"
-    file_path = upload_dir / unique_filename
+    existing_doc = await db.documents.find_one(
+        {"id": document_id}, {"id": 1, "organization_id": 1, "file_path": 1, "original_file_path": 1}
+    )
+    if not existing_doc:
+        raise HTTPException(status_code=404, detail="Document not found")
     
-    # Save the file
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # A new upload replaces the document's current file and its pre-optimization original
+    previous_organization_id = existing_doc.get("organization_id") or organization_id
+    previous_files = [existing_doc[key] for key in ("file_path", "original_file_path") if existing_doc.get(key)]
+    
+    # Enforce the organization's plan storage quota before writing anything;
+    # bytes held by the files being replaced count as free
+    organization = await db.organizations.find_one({"id": organization_id}, {"plan_tier": 1})
+    quota = storage.storage_quota(organization.get("plan_tier") if organization else None)
+    usage = await storage.get_usage(db, organization_id)
+    available = quota - usage["bytes_used"]
+    if previous_organization_id == organization_id:
+        available += sum(storage.stored_size(path) for path in previous_files)
+    quota_exceeded = HTTPException(status_code=413, detail="Storage quota exceeded for this organization's plan")
+    if file.size is not None and file.size > available:
+        raise quota_exceeded
+    
+    # Files are sharded per organization so no single directory grows unbounded
+    file_path = storage.build_upload_path(organization_id, document_id, file.filename)
+    file_size = storage.save_upload(file.file, file_path, available)
+    if file_size is None:
+        raise quota_exceeded
     
     # Update document in database
     update_result = await db.documents.update_one(
@@ -510,35 +769,39 @@ async def upload_document(document_id: str, file: UploadFile = File(...)):
                 "uploaded_at": datetime.utcnow(),
                 "file_path": str(file_path),
                 "original_filename": file.filename,
-                "file_size": file_path.stat().st_size if file_path.exists() else 0
+                "file_size": file_size,
+                "organization_id": organization_id,
+                "original_file_path": None,
+                "original_file_size": None,
+                "optimized_at": None
             }
         }
     )
     
     if update_result.matched_count == 0:
+        file_path.unlink()
         raise HTTPException(status_code=404, detail="Document not found")
     
+    for previous_path in previous_files:
+        await storage.remove_file(db, previous_organization_id, previous_path)
+    await storage.record_usage(db, organization_id, file_size, 1)
+    document_optimizer.schedule_optimization(db, document_id, organization_id, str(file_path))
+    
     document = await db.documents.find_one({"id": document_id})
     return Document(**document)
 
 @api_router.post("/documents/replace/{document_id}")
-async def replace_document(document_id: str, file: UploadFile = File(...)):
-    # Get existing document
-    existing_doc = await db.documents.find_one({"id": document_id})
-    if not existing_doc:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    # Delete old file if it exists
-    if existing_doc.get("file_path"):
-        old_file_path = Path(existing_doc["file_path"])
-        if old_file_path.exists():
-            old_file_path.unlink()
-    
-    # Upload new file using the same logic as upload
-    return await upload_document(document_id, file)
+async def replace_document(
+    document_id: str,
+    file: UploadFile = File(...),
+    organization_id: str = Depends(get_organization_context)
+):
+    # upload_document releases the old file (and its pre-optimization
+    # original) once the new one is stored
+    return await upload_document(document_id, file, organization_id)
 
 @api_router.get("/documents/{document_id}/download")
-async def download_document(document_id: str):
+async def download_document(document_id: str, original: bool = False):
     from fastapi.responses import FileResponse
     
     document = await db.documents.find_one({"id": document_id})
@@ -548,13 +811,21 @@ async def download_document(document_id: str):
     if not document.get("file_path"):
         raise HTTPException(status_code=404, detail="No file uploaded for this document")
     
-    file_path = Path(document["file_path"])
+    # Serve the optimized copy by default; the untouched upload stays retrievable
+    if original and document.get("original_file_path"):
+        file_path = Path(document["original_file_path"])
+    else:
+        file_path = Path(document["file_path"])
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found on disk")
     
+    filename = document.get("original_filename") or file_path.name
+    if Path(filename).suffix.lower() != file_path.suffix.lower():
+        filename = f"{Path(filename).stem}{file_path.suffix}"
+    
     return FileResponse(
         path=file_path,
-        filename=document.get("original_filename", file_path.name),
+        filename=filename,
         media_type='application/octet-stream'
     )
 
@@ -576,9 +847,12 @@ async def view_document(document_id: str):
         "name": document["name"],
         "original_filename": document.get("original_filename"),
         "file_size": document.get("file_size", 0),
+        "original_file_size": document.get("original_file_size"),
+        "optimized": document.get("optimized_at") is not None,
         "uploaded_at": document.get("uploaded_at"),
         "file_path": document["file_path"],
-        "download_url": f"/api/documents/{document_id}/download"
+        "download_url": f"/api/documents/{document_id}/download",
+        "original_download_url": f"/api/documents/{document_id}/download?original=true" if document.get("original_file_path") else None
     }
 
 @api_router.delete("/documents/{document_id}/file")
@@ -587,11 +861,10 @@ async def delete_document_file(document_id: str):
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    # Delete file from disk if it exists
-    if document.get("file_path"):
-        file_path = Path(document["file_path"])
-        if file_path.exists():
-            file_path.unlink()
+    # Delete file (and its pre-optimization original) from disk if it exists
+    for key in ("file_path", "original_file_path"):
+        if document.get(key):
+            await storage.remove_file(db, document.get("organization_id") or DNDC_ORG_ID, document[key])
     
     # Update document in database
     await db.documents.update_one(
@@ -602,7 +875,10 @@ async def delete_document_file(document_id: str):
                 "file_path": None,
                 "original_filename": None,
                 "file_size": 0,
-                "uploaded_at": None
+                "uploaded_at": None,
+                "original_file_path": None,
+                "original_file_size": None,
+                "optimized_at": None
             }
         }
     )
@@ -619,8 +895,12 @@ async def get_alerts(active_only: bool = True):
 @api_router.post("/alerts", response_model=Alert)
 async def create_alert(alert_data: AlertCreate):
     alert_dict = alert_data.dict()
+    # Stored naive UTC like every other timestamp (clients may send an offset)
+    alert_dict["deadline"] = deadline_scheduler.as_datetime(alert_dict.get("deadline"))
     alert_obj = Alert(**alert_dict)
     await db.alerts.insert_one(alert_obj.dict())
+    await deadline_scheduler.plan_deadline(deadline_jobs, "alert", alert_obj.id, alert_obj.title, alert_obj.deadline)
+    live_hub.publish(f"alerts:{DNDC_ORG_ID}", "created", alert_obj.dict())
     return alert_obj
 
 # Contact endpoints
@@ -696,8 +976,9 @@ async def update_application(application_id: str, update_data: ApplicationUpdate
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Application not found")
     
-    application = await db.applications.find_one({"id": application_id})
-    return Application(**application)
+    application = Application(**await db.applications.find_one({"id": application_id}))
+    live_hub.publish(f"applications:{application_id}", "updated", application.dict())
+    return application
 
 @api_router.post("/applications/{application_id}/documents")
 async def link_document_to_application(application_id: str, document_name: str):
@@ -733,6 +1014,10 @@ async def link_document_to_application(application_id: str, document_name: str):
                     }
                 }
             )
+            live_hub.publish(
+                f"applications:{application_id}", "documents",
+                {"id": application_id, "completed_documents": completed_docs, "progress_percentage": int(new_progress)}
+            )
     
     return {"message": "Document linked successfully", "completed_documents": completed_docs}
 
@@ -763,68 +1048,392 @@ async def calculate_loan(loan_amount: float, interest_rate: float, loan_term_yea
         )
         
         # Store calculation for analytics
-        await db.loan_calculations.insert_one(calculation.dict())
+        record_calculation("loan_calculations", calculation.dict())
         
         return calculation
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Calculation error: {str(e)}")
 
+@api_router.post("/calculate/loan/batch")
+async def calculate_loan_batch(request: LoanBatchRequest):
+    """Price many loan scenarios (explicit list and/or a grid) in one call"""
+    amounts = [s.loan_amount for s in request.scenarios]
+    rates = [s.interest_rate for s in request.scenarios]
+    terms = [s.loan_term_years for s in request.scenarios]
+    if request.grid:
+        grid = request.grid
+        if len(grid.loan_amounts) * len(grid.interest_rates) * len(grid.loan_term_years) > MAX_LOAN_SCENARIOS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_LOAN_SCENARIOS} scenarios per request")
+        for amount, rate, term in itertools.product(grid.loan_amounts, grid.interest_rates, grid.loan_term_years):
+            amounts.append(amount)
+            rates.append(rate)
+            terms.append(term)
+    
+    if not amounts:
+        raise HTTPException(status_code=400, detail="No scenarios given")
+    if len(amounts) > MAX_LOAN_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_LOAN_SCENARIOS} scenarios per request")
+    
+    results = calculators.loan_payments(amounts, rates, terms)
+    calculated_at = datetime.utcnow()
+    calculations = [
+        LoanCalculation(
+            loan_amount=amount,
+            interest_rate=rate,
+            loan_term_years=term,
+            monthly_payment=payment,
+            total_interest=interest,
+            total_cost=cost,
+            calculated_at=calculated_at
+        )
+        for amount, rate, term, payment, interest, cost in zip(
+            amounts, rates, terms,
+            results["monthly_payment"].tolist(),
+            results["total_interest"].tolist(),
+            results["total_cost"].tolist()
+        )
+    ]
+    
+    # Store all scenarios for analytics, tagged so a batch counts as one calculation
+    batch_id = str(uuid.uuid4())
+    for index, calculation in enumerate(calculations):
+        record_calculation("loan_calculations", {**calculation.dict(), "batch_id": batch_id, "batch_index": index})
+    
+    return {"count": len(calculations), "scenarios": calculations}
+
+def build_amortization(key: tuple) -> dict:
+    loan_amount, interest_rate, loan_term_years, extra_monthly_payment, extra_payment_start, one_time_payment, one_time_payment_period = key
+    schedule = calculators.amortization_schedule(*key)
+    baseline = calculators.loan_payments(loan_amount, interest_rate, loan_term_years)
+    total_interest = float(schedule["interest"].sum().round(2))
+    return {
+        "summary": {
+            "loan_amount": loan_amount,
+            "interest_rate": interest_rate,
+            "loan_term_years": loan_term_years,
+            "extra_monthly_payment": extra_monthly_payment,
+            "extra_payment_start": extra_payment_start,
+            "one_time_payment": one_time_payment,
+            "one_time_payment_period": one_time_payment_period,
+            "scheduled_payment": float(baseline["monthly_payment"]),
+            "number_of_payments": len(schedule["period"]),
+            "total_interest": total_interest,
+            "total_paid": float(schedule["payment"].sum().round(2)),
+            "interest_saved": round(max(float(baseline["total_interest"]) - total_interest, 0), 2),
+            "months_saved": loan_term_years * 12 - len(schedule["period"]),
+        },
+        "columns": {name: values.tolist() for name, values in schedule.items()},
+    }
+
+def stream_amortization(schedule: dict, output_format: str):
+    columns = schedule["columns"]
+    names = list(columns)
+    rows = list(zip(*columns.values()))
+    if output_format == "csv":
+        yield ",".join(names) + "\n"
+        for start in range(0, len(rows), AMORTIZATION_STREAM_CHUNK):
+            yield "".join(",".join(str(v) for v in row) + "\n" for row in rows[start:start + AMORTIZATION_STREAM_CHUNK])
+        return
+    
+    yield '{"summary": ' + json.dumps(schedule["summary"]) + ', "schedule": ['
+    for start in range(0, len(rows), AMORTIZATION_STREAM_CHUNK):
+        chunk = ", ".join(json.dumps(dict(zip(names, row))) for row in rows[start:start + AMORTIZATION_STREAM_CHUNK])
+        yield (", " if start else "") + chunk
+    yield "]}"
+
+@api_router.post("/calculate/screening/bulk")
+async def bulk_screen_households(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    organization_id: str = Depends(get_organization_context)
+):
+    """
+    Screen a CSV or NDJSON file of households for AMI qualification and
+    utility assistance. Results stream back one row per household (CSV or
+    NDJSON, matching the upload unless `format` is given).
+    """
+    # Never buffer (or parse) more than the largest acceptable upload
+    content = await file.read(screening.MAX_UPLOAD_BYTES + 1)
+    if len(content) > screening.MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Uploads are limited to {screening.MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+    try:
+        frame = await asyncio.to_thread(screening.parse_households, content, file.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    limits = await get_income_limits(organization_id)
+    results, summary = await asyncio.to_thread(screening.screen, frame, limits["ami"], limits["fpl_150"])
+    
+    # One analytics record per upload instead of one per household
+    batch_id = str(uuid.uuid4())
+    await db.screening_batches.insert_one({
+        "id": batch_id,
+        "organization_id": organization_id,
+        "filename": file.filename,
+        "area_code": limits["area_code"],
+        "reference_data_version": limits["version"],
+        **summary,
+        "screened_at": datetime.utcnow()
+    })
+    
+    output_format = format or ("csv" if not (file.filename or "").lower().endswith((".ndjson", ".jsonl", ".json")) else "ndjson")
+    return StreamingResponse(
+        screening.stream_results(results, output_format),
+        media_type="text/csv" if output_format == "csv" else "application/x-ndjson",
+        headers={
+            "X-Screening-Batch-Id": batch_id,
+            "X-Screening-Summary": json.dumps(summary),
+            **({"Content-Disposition": f'attachment; filename="screening_{batch_id[:8]}.csv"'} if output_format == "csv" else {})
+        }
+    )
+
+@api_router.get("/calculate/utility-assistance/grid")
+async def get_utility_assistance_grid(
+    household_size: int = Query(ge=1),
+    utility_type: str = "combined",
+    income_min: float = Query(250, gt=0),
+    income_max: Optional[float] = Query(None, gt=0),
+    income_steps: int = Query(25, ge=2, le=200),
+    cost_min: float = Query(25, ge=0),
+    cost_max: float = Query(600, gt=0),
+    cost_steps: int = Query(24, ge=2, le=200),
+    organization_id: str = Depends(get_organization_context)
+):
+    """
+    Assistance over a grid of monthly incomes (rows) and utility costs
+    (columns). The income range defaults to twice the household's 150% FPL
+    limit so the eligibility cut-off sits mid-grid.
+    """
+    if utility_type not in UTILITY_TYPES:
+        raise HTTPException(status_code=400, detail=f"utility_type must be one of {', '.join(UTILITY_TYPES)}")
+    
+    limits = await get_income_limits(organization_id)
+    max_income_for_assistance = float(limits["fpl_150"][calculators.household_index(household_size)])
+    income_max = income_max or max_income_for_assistance * 2
+    if income_max <= income_min or cost_max <= cost_min:
+        raise HTTPException(status_code=400, detail="Range maximums must exceed their minimums")
+    
+    key = (
+        limits["poverty_guideline_region"], limits["version"], household_size, utility_type,
+        round(income_min, 2), round(income_max, 2), income_steps,
+        round(cost_min, 2), round(cost_max, 2), cost_steps
+    )
+    
+    def build_grid():
+        incomes = np.linspace(income_min, income_max, income_steps).round(2)
+        costs = np.linspace(cost_min, cost_max, cost_steps).round(2)
+        surface = calculators.utility_assistance(household_size, incomes[:, None], costs[None, :], limits["fpl_150"])
+        return {
+            "household_size": household_size,
+            "utility_type": utility_type,
+            "max_income_for_assistance": max_income_for_assistance,
+            "monthly_incomes": incomes.tolist(),
+            "monthly_utility_costs": costs.tolist(),
+            "assistance_amount": surface["assistance_amount"].tolist(),
+            "assistance_percentage": surface["assistance_percentage"].tolist(),
+            "utility_burden": surface["utility_burden"].tolist(),
+        }
+    
+    return utility_grid_cache.get(key, build_grid)
+
+@api_router.post("/calculate/affordability")
+async def match_affordable_properties(
+    request: AffordabilityRequest,
+    organization_id: str = Depends(get_organization_context)
+):
+    """
+    Solve for the highest affordable rent and purchase price for a household
+    and return the listings within those limits it is eligible for, program
+    listings first, then by share of the housing budget used.
+    """
+    if request.tenure not in (None, "own", "rent"):
+        raise HTTPException(status_code=400, detail="tenure must be 'own' or 'rent'")
+    
+    monthly_income = request.annual_income / 12
+    housing_budget = max(min(
+        monthly_income * request.housing_cost_ratio,
+        monthly_income * request.debt_to_income_ratio - request.monthly_debts
+    ), 0)
+    max_rent = round(max(housing_budget - request.utility_allowance, 0), 2)
+    max_price = float(calculators.max_affordable_price(
+        housing_budget, request.interest_rate, request.loan_term_years,
+        request.down_payment, request.property_tax_rate, request.monthly_insurance
+    ))
+    
+    limits = await get_income_limits(organization_id)
+    qualification = calculators.income_qualification(request.household_size, request.annual_income, limits["ami"])
+    ami_share = request.annual_income / float(qualification["area_median_income"])
+    eligible_programs = [
+        program for program, rules in PROGRAM_RULES.items()
+        if ami_share <= rules["max_ami_share"] and (request.senior or not rules.get("requires_senior"))
+    ]
+    
+    cost_ranges = []
+    if request.tenure in (None, "own") and max_price > 0:
+        cost_ranges.append({"price": {"$gt": 0, "$lte": max_price}})
+    if request.tenure in (None, "rent") and max_rent > 0:
+        cost_ranges.append({"rent": {"$gt": 0, "$lte": max_rent}})
+    
+    matches = []
+    if cost_ranges:
+        conditions = [
+            {"status": {"$in": ["approved", "available"]}},
+            {"$or": cost_ranges},
+            {"$or": [{"program_type": None}, {"program_type": {"$in": eligible_programs}}]}
+        ]
+        if request.min_bedrooms:
+            conditions.append({"bedrooms": {"$gte": request.min_bedrooms}})
+        if request.city:
+            conditions.append({"city": request.city})
+        matches = await db.properties.find({"$and": conditions}, {"_id": 0}).to_list(1000)
+    
+    # Monthly cost of every candidate in one pass: rent as listed, or the
+    # mortgage payment plus tax and insurance at the household's assumptions
+    prices = np.array([m.get("price") or 0 for m in matches], dtype=np.float64)
+    rents = np.array([m.get("rent") or 0 for m in matches], dtype=np.float64)
+    owning = (prices > 0) & (prices <= max_price) & (request.tenure != "rent")
+    mortgage = calculators.loan_payments(np.maximum(prices - request.down_payment, 0), request.interest_rate, request.loan_term_years)
+    monthly_cost = np.where(
+        owning,
+        mortgage["monthly_payment"] + prices * request.property_tax_rate / 12 + request.monthly_insurance,
+        rents + request.utility_allowance
+    ).round(2)
+    budget_share = (monthly_cost / max(housing_budget, 0.01)).round(3)
+    
+    ranked = sorted(
+        range(len(matches)),
+        key=lambda i: (matches[i].get("program_type") is None, budget_share[i])
+    )[:request.limit]
+    
+    return {
+        "budget": {
+            "monthly_income": round(monthly_income, 2),
+            "max_monthly_housing_cost": round(housing_budget, 2),
+            "max_rent": max_rent,
+            "max_purchase_price": max_price,
+            "ami_percentage": round(ami_share * 100, 1),
+            "area_code": limits["area_code"],
+            "eligible_programs": eligible_programs,
+        },
+        "count": len(matches),
+        "matches": [
+            {
+                **Property(**matches[i]).dict(),
+                "tenure": "own" if owning[i] else "rent",
+                "estimated_monthly_cost": float(monthly_cost[i]),
+                "budget_share": float(budget_share[i]),
+            }
+            for i in ranked
+        ],
+    }
+
+@api_router.get("/reference/income-limits")
+async def get_reference_income_limits():
+    """Areas, years and poverty guideline regions in the active reference data version"""
+    return await asyncio.to_thread(reference_data.describe)
+
+@api_router.put("/organizations/{org_id}/reference-area")
+async def set_organization_reference_area(org_id: str, selection: ReferenceAreaSelection):
+    """Select the income limit area / poverty guideline region a tenant's calculators use"""
+    tables = reference_data.tables()
+    if not tables.has_area(selection.income_limit_area):
+        raise HTTPException(status_code=400, detail=f"Unknown income limit area '{selection.income_limit_area}'")
+    if not tables.has_region(selection.poverty_guideline_region):
+        raise HTTPException(status_code=400, detail=f"Unknown poverty guideline region '{selection.poverty_guideline_region}'")
+    
+    result = await db.organizations.update_one(
+        {"id": org_id},
+        {"$set": {
+            "settings.income_limit_area": selection.income_limit_area,
+            "settings.poverty_guideline_region": selection.poverty_guideline_region,
+            "updated_at": datetime.utcnow()
+        }}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    organization_settings_cache.invalidate(org_id)
+    return {"success": True, **selection.dict()}
+
+@api_router.post("/admin/reference-data/pack")
+async def pack_reference_data():
+    """Repack the bundled income limit / poverty guideline CSVs and activate them"""
+    version = await asyncio.to_thread(reference_data.pack)
+    return {"success": True, "version": version}
+
+@api_router.get("/calculate/loan/amortization")
+async def get_amortization_schedule(
+    loan_amount: float = Query(gt=0, le=10_000_000),
+    interest_rate: float = Query(ge=0, le=30),
+    loan_term_years: int = Query(gt=0, le=40),
+    extra_monthly_payment: float = Query(0, ge=0),
+    extra_payment_start: int = Query(1, ge=1),
+    one_time_payment: float = Query(0, ge=0),
+    one_time_payment_period: int = Query(0, ge=0),
+    format: str = Query("json", pattern="^(json|csv)$")
+):
+    """Month-by-month amortization schedule, optionally with extra payments, as JSON or CSV"""
+    # Normalize so equivalent requests share a cache entry
+    key = (
+        round(loan_amount, 2),
+        round(interest_rate, 4),
+        loan_term_years,
+        round(extra_monthly_payment, 2),
+        extra_payment_start if extra_monthly_payment else 1,
+        round(one_time_payment, 2),
+        one_time_payment_period if one_time_payment else 0
+    )
+    schedule = amortization_cache.get(key, lambda: build_amortization(key))
+    
+    if format == "csv":
+        filename = f"amortization_{key[0]:.0f}_{key[1]}_{key[2]}y.csv"
+        return StreamingResponse(
+            stream_amortization(schedule, "csv"),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+    return StreamingResponse(stream_amortization(schedule, "json"), media_type="application/json")
+
 @api_router.post("/calculate/income-qualification", response_model=IncomeQualification)
-async def check_income_qualification(household_size: int, annual_income: float):
+async def check_income_qualification(household_size: int, annual_income: float, organization_id: str = Depends(get_organization_context)):
     """Check income qualification for Mission 180"""
     try:
-        # Danville, VA Area Median Income (AMI) - 2024 estimates
-        ami_by_household_size = {
-            1: 52800,
-            2: 60300,
-            3: 67850,
-            4: 75350,
-            5: 81400,
-            6: 87400,
-            7: 93450,
-            8: 99450
-        }
-        
-        area_median_income = ami_by_household_size.get(household_size, 99450)
-        
-        # Mission 180 typically serves 80% AMI and below
-        max_income_limit = area_median_income * 0.8
-        qualification_percentage = (annual_income / max_income_limit) * 100
-        qualifies = annual_income <= max_income_limit
+        limits = await get_income_limits(organization_id)
+        result = calculators.income_qualification(household_size, annual_income, limits["ami"])
+        area_median_income = float(result["area_median_income"])
+        max_income_limit = float(result["max_income_limit"])
+        qualification_percentage = float(result["qualification_percentage"])
+        qualifies = bool(result["qualifies"])
         
         qualification = IncomeQualification(
             household_size=household_size,
             annual_income=annual_income,
             area_median_income=area_median_income,
-            qualification_percentage=round(qualification_percentage, 1),
+            qualification_percentage=qualification_percentage,
             qualifies=qualifies,
-            max_income_limit=round(max_income_limit, 2)
+            max_income_limit=max_income_limit,
+            area_code=limits["area_code"]
         )
         
         # Store calculation for analytics
-        await db.income_qualifications.insert_one(qualification.dict())
+        record_calculation("income_qualifications", qualification.dict())
         
         return qualification
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Calculation error: {str(e)}")
 
 @api_router.post("/calculate/utility-assistance", response_model=UtilityAssistance)
-async def calculate_utility_assistance(household_size: int, monthly_income: float, utility_type: str, monthly_utility_cost: float):
+async def calculate_utility_assistance(
+    household_size: int,
+    monthly_income: float,
+    utility_type: str,
+    monthly_utility_cost: float,
+    organization_id: str = Depends(get_organization_context)
+):
     """Calculate utility assistance eligibility"""
     try:
         # Federal Poverty Guidelines for utility assistance (150% FPL)
-        fpl_by_household_size = {
-            1: 1395,  # Monthly 150% FPL
-            2: 1875,
-            3: 2355,
-            4: 2835,
-            5: 3315,
-            6: 3795,
-            7: 4275,
-            8: 4755
-        }
-        
-        max_income_for_assistance = fpl_by_household_size.get(household_size, 4755)
+        limits = await get_income_limits(organization_id)
+        max_income_for_assistance = float(limits["fpl_150"][calculators.household_index(household_size)])
         
         if monthly_income <= max_income_for_assistance:
             # Calculate assistance based on utility burden
@@ -853,7 +1462,7 @@ async def calculate_utility_assistance(household_size: int, monthly_income: floa
         )
         
         # Store calculation for analytics
-        await db.utility_assistance_calculations.insert_one(assistance.dict())
+        record_calculation("utility_assistance_calculations", assistance.dict())
         
         return assistance
     except Exception as e:
@@ -861,88 +1470,276 @@ async def calculate_utility_assistance(household_size: int, monthly_income: floa
 
 # Analytics and Usage Tracking Endpoints
 @api_router.post("/analytics/track")
-async def track_usage(metric_data: dict):
-    """Track user interactions for analytics"""
+async def track_usage(metric_data: dict, organization_id: str = Depends(get_organization_context)):
+    """Track user interactions for analytics (queued, written in batches)"""
     try:
         metric = UsageMetric(
             event_type=metric_data.get("event_type"),
             page=metric_data.get("page"),
             user_session=metric_data.get("user_session"),
-            metadata=metric_data.get("metadata", {})
+            metadata=metric_data.get("metadata", {}),
+            organization_id=organization_id
         )
-        await db.usage_metrics.insert_one(metric.dict())
-        return {"status": "tracked"}
+        if not usage_metrics_writer.submit(metric.dict()):
+            return {"status": "dropped"}
+        return {"status": "queued"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-@api_router.get("/analytics/dashboard")
-async def get_analytics_dashboard():
-    """Get comprehensive analytics for admin dashboard"""
+# Recently seen client event ids; catches most beacon retries before they reach Mongo
+_recent_event_ids: "OrderedDict[str, None]" = OrderedDict()
+RECENT_EVENT_IDS_MAX = 50000
+
+def _remember_event_id(event_id: str):
+    """Call once an event is queued, so a retry of a dropped event still gets through"""
+    _recent_event_ids[event_id] = None
+    if len(_recent_event_ids) > RECENT_EVENT_IDS_MAX:
+        _recent_event_ids.popitem(last=False)
+
+@api_router.post("/analytics/track/batch")
+async def track_usage_batch(request: Request, x_organization_id: Optional[str] = Header(None)):
+    """
+    Track a batch of events in the compact format sent by AnalyticsTracker.
+    Accepts text/plain bodies so navigator.sendBeacon can post without a preflight.
+    """
     try:
-        # Get date range for last 30 days
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        
-        # Page views by day
-        page_views_pipeline = [
-            {"$match": {"timestamp": {"$gte": thirty_days_ago}, "event_type": "page_view"}},
-            {"$group": {
-                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
-                "count": {"$sum": 1}
-            }},
-            {"$sort": {"_id": 1}}
-        ]
-        page_views = await db.usage_metrics.aggregate(page_views_pipeline).to_list(100)
-        
-        # Most popular pages
-        popular_pages_pipeline = [
-            {"$match": {"timestamp": {"$gte": thirty_days_ago}, "event_type": "page_view"}},
-            {"$group": {"_id": "$page", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 10}
-        ]
-        popular_pages = await db.usage_metrics.aggregate(popular_pages_pipeline).to_list(100)
+        payload = json.loads(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Body must be JSON: {e}")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Body must be a JSON object")
+    try:
+        batch = TrackedEventBatch(**payload)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    organization_id = x_organization_id or batch.organization_id or DNDC_ORG_ID
+    now = datetime.utcnow()
+    accepted = duplicates = dropped = 0
+    
+    for event in batch.events:
+        if event.id in _recent_event_ids:
+            duplicates += 1
+            continue
         
-        # Application completion rates
-        total_applications = await db.applications.count_documents({})
-        completed_applications = await db.applications.count_documents({"status": {"$in": ["approved", "denied"]}})
-        in_progress_applications = await db.applications.count_documents({"status": {"$in": ["submitted", "under_review"]}})
+        try:
+            client_time = datetime.utcfromtimestamp(event.client_ts / 1000) if event.client_ts else None
+        except (OverflowError, OSError, ValueError):
+            client_time = None
+        # Trust the client clock only within a sane window around receipt
+        if client_time and now - timedelta(hours=24) <= client_time <= now + timedelta(minutes=5):
+            timestamp = client_time
+        else:
+            timestamp = now
         
+        metric = UsageMetric(
+            id=event.id,
+            event_type=event.event_type,
+            page=event.page,
+            user_session=batch.user_session,
+            visitor_id=batch.visitor_id,
+            timestamp=timestamp,
+            client_timestamp=client_time,
+            metadata=event.metadata or {},
+            organization_id=organization_id
+        )
+        if usage_metrics_writer.submit(metric.dict()):
+            _remember_event_id(event.id)
+            accepted += 1
+        else:
+            dropped += 1
+    
+    return {"status": "queued", "accepted": accepted, "duplicates": duplicates, "dropped": dropped}
+
+@api_router.post("/admin/analytics/rollups/backfill")
+async def backfill_analytics_rollups(days: int = 90):
+    """Rebuild hourly/daily analytics rollups from raw events for the last N days"""
+    end = datetime.utcnow()
+    result = await analytics_rollups.backfill(db, end - timedelta(days=days), end, DNDC_ORG_ID)
+    await analytics_uniques.backfill(db, result["start"], result["end"], DNDC_ORG_ID)
+    return {"success": True, **result}
+
+@api_router.post("/admin/analytics/timeseries/migrate")
+async def migrate_usage_metrics_timeseries():
+    """Copy historic usage_metrics into the time-series collection (resumable)"""
+    return await usage_events.migrate_to_timeseries(db)
+
+@api_router.get("/analytics/uniques")
+async def get_unique_visitors(days: int = 30, page: Optional[str] = None, organization_id: Optional[str] = None):
+    """Estimated unique sessions and visitors (HyperLogLog, see relative_error)"""
+    end = datetime.utcnow()
+    return await analytics_uniques.estimate_uniques(db, end - timedelta(days=days), end, organization_id, page)
+
+@api_router.post("/admin/analytics/funnels")
+async def create_funnel(funnel_data: FunnelCreate):
+    """Define a conversion funnel; it counts sessions from events ingested from now on"""
+    funnel = analytics_funnels.new_funnel(
+        funnel_data.name,
+        [step.dict(exclude_none=True) for step in funnel_data.steps],
+        funnel_data.window_hours,
+        funnel_data.organization_id
+    )
+    await db[analytics_funnels.FUNNELS].insert_one(funnel)
+    analytics_funnels.invalidate_definitions()
+    funnel.pop("_id", None)
+    return funnel
+
+@api_router.get("/admin/analytics/funnels")
+async def get_funnels():
+    return await db[analytics_funnels.FUNNELS].find({"is_active": True}, {"_id": 0}).to_list(100)
+
+@api_router.delete("/admin/analytics/funnels/{funnel_id}")
+async def delete_funnel(funnel_id: str):
+    """Stop evaluating a funnel; its collected counts are kept"""
+    result = await db[analytics_funnels.FUNNELS].update_one({"id": funnel_id}, {"$set": {"is_active": False}})
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Funnel not found")
+    analytics_funnels.invalidate_definitions()
+    return {"success": True}
+
+@api_router.get("/admin/analytics/funnels/{funnel_id}")
+async def get_funnel_report(
+    funnel_id: str,
+    days: int = 30,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    organization_id: Optional[str] = None
+):
+    """Sessions reaching each funnel step, by the day they entered the funnel"""
+    funnel = await db[analytics_funnels.FUNNELS].find_one({"id": funnel_id}, {"_id": 0})
+    if not funnel:
+        raise HTTPException(status_code=404, detail="Funnel not found")
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=days)
+    return await analytics_funnels.funnel_report(db, funnel, start, end, organization_id)
+
+@api_router.post("/admin/analytics/warehouse/snapshot")
+async def snapshot_analytics_warehouse(datasets: Optional[List[str]] = Query(None)):
+    """Export analytics collections to the local Parquet warehouse"""
+    unknown = [name for name in datasets or [] if name not in analytics_warehouse.DATASETS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown datasets: {', '.join(unknown)}")
+    return await analytics_warehouse.snapshot(db, datasets)
+
+@api_router.get("/admin/analytics/warehouse")
+async def get_analytics_warehouse():
+    """Datasets available to the analytics query endpoint"""
+    state = await db.analytics_warehouse_state.find({}).to_list(None)
+    files = await asyncio.to_thread(analytics_warehouse.describe)
+    return {
+        name: {**summary, "snapshot_at": next((s["watermark"] for s in state if s["_id"] == name), None)}
+        for name, summary in files.items()
+    }
+
+@api_router.post("/admin/analytics/query")
+async def query_analytics_warehouse(analytics_query: AnalyticsQuery):
+    """Group-by / time-bucket reporting over the Parquet snapshots (not the live database)"""
+    end = analytics_query.end or datetime.utcnow()
+    start = analytics_query.start or end - timedelta(days=analytics_query.days)
+    try:
+        return await asyncio.to_thread(
+            analytics_warehouse.query,
+            analytics_query.dataset,
+            start,
+            end,
+            group_by=analytics_query.group_by,
+            bucket=analytics_query.bucket,
+            metric=analytics_query.metric,
+            value_field=analytics_query.value_field,
+            filters=analytics_query.filters,
+            limit=analytics_query.limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/admin/analytics/cohorts")
+async def get_analytics_cohorts(weeks: int = Query(analytics_cohorts.DEFAULT_WEEKS, ge=2, le=52)):
+    """Weekly first-seen cohorts with return and application rates (refreshed in the background)"""
+    return await cohort_cache.get(weeks, lambda: analytics_cohorts.get_cohorts(db, weeks))
+
+@api_router.get("/admin/analytics/ingestion")
+async def get_analytics_ingestion_metrics():
+    """Queue depth and throughput of the buffered analytics writer"""
+    return usage_metrics_writer.metrics()
+
+@api_router.get("/admin/calculators/persistence")
+async def get_calculator_persistence_metrics():
+    """Queue depth, spool backlog and throughput of the calculator results writer"""
+    return calculator_results_writer.metrics()
+
+async def compute_analytics_dashboard():
+    """Assemble the admin analytics dashboard, running all queries concurrently"""
+    computed_at = datetime.utcnow()
+    
+    # Get date range for last 30 days
+    thirty_days_ago = computed_at - timedelta(days=30)
+    
+    (
+        page_views,
+        popular_pages,
+        total_applications,
+        completed_applications,
+        in_progress_applications,
+        total_documents,
+        uploaded_documents,
+        loan_calculations,
+        income_checks,
+        utility_calculations,
+        recent_messages,
+        uniques
+    ) = await asyncio.gather(
+        # Page views by day and most popular pages, from the daily rollups
+        analytics_rollups.daily_counts(db, "page_view", thirty_days_ago),
+        analytics_rollups.top_pages(db, "page_view", thirty_days_ago),
+        # Application completion rates
+        db.applications.count_documents({}),
+        db.applications.count_documents({"status": {"$in": ["approved", "denied"]}}),
+        db.applications.count_documents({"status": {"$in": ["submitted", "under_review"]}}),
         # Document upload rates
-        total_documents = await db.documents.count_documents({})
-        uploaded_documents = await db.documents.count_documents({"is_uploaded": True})
-        
+        db.documents.count_documents({}),
+        db.documents.count_documents({"is_uploaded": True}),
         # Calculator usage
-        loan_calculations = await db.loan_calculations.count_documents({"calculated_at": {"$gte": thirty_days_ago}})
-        income_checks = await db.income_qualifications.count_documents({"calculated_at": {"$gte": thirty_days_ago}})
-        utility_calculations = await db.utility_assistance_calculations.count_documents({"calculated_at": {"$gte": thirty_days_ago}})
-        
+        db.loan_calculations.count_documents({"calculated_at": {"$gte": thirty_days_ago}, "batch_index": {"$in": [None, 0]}}),
+        db.income_qualifications.count_documents({"calculated_at": {"$gte": thirty_days_ago}}),
+        db.utility_assistance_calculations.count_documents({"calculated_at": {"$gte": thirty_days_ago}}),
         # Contact messages
-        recent_messages = await db.contact_messages.count_documents({"created_at": {"$gte": thirty_days_ago}})
-        
-        return {
-            "page_views_by_day": page_views,
-            "popular_pages": popular_pages,
-            "applications": {
-                "total": total_applications,
-                "completed": completed_applications,
-                "in_progress": in_progress_applications,
-                "completion_rate": (completed_applications / total_applications * 100) if total_applications > 0 else 0
-            },
-            "documents": {
-                "total": total_documents,
-                "uploaded": uploaded_documents,
-                "upload_rate": (uploaded_documents / total_documents * 100) if total_documents > 0 else 0
-            },
-            "calculators": {
-                "loan_calculations": loan_calculations,
-                "income_checks": income_checks,
-                "utility_calculations": utility_calculations,
-                "total_calculations": loan_calculations + income_checks + utility_calculations
-            },
-            "engagement": {
-                "recent_messages": recent_messages
-            }
-        }
+        db.contact_messages.count_documents({"created_at": {"$gte": thirty_days_ago}}),
+        # Distinct sessions/visitors estimated from HyperLogLog sketches
+        analytics_uniques.estimate_uniques(db, thirty_days_ago, computed_at)
+    )
+    
+    return {
+        "computed_at": computed_at,
+        "page_views_by_day": page_views,
+        "popular_pages": popular_pages,
+        "applications": {
+            "total": total_applications,
+            "completed": completed_applications,
+            "in_progress": in_progress_applications,
+            "completion_rate": (completed_applications / total_applications * 100) if total_applications > 0 else 0
+        },
+        "documents": {
+            "total": total_documents,
+            "uploaded": uploaded_documents,
+            "upload_rate": (uploaded_documents / total_documents * 100) if total_documents > 0 else 0
+        },
+        "calculators": {
+            "loan_calculations": loan_calculations,
+            "income_checks": income_checks,
+            "utility_calculations": utility_calculations,
+            "total_calculations": loan_calculations + income_checks + utility_calculations
+        },
+        "engagement": {
+            "recent_messages": recent_messages
+        },
+        "unique_visitors": uniques
+    }
+
+@api_router.get("/analytics/dashboard")
+async def get_analytics_dashboard():
+    """Get comprehensive analytics for admin dashboard (memoized for a few seconds)"""
+    try:
+        return await dashboard_cache.get("dashboard", compute_analytics_dashboard)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analytics error: {str(e)}")
 
@@ -1000,14 +1797,17 @@ async def update_application_status_admin(application_id: str, status: str, note
     }
     update_data["progress_percentage"] = status_progress.get(status, 0)
     
-    result = await db.applications.update_one(
+    application = await db.applications.find_one_and_update(
         {"id": application_id},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.matched_count == 0:
+    if not application:
         raise HTTPException(status_code=404, detail="Application not found")
     
+    live_hub.publish(f"applications:{application_id}", "updated", Application(**application).dict())
     return {"success": True, "message": "Application status updated"}
 
 @api_router.get("/admin/resources")
@@ -1058,6 +1858,33 @@ async def update_message_status_admin(message_id: str, status: str):
     
     return {"success": True, "message": "Message status updated"}
 
+@api_router.get("/admin/storage/usage")
+async def get_storage_usage(organization_id: str = Depends(get_organization_context)):
+    """Storage used by an organization's uploads, with its plan quota"""
+    usage = await storage.get_usage(db, organization_id)
+    organization = await db.organizations.find_one({"id": organization_id}, {"plan_tier": 1})
+    quota = storage.storage_quota(organization.get("plan_tier") if organization else None)
+    usage["quota_bytes"] = quota
+    usage["percent_used"] = round(usage["bytes_used"] / quota * 100, 2) if quota else 0
+    return usage
+
+@api_router.post("/admin/storage/migrate")
+async def migrate_storage_layout():
+    """Move legacy flat uploads into the sharded per-organization layout"""
+    result = await storage.migrate_legacy_uploads(db, DNDC_ORG_ID)
+    return {"success": True, **result}
+
+@api_router.post("/admin/storage/gc")
+async def run_storage_gc(max_files: Optional[int] = None):
+    """Run one incremental pass of the orphaned-upload garbage collector"""
+    return await storage_gc.run_gc(db, max_files=max_files)
+
+@api_router.get("/admin/storage/gc/runs")
+async def get_storage_gc_runs(limit: int = 20):
+    """Recent garbage collector run reports"""
+    runs = await db.storage_gc_runs.find({}, {"_id": 0}).sort("started_at", -1).to_list(limit)
+    return runs
+
 @api_router.get("/admin/export/applications")
 async def export_applications():
     """Export applications data for admin reporting"""
@@ -1095,15 +1922,23 @@ async def get_admin_alerts():
 async def update_alert_admin(alert_id: str, alert_data: dict):
     """Admin endpoint to update alert"""
     update_data = {k: v for k, v in alert_data.items() if v is not None}
+    if "deadline" in update_data:
+        update_data["deadline"] = deadline_scheduler.as_datetime(update_data["deadline"])
     
-    result = await db.alerts.update_one(
+    alert = await db.alerts.find_one_and_update(
         {"id": alert_id},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.matched_count == 0:
+    if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
     
+    await deadline_scheduler.plan_deadline(
+        deadline_jobs, "alert", alert_id, alert["title"], alert.get("deadline"), alert.get("is_active", True)
+    )
+    live_hub.publish(f"alerts:{DNDC_ORG_ID}", "updated", alert)
     return {"success": True, "message": "Alert updated"}
 
 @api_router.delete("/admin/alerts/{alert_id}")
@@ -1114,6 +1949,8 @@ async def delete_alert_admin(alert_id: str):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Alert not found")
     
+    await deadline_jobs.cancel(f"alert:{alert_id}")
+    live_hub.publish(f"alerts:{DNDC_ORG_ID}", "deleted", {"id": alert_id})
     return {"success": True, "message": "Alert deleted"}
 
 # ================================
@@ -1299,18 +2136,37 @@ async def get_admin_notifications():
 @api_router.put("/admin/notifications/{notification_id}")
 async def update_notification_admin(notification_id: str, notification_data: dict):
     """Admin endpoint to update notification"""
-    update_data = {k: v for k, v in notification_data.items() if v is not None}
+    update_data = {k: v for k, v in notification_data.items() if v is not None and k != "counted"}
+    if "expires_at" in update_data:
+        update_data["expires_at"] = deadline_scheduler.as_datetime(update_data["expires_at"])
     
-    result = await db.notifications.update_one(
+    notification = await db.notifications.find_one_and_update(
         {"id": notification_id},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.matched_count == 0:
+    if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
     
+    # is_read / expires_at may have changed
+    await notification_counts.sync(db, notification_id)
+    if isinstance(notification.get("expires_at"), datetime):
+        await deadline_scheduler.plan_notification_expiry(deadline_jobs, notification)
+    notification_broker.publish(notification.get("user_id"), "updated", notification)
     return {"success": True, "message": "Notification updated"}
 
+@api_router.get("/admin/notifications/streams")
+async def get_notification_stream_metrics():
+    """Open notification streams and event delivery counters for this worker"""
+    return notification_broker.metrics()
+
+@api_router.post("/admin/notifications/unread-counts/rebuild")
+async def rebuild_unread_counts():
+    """Recompute the unread notification counters from the notifications"""
+    return await notification_counts.rebuild(db)
+
 # ================================
 # ADMIN - USER MANAGEMENT
 # ================================
@@ -1555,6 +2411,35 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("startup")
 async def startup_db():
+    await usage_events.ensure_collection(db)
+    await analytics_rollups.ensure_indexes(db)
+    await analytics_uniques.ensure_indexes(db)
+    await analytics_funnels.ensure_indexes(db)
+    await analytics_funnels.seed_default_funnels(db)
+    await usage_metrics_writer.start()
+    await calculator_results_writer.start()
+    
+    # Load (packing on first run) the income limit tables before serving calculators
+    await asyncio.to_thread(reference_data.tables)
+    
+    # Storage accounting keeps one counter document per organization
+    await db.storage_usage.create_index("organization_id", unique=True)
+    
+    # Storage GC cross-checks files against documents by path
+    await db.documents.create_index("file_path")
+    await db.documents.create_index("original_file_path", sparse=True)
+    await db.storage_quarantine.create_index("quarantined_at")
+    
+    # Affordability matching filters listings by status and price / rent ranges
+    await db.properties.create_index([("status", 1), ("price", 1)])
+    await db.properties.create_index([("status", 1), ("rent", 1)])
+    if storage_gc.GC_INTERVAL_MINUTES > 0:
+        app.state.storage_gc_task = asyncio.create_task(storage_gc.gc_loop(db))
+    if analytics_warehouse.SNAPSHOT_INTERVAL_MINUTES > 0:
+        app.state.analytics_warehouse_task = asyncio.create_task(analytics_warehouse.snapshot_loop(db))
+    if analytics_cohorts.REFRESH_MINUTES > 0:
+        app.state.analytics_cohort_task = asyncio.create_task(analytics_cohorts.refresh_loop(db))
+    
     # Initialize default documents checklist
     existing_docs = await db.documents.count_documents({})
     if existing_docs == 0:
@@ -2024,6 +2909,23 @@ async def startup_db():
             }
         ]
         await db.notifications.insert_many(sample_notifications)
+    
+    # Unread counters are maintained on every change; build them once for older data
+    await notification_receipts.ensure_indexes(db)
+    await notification_receipts.assign_missing_sequences(db)
+    await notification_counts.ensure_indexes(db)
+    await notification_counts.ensure_built(db)
+    
+    # Deadline reminders and expiry run on the scheduler's leader worker
+    deadline_jobs.register("deadline_reminder", send_deadline_reminder)
+    deadline_jobs.register("alert_expire", expire_alert)
+    deadline_jobs.register("program_expire", expire_program)
+    deadline_jobs.register("notification_expire", expire_notification)
+    deadline_jobs.every_sync(lambda: deadline_scheduler.sync_alerts(db, deadline_jobs))
+    deadline_jobs.every_sync(lambda: deadline_scheduler.sync_notifications(db, deadline_jobs))
+    deadline_jobs.every_sync(sync_program_deadlines)
+    await deadline_jobs.ensure_indexes()
+    await deadline_jobs.start()
 
 # ================================
 # SMART NOTIFICATIONS ENDPOINTS
@@ -2032,55 +2934,73 @@ async def startup_db():
 @api_router.get("/notifications", response_model=List[Notification])
 async def get_notifications(user_id: Optional[str] = None, unread_only: bool = False):
     """Get notifications for a user or broadcast notifications"""
-    query = {"$or": [{"user_id": user_id}, {"user_id": None}]} if user_id else {"user_id": None}
-    
-    # Filter out expired notifications
-    current_time = datetime.utcnow()
-    query["$or"] = [
-        {"expires_at": None},
-        {"expires_at": {"$gte": current_time}}
-    ]
+    read_state = await notification_receipts.read_state(db, user_id) if user_id else None
     
+    # Broadcast read state is per reader; personal notifications keep is_read
     if unread_only:
-        query["is_read"] = False
+        audience = [{"user_id": None, "counted": True}]
+        if user_id:
+            audience = [notification_receipts.unread_filter(read_state), {"user_id": user_id, "is_read": False}]
+    else:
+        audience = [{"user_id": None}] + ([{"user_id": user_id}] if user_id else [])
+    
+    # Expired notifications are flagged by their scheduled expiry job; the
+    # expires_at check covers the gap while the job is late or unleased
+    query = {
+        "$and": [{"$or": audience}, {"$or": [{"expires_at": None}, {"expires_at": {"$gt": datetime.utcnow()}}]}],
+        "expired": {"$ne": True}
+    }
     
     notifications = await db.notifications.find(query).sort("created_at", -1).limit(50).to_list(100)
+    for notif in notifications:
+        if notif.get("user_id") is None:
+            notif["is_read"] = bool(read_state) and notification_receipts.is_read(read_state, notif.get("seq"))
     return [Notification(**notif) for notif in notifications]
 
+async def count_unread(user_id: Optional[str]) -> int:
+    return await notification_counts.unread_count(db, user_id)
+
+async def insert_notification(notif_obj: Notification):
+    """Store a notification and update counters, streams and its expiry job"""
+    notif_obj.expires_at = deadline_scheduler.as_datetime(notif_obj.expires_at)
+    notif_doc = notification_counts.prepare(notif_obj.dict())
+    if notif_obj.user_id is None:
+        # Broadcast read state is kept per reader against this sequence
+        notif_doc["seq"] = await notification_receipts.next_sequence(db)
+    await db.notifications.insert_one(notif_doc)
+    await notification_counts.created(db, notif_doc)
+    await deadline_scheduler.plan_notification_expiry(deadline_jobs, notif_doc)
+    notification_broker.publish(notif_obj.user_id, "notification", notif_obj.dict())
+
 @api_router.get("/notifications/unread-count")
 async def get_unread_count(user_id: Optional[str] = None):
     """Get count of unread notifications"""
-    # Filter out expired notifications
-    current_time = datetime.utcnow()
-    
-    # Build query based on user_id
-    if user_id:
-        query = {
-            "is_read": False,
-            "$and": [
-                {
-                    "$or": [{"user_id": user_id}, {"user_id": None}]
-                },
-                {
-                    "$or": [
-                        {"expires_at": None},
-                        {"expires_at": {"$gte": current_time}}
-                    ]
-                }
-            ]
-        }
-    else:
-        query = {
-            "user_id": None,
-            "is_read": False,
-            "$or": [
-                {"expires_at": None},
-                {"expires_at": {"$gte": current_time}}
-            ]
-        }
-    
-    count = await db.notifications.count_documents(query)
-    return {"unread_count": count}
+    return {"unread_count": await count_unread(user_id)}
+
+@api_router.get("/notifications/stream")
+async def stream_notifications(
+    request: Request,
+    user_id: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Server-Sent Events: new notifications, read/delete changes and the
+    current unread count as it changes. EventSource resends Last-Event-ID on
+    reconnect so missed events are replayed when this worker still has them.
+    """
+    try:
+        subscriber, replayed = notification_broker.subscribe(user_id, last_event_id)
+    except notification_events.StreamLimitReached:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many notification streams; poll /notifications/unread-count instead",
+            headers={"Retry-After": "30"}
+        )
+    return StreamingResponse(
+        notification_events.stream(notification_broker, subscriber, replayed, count_unread, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @api_router.get("/notifications/{notification_id}", response_model=Notification)
 async def get_notification(notification_id: str):
@@ -2095,35 +3015,40 @@ async def create_notification(notification_data: NotificationCreate):
     """Create a new notification (admin only)"""
     notif_dict = notification_data.dict()
     notif_obj = Notification(**notif_dict)
-    await db.notifications.insert_one(notif_obj.dict())
+    await insert_notification(notif_obj)
     return notif_obj
 
 @api_router.put("/notifications/{notification_id}/read")
-async def mark_notification_read(notification_id: str):
-    """Mark a notification as read"""
-    result = await db.notifications.update_one(
-        {"id": notification_id},
-        {"$set": {"is_read": True}}
-    )
-    if result.matched_count == 0:
+async def mark_notification_read(notification_id: str, user_id: Optional[str] = None):
+    """Mark a notification as read (broadcasts only for the given user)"""
+    try:
+        notification = await notification_counts.mark_read(db, notification_id, user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
+    if notification["changed"]:
+        notification_broker.publish(notification.get("user_id") or user_id, "read", {"id": notification_id})
     return {"message": "Notification marked as read"}
 
 @api_router.put("/notifications/mark-all-read")
 async def mark_all_notifications_read(user_id: str):
     """Mark all notifications as read for a user"""
-    await db.notifications.update_many(
-        {"$or": [{"user_id": user_id}, {"user_id": None}]},
-        {"$set": {"is_read": True}}
-    )
+    if await notification_counts.mark_all_read(db, user_id):
+        notification_broker.publish(user_id, "read_all", {"user_id": user_id})
     return {"message": "All notifications marked as read"}
 
 @api_router.delete("/notifications/{notification_id}")
 async def delete_notification(notification_id: str):
     """Delete a notification (admin only)"""
-    result = await db.notifications.delete_one({"id": notification_id})
-    if result.deleted_count == 0:
+    notification = await db.notifications.find_one_and_delete(
+        {"id": notification_id},
+        projection={"_id": 0, "user_id": 1, "counted": 1}
+    )
+    if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
+    await notification_counts.deleted(db, notification)
+    notification_broker.publish(notification.get("user_id"), "deleted", {"id": notification_id})
     return {"message": "Notification deleted successfully"}
 
 # Notification Preferences
@@ -2158,6 +3083,133 @@ async def update_notification_preferences(user_id: str, preferences: dict):
     
     return {"message": "Preferences updated successfully"}
 
+# ================================
+# LIVE CHANNEL
+# ================================
+
+@api_router.post("/live/token")
+async def create_live_token(request: LiveTokenRequest, organization_id: str = Depends(get_organization_context)):
+    """
+    Signed token for the live channel, naming the applications it may follow.
+    Only the first MAX_APPLICATIONS ids are considered; the rest are reported
+    back so one oversized request doesn't cost the client its whole channel.
+    """
+    requested = list(dict.fromkeys(request.application_ids))
+    considered = requested[:live_channel.MAX_APPLICATIONS]
+    known = set(await db.applications.distinct("id", {"id": {"$in": considered}}))
+    application_ids = [app_id for app_id in considered if app_id in known]
+    return {
+        **live_channel.issue_token(request.user_id, organization_id, application_ids),
+        "application_ids": application_ids,
+        "unknown_application_ids": [app_id for app_id in considered if app_id not in known],
+        "ignored_application_ids": requested[live_channel.MAX_APPLICATIONS:]
+    }
+
+@api_router.websocket("/live")
+async def live_socket(websocket: WebSocket):
+    """Multiplexed live updates; authenticate with ?token= from POST /live/token"""
+    await live_channel.serve_websocket(live_hub, websocket, count_unread)
+
+@api_router.get("/live/stream")
+async def live_stream(request: Request, token: str, topics: str = "alerts,notifications"):
+    """SSE fallback for clients that can't open the /live WebSocket"""
+    try:
+        claims = live_channel.verify_token(token)
+    except live_channel.LiveChannelError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    try:
+        connection = live_hub.connect(claims)
+    except live_channel.LiveChannelError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    live_hub.subscribe(connection, [topic.strip() for topic in topics.split(",") if topic.strip()])
+    return StreamingResponse(
+        live_channel.stream(live_hub, connection, count_unread, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/admin/live")
+async def get_live_channel_metrics():
+    """Live channel connections and fan-out counters for this worker"""
+    return live_hub.metrics()
+
+# ================================
+# DEADLINE REMINDERS
+# ================================
+
+# Broadcast notifications aren't tenant-scoped, so only DNDC's own program
+# deadlines generate reminders
+async def plan_program_deadline(program: dict):
+    if program.get("organization_id") != DNDC_ORG_ID:
+        return
+    await deadline_scheduler.plan_deadline(
+        deadline_jobs, "program", program["id"], program.get("name", "Program"),
+        deadline_scheduler.as_datetime(program.get("application_deadline")),
+        program.get("status") == "active"
+    )
+
+async def sync_program_deadlines():
+    service = get_supabase_service(DNDC_ORG_ID)
+    result = await asyncio.to_thread(
+        lambda: service.supabase.table('programs')
+            .select('id, organization_id, name, status, application_deadline')
+            .eq('organization_id', DNDC_ORG_ID).eq('status', 'active')
+            .execute()
+    )
+    for program in result.data or []:
+        if program.get("application_deadline"):
+            await plan_program_deadline(program)
+
+async def deadline_item_is_active(item_type: str, item_id: str) -> bool:
+    if item_type == "alert":
+        return await db.alerts.count_documents({"id": item_id, "is_active": True}) > 0
+    service = get_supabase_service(DNDC_ORG_ID)
+    result = await asyncio.to_thread(
+        lambda: service.supabase.table('programs').select('status').eq('id', item_id).execute()
+    )
+    return bool(result.data) and result.data[0]["status"] == "active"
+
+async def send_deadline_reminder(payload: dict):
+    item_type, item_id, days = payload["item_type"], payload["item_id"], payload["days"]
+    deadline = payload["deadline"]
+    notification_id = deadline_scheduler.reminder_id(item_type, item_id, deadline, days)
+    if await db.notifications.count_documents({"id": notification_id}):
+        return  # sent before a crash, job replayed
+    if not await deadline_item_is_active(item_type, item_id):
+        return
+    await insert_notification(Notification(
+        id=notification_id,
+        notification_type="deadline_reminder",
+        **deadline_scheduler.reminder_text(payload["title"], deadline, days),
+        related_item_id=item_id,
+        related_item_type=item_type,
+        priority="high" if days <= 1 else "normal",
+        expires_at=deadline
+    ))
+
+async def expire_alert(payload: dict):
+    if await deadline_scheduler.expire_alert(db, payload["item_id"]):
+        live_hub.publish(f"alerts:{DNDC_ORG_ID}", "deactivated", {"id": payload["item_id"]})
+
+async def expire_program(payload: dict):
+    service = get_supabase_service(DNDC_ORG_ID)
+    await asyncio.to_thread(
+        lambda: service.supabase.table('programs')
+            .update({'status': 'inactive', 'updated_at': datetime.utcnow().isoformat()})
+            .eq('id', payload["item_id"]).eq('status', 'active')
+            .execute()
+    )
+
+async def expire_notification(payload: dict):
+    notification = await db.notifications.find_one({"id": payload["id"]}, {"_id": 0, "user_id": 1})
+    if notification and await notification_counts.expire(db, payload["id"]):
+        notification_broker.publish(notification.get("user_id"), "expired", {"id": payload["id"]})
+
+@api_router.get("/admin/scheduler")
+async def get_scheduler_status():
+    """Deadline scheduler leadership and job counts"""
+    return await deadline_jobs.metrics()
+
 # ================================
 # COMMUNITY BOARD ENDPOINTS
 # ================================
@@ -2528,6 +3580,27 @@ async def update_application_status(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/organizations/{org_id}/documents/{document_id}/upload")
+async def upload_organization_document(org_id: str, document_id: str, file: UploadFile = File(...)):
+    """Stream a document upload to the organization's Supabase storage bucket"""
+    async def read_chunks():
+        while True:
+            chunk = await file.read(1024 * 1024)
+            if not chunk:
+                break
+            yield chunk
+    
+    service = get_supabase_service(org_id)
+    result = await service.upload_document_stream(
+        document_id,
+        file.filename,
+        read_chunks(),
+        file.content_type or 'application/octet-stream'
+    )
+    if not result:
+        raise HTTPException(status_code=400, detail="Failed to upload document")
+    return {"message": "Document uploaded successfully", **result}
+
 @api_router.get("/organizations/{org_id}/alerts", response_model=List[dict])
 async def get_organization_alerts(org_id: str, active_only: bool = True):
     """Get alerts for a specific organization"""
@@ -2548,6 +3621,7 @@ async def create_organization_alert(
         service = get_supabase_service(org_id)
         alert = await service.create_alert(alert_data)
         if alert:
+            live_hub.publish(f"alerts:{org_id}", "created", alert.dict())
             return alert.dict()
         else:
             raise HTTPException(status_code=400, detail="Failed to create alert")
@@ -2643,6 +3717,7 @@ async def create_organization_program(org_id: str, program_data: dict):
         result = service.supabase.table('programs').insert(program_data).execute()
         
         if result.data:
+            await plan_program_deadline(result.data[0])
             return result.data[0]
         else:
             raise HTTPException(status_code=400, detail="Failed to create program")
@@ -2684,6 +3759,7 @@ async def update_program(org_id: str, program_id: str, program_data: dict):
         result = service.supabase.table('programs').update(program_data).eq('id', program_id).eq('organization_id', org_id).execute()
         
         if result.data:
+            await plan_program_deadline(result.data[0])
             return result.data[0]
         else:
             raise HTTPException(status_code=404, detail="Program not found")
@@ -2700,6 +3776,7 @@ async def delete_program(org_id: str, program_id: str):
         result = service.supabase.table('programs').update({'status': 'archived'}).eq('id', program_id).eq('organization_id', org_id).execute()
         
         if result.data:
+            await deadline_jobs.cancel(f"program:{program_id}")
             return {"message": "Program archived successfully"}
         else:
             raise HTTPException(status_code=404, detail="Program not found")
@@ -2853,6 +3930,16 @@ async def get_dndc_programs_dashboard():
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if getattr(app.state, "storage_gc_task", None):
+        app.state.storage_gc_task.cancel()
+    if getattr(app.state, "analytics_warehouse_task", None):
+        app.state.analytics_warehouse_task.cancel()
+    if getattr(app.state, "analytics_cohort_task", None):
+        app.state.analytics_cohort_task.cancel()
+    document_optimizer.shutdown()
+    await usage_metrics_writer.stop()
+    await calculator_results_writer.stop()
+    await deadline_jobs.stop()
     client.close()
 
 # Include the API router
@@ -0,0 +1,190 @@
+from pathlib import Path
+from typing import Dict, Any, Optional
+from datetime import datetime
+import hashlib
+import os
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Root of on-disk document storage. Files are laid out as
+#   <UPLOAD_ROOT>/<organization_id>/<aa>/<bb>/<document_id>_<suffix><ext>
+# where aa/bb are the first two byte pairs of sha1(document_id). Two levels of
+# 256-way fan-out keep every directory small even with millions of uploads.
+UPLOAD_ROOT = Path(os.environ.get('UPLOAD_DIR', 'uploads'))
+SHARD_LEVELS = 2
+
+# Storage allowance per plan tier (matches the published pricing sheet)
+GB = 1024 ** 3
+PLAN_STORAGE_QUOTAS = {
+    "starter": 5 * GB,
+    "professional": 25 * GB,
+    "enterprise": 100 * GB
+}
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+def shard_dir(organization_id: str, document_id: str) -> Path:
+    """Directory a document's files live in for the given organization"""
+    digest = hashlib.sha1(document_id.encode('utf-8')).hexdigest()
+    parts = [digest[i * 2:i * 2 + 2] for i in range(SHARD_LEVELS)]
+    return UPLOAD_ROOT.joinpath(organization_id, *parts)
+
+
+def build_upload_path(organization_id: str, document_id: str, filename: str) -> Path:
+    """Allocate a fresh path for an uploaded file, creating its shard directory"""
+    directory = shard_dir(organization_id, document_id)
+    directory.mkdir(parents=True, exist_ok=True)
+    extension = Path(filename or "").suffix
+    return directory / f"{document_id}_{uuid.uuid4().hex[:8]}{extension}"
+
+
+def is_sharded_path(file_path: str) -> bool:
+    """True if file_path already follows the per-organization sharded layout"""
+    try:
+        relative = Path(file_path).relative_to(UPLOAD_ROOT)
+    except ValueError:
+        return False
+    return len(relative.parts) == SHARD_LEVELS + 2
+
+
+def save_upload(source, file_path: Path, max_bytes: int) -> Optional[int]:
+    """
+    Copy an upload to file_path in chunks. Returns the bytes written, or None
+    (leaving nothing on disk) as soon as the upload exceeds max_bytes.
+    """
+    written = 0
+    with file_path.open("wb") as buffer:
+        while chunk := source.read(UPLOAD_CHUNK_BYTES):
+            written += len(chunk)
+            if written > max_bytes:
+                break
+            buffer.write(chunk)
+    if written > max_bytes:
+        file_path.unlink()
+        return None
+    return written
+
+
+def stored_size(file_path: Optional[str]) -> int:
+    """Size of a stored file, 0 if it is missing"""
+    try:
+        return Path(file_path).stat().st_size if file_path else 0
+    except OSError:
+        return 0
+
+
+async def record_usage(db, organization_id: str, bytes_delta: int, files_delta: int):
+    """Incrementally adjust an organization's storage counters"""
+    if not bytes_delta and not files_delta:
+        return
+    await db.storage_usage.update_one(
+        {"organization_id": organization_id},
+        {
+            "$inc": {"bytes_used": bytes_delta, "file_count": files_delta},
+            "$set": {"updated_at": datetime.utcnow()}
+        },
+        upsert=True
+    )
+
+
+async def get_usage(db, organization_id: str) -> Dict[str, Any]:
+    """Current storage usage for an organization"""
+    usage = await db.storage_usage.find_one({"organization_id": organization_id})
+    return {
+        "organization_id": organization_id,
+        "bytes_used": usage.get("bytes_used", 0) if usage else 0,
+        "file_count": usage.get("file_count", 0) if usage else 0,
+        "updated_at": usage.get("updated_at") if usage else None
+    }
+
+
+def storage_quota(plan_tier: str) -> int:
+    """Byte allowance for a plan tier (unknown tiers get the professional quota)"""
+    return PLAN_STORAGE_QUOTAS.get(plan_tier, PLAN_STORAGE_QUOTAS["professional"])
+
+
+async def remove_file(db, organization_id: str, file_path: str) -> int:
+    """Unlink a stored file and release its bytes from the usage counters"""
+    path = Path(file_path)
+    if not path.exists():
+        return 0
+    size = path.stat().st_size
+    path.unlink()
+    await record_usage(db, organization_id, -size, -1)
+    return size
+
+
+async def migrate_legacy_uploads(db, default_organization_id: str, batch_size: int = 500) -> Dict[str, Any]:
+    """
+    Move files written before sharding into the per-organization layout.
+    Safe to re-run: documents already in the sharded layout are skipped.
+    Usage counters are rebuilt afterwards so they match the files on disk.
+    """
+    moved = 0
+    missing = 0
+    skipped = 0
+
+    cursor = db.documents.find(
+        {"file_path": {"$ne": None}},
+        {"id": 1, "file_path": 1, "organization_id": 1}
+    ).batch_size(batch_size)
+
+    async for doc in cursor:
+        if is_sharded_path(doc["file_path"]):
+            skipped += 1
+            continue
+
+        old_path = Path(doc["file_path"])
+        if not old_path.exists():
+            missing += 1
+            continue
+
+        organization_id = doc.get("organization_id") or default_organization_id
+        directory = shard_dir(organization_id, doc["id"])
+        directory.mkdir(parents=True, exist_ok=True)
+        new_path = directory / old_path.name
+        os.replace(old_path, new_path)
+
+        await db.documents.update_one(
+            {"id": doc["id"]},
+            {"$set": {"file_path": str(new_path), "organization_id": organization_id}}
+        )
+        moved += 1
+
+    await rebuild_usage(db, default_organization_id)
+
+    logger.info(f"Upload migration complete: moved={moved} missing={missing} skipped={skipped}")
+    return {"moved": moved, "missing": missing, "already_sharded": skipped}
+
+
+async def rebuild_usage(db, default_organization_id: str):
+    """Recompute storage counters from document records (used after migrations)"""
+    # Optimized documents keep their original on disk, counted as a second file
+    has_original = {"$ne": [{"$ifNull": ["$original_file_path", None]}, None]}
+    pipeline = [
+        {"$match": {"is_uploaded": True, "file_path": {"$ne": None}}},
+        {"$group": {
+            "_id": {"$ifNull": ["$organization_id", default_organization_id]},
+            "bytes_used": {"$sum": {"$add": [
+                {"$ifNull": ["$file_size", 0]},
+                {"$cond": [has_original, {"$ifNull": ["$original_file_size", 0]}, 0]}
+            ]}},
+            "file_count": {"$sum": {"$cond": [has_original, 2, 1]}}
+        }}
+    ]
+    totals = await db.documents.aggregate(pipeline).to_list(None)
+
+    await db.storage_usage.delete_many({})
+    if totals:
+        now = datetime.utcnow()
+        await db.storage_usage.insert_many([
+            {
+                "organization_id": row["_id"],
+                "bytes_used": row["bytes_used"],
+                "file_count": row["file_count"],
+                "updated_at": now
+            }
+            for row in totals
+        ])
@@ -0,0 +1,208 @@
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import os
+import time
+import logging
+
+import storage
+
+logger = logging.getLogger(__name__)
+
+# Orphaned uploads are moved here first and only deleted after a grace period,
+# so a file whose document update was merely slow can still be restored.
+QUARANTINE_DIRNAME = '.quarantine'
+GC_INTERVAL_MINUTES = int(os.environ.get('STORAGE_GC_INTERVAL_MINUTES', '0'))
+GC_BATCH_SIZE = int(os.environ.get('STORAGE_GC_BATCH_SIZE', '500'))
+GC_BATCH_PAUSE_SECONDS = float(os.environ.get('STORAGE_GC_BATCH_PAUSE_SECONDS', '0.5'))
+GC_MIN_FILE_AGE_SECONDS = int(os.environ.get('STORAGE_GC_MIN_FILE_AGE_SECONDS', '3600'))
+GC_QUARANTINE_DAYS = int(os.environ.get('STORAGE_GC_QUARANTINE_DAYS', '7'))
+
+STATE_ID = "uploads"
+
+_gc_lock = asyncio.Lock()
+
+
+def _quarantine_root() -> Path:
+    return storage.UPLOAD_ROOT / QUARANTINE_DIRNAME
+
+
+def _collect_batch(after: Optional[Tuple[str, ...]], limit: int, min_age: int) -> Tuple[List[Tuple[str, int]], Optional[Tuple[str, ...]], bool]:
+    """
+    Walk UPLOAD_ROOT in sorted order and return up to `limit` files that come
+    after the `after` cursor. Directories entirely before the cursor are pruned
+    so resuming a walk doesn't rescan what earlier batches covered.
+    Returns (files, new_cursor, finished).
+    """
+    root = storage.UPLOAD_ROOT
+    cutoff = time.time() - min_age
+    found: List[Tuple[str, int]] = []
+    last: Optional[Tuple[str, ...]] = after
+
+    def walk(directory: Path, prefix: Tuple[str, ...]) -> bool:
+        nonlocal last
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except FileNotFoundError:
+            return True
+        for entry in entries:
+            parts = prefix + (entry.name,)
+            if not prefix and entry.name == QUARANTINE_DIRNAME:
+                continue
+            if after is not None and parts < after[:len(parts)]:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if not walk(Path(entry.path), parts):
+                    return False
+                continue
+            if after is not None and parts <= after:
+                continue
+            if len(found) >= limit:
+                return False
+            last = parts
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime <= cutoff:
+                found.append((str(root.joinpath(*parts)), stat.st_size))
+        return True
+
+    finished = walk(root, ())
+    return found, last, finished
+
+
+def _move(src: str, dest: str):
+    Path(dest).parent.mkdir(parents=True, exist_ok=True)
+    os.replace(src, dest)
+
+
+async def _referenced_paths(db, paths: List[str]) -> set:
+    """Which of these paths are still referenced by a document (index-backed)"""
+    referenced = set()
+    cursor = db.documents.find(
+        {"$or": [{"file_path": {"$in": paths}}, {"original_file_path": {"$in": paths}}]},
+        {"file_path": 1, "original_file_path": 1}
+    )
+    async for doc in cursor:
+        referenced.add(doc.get("file_path"))
+        referenced.add(doc.get("original_file_path"))
+    return referenced
+
+
+async def _quarantine_orphans(db, max_files: Optional[int], report: Dict[str, Any]):
+    state = await db.storage_gc_state.find_one({"_id": STATE_ID}) or {}
+    cursor = tuple(state["cursor"]) if state.get("cursor") else None
+    day = datetime.utcnow().strftime('%Y%m%d')
+
+    while max_files is None or report["scanned"] < max_files:
+        limit = GC_BATCH_SIZE if max_files is None else min(GC_BATCH_SIZE, max_files - report["scanned"])
+        batch, cursor, finished = await asyncio.to_thread(_collect_batch, cursor, limit, GC_MIN_FILE_AGE_SECONDS)
+        report["scanned"] += len(batch)
+
+        if batch:
+            referenced = await _referenced_paths(db, [path for path, _ in batch])
+            records = []
+            for path, size in batch:
+                if path in referenced:
+                    continue
+                relative = Path(path).relative_to(storage.UPLOAD_ROOT)
+                quarantined_path = str(_quarantine_root() / day / relative)
+                try:
+                    await asyncio.to_thread(_move, path, quarantined_path)
+                except OSError as e:
+                    logger.warning(f"Storage GC could not quarantine {path}: {e}")
+                    continue
+                records.append({
+                    "path": path,
+                    "quarantined_path": quarantined_path,
+                    "size": size,
+                    "quarantined_at": datetime.utcnow()
+                })
+            if records:
+                await db.storage_quarantine.insert_many(records)
+                report["quarantined"] += len(records)
+                report["quarantined_bytes"] += sum(r["size"] for r in records)
+
+        # Persist progress after every batch so an interrupted run resumes here
+        await db.storage_gc_state.update_one(
+            {"_id": STATE_ID},
+            {"$set": {
+                "cursor": None if finished else list(cursor) if cursor else None,
+                "updated_at": datetime.utcnow(),
+                **({"last_pass_completed_at": datetime.utcnow()} if finished else {})
+            }},
+            upsert=True
+        )
+
+        if finished:
+            report["pass_completed"] = True
+            break
+        await asyncio.sleep(GC_BATCH_PAUSE_SECONDS)
+
+
+async def _purge_quarantine(db, report: Dict[str, Any]):
+    expired_before = datetime.utcnow() - timedelta(days=GC_QUARANTINE_DAYS)
+
+    while True:
+        entries = await db.storage_quarantine.find(
+            {"quarantined_at": {"$lt": expired_before}}
+        ).limit(GC_BATCH_SIZE).to_list(GC_BATCH_SIZE)
+        if not entries:
+            break
+
+        # A document may have been pointed back at the file while it sat in quarantine
+        referenced = await _referenced_paths(db, [e["path"] for e in entries])
+        for entry in entries:
+            try:
+                if entry["path"] in referenced:
+                    await asyncio.to_thread(_move, entry["quarantined_path"], entry["path"])
+                    report["restored"] += 1
+                else:
+                    Path(entry["quarantined_path"]).unlink(missing_ok=True)
+                    report["purged"] += 1
+                    report["reclaimed_bytes"] += entry["size"]
+            except OSError as e:
+                logger.warning(f"Storage GC could not release {entry['quarantined_path']}: {e}")
+        await db.storage_quarantine.delete_many({"_id": {"$in": [e["_id"] for e in entries]}})
+        await asyncio.sleep(GC_BATCH_PAUSE_SECONDS)
+
+
+async def run_gc(db, max_files: Optional[int] = None) -> Dict[str, Any]:
+    """
+    One incremental GC run: quarantine unreferenced files (up to max_files
+    scanned, resuming where the previous run stopped) then permanently delete
+    quarantined files older than the grace period. Returns a run report.
+    """
+    if _gc_lock.locked():
+        return {"status": "already_running"}
+
+    async with _gc_lock:
+        report = {
+            "started_at": datetime.utcnow(),
+            "scanned": 0,
+            "quarantined": 0,
+            "quarantined_bytes": 0,
+            "purged": 0,
+            "restored": 0,
+            "reclaimed_bytes": 0,
+            "pass_completed": False
+        }
+        await _quarantine_orphans(db, max_files, report)
+        await _purge_quarantine(db, report)
+        report["finished_at"] = datetime.utcnow()
+
+        await db.storage_gc_runs.insert_one(dict(report))
+        logger.info(
+            f"Storage GC: scanned={report['scanned']} quarantined={report['quarantined']} "
+            f"purged={report['purged']} reclaimed_bytes={report['reclaimed_bytes']}"
+        )
+        return {"status": "completed", **report}
+
+
+async def gc_loop(db):
+    """Background task running the GC every STORAGE_GC_INTERVAL_MINUTES"""
+    while True:
+        await asyncio.sleep(GC_INTERVAL_MINUTES * 60)
+        try:
+            await run_gc(db)
+        except Exception as e:
+            logger.error(f"Storage GC failed: {e}")
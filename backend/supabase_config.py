@@ -101,6 +101,7 @@ CREATE TABLE documents (
     file_size INTEGER,
     original_filename VARCHAR(255),
     mime_type VARCHAR(100),
+    content_sha256 VARCHAR(64),
     is_uploaded BOOLEAN DEFAULT FALSE,
     uploaded_at TIMESTAMP WITH TIME ZONE,
     uploaded_by UUID REFERENCES users(id),
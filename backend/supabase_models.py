@@ -100,6 +100,7 @@ class MultiTenantDocument(BaseModel):
     file_size: Optional[int] = None
     original_filename: Optional[str] = None
     mime_type: Optional[str] = None
+    content_sha256: Optional[str] = None
     is_uploaded: bool = False
     uploaded_at: Optional[datetime] = None
     uploaded_by: Optional[str] = None
@@ -1,11 +1,17 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator
 from datetime import datetime
-from supabase_config import get_supabase_client
+from supabase_config import get_supabase_client, SUPABASE_URL, SUPABASE_SERVICE_KEY
 from supabase_models import *
+import base64
+import hashlib
+import httpx
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Supabase Storage's resumable (TUS) endpoint requires fixed 6MB parts
+UPLOAD_PART_SIZE = 6 * 1024 * 1024
+
 class SupabaseService:
     def __init__(self, organization_id: str, user_token: Optional[str] = None, use_service_role: bool = True):
         self.organization_id = organization_id
@@ -164,6 +170,99 @@ class SupabaseService:
             logger.error(f"Error uploading document: {e}")
             return False
     
+    async def upload_document_stream(self, document_id: str, file_path: str, chunks: AsyncIterator[bytes], mime_type: str) -> Optional[Dict[str, Any]]:
+        """
+        Stream a document to Supabase Storage in 6MB parts over the resumable
+        upload protocol, so at most one part is held in memory. Size and
+        SHA-256 are computed as bytes arrive; the documents row is only
+        updated once the final part has been accepted.
+        """
+        bucket_name = f"documents-{self.organization_id}"
+        storage_path = f"{document_id}/{file_path}"
+
+        def encode(value: str) -> str:
+            return base64.b64encode(value.encode('utf-8')).decode('ascii')
+
+        headers = {
+            'authorization': f'Bearer {SUPABASE_SERVICE_KEY}',
+            'tus-resumable': '1.0.0'
+        }
+        upload_url = None
+        digest = hashlib.sha256()
+        total_size = 0
+
+        try:
+            async with httpx.AsyncClient(timeout=httpx.Timeout(60.0)) as http:
+                created = await http.post(
+                    f"{SUPABASE_URL}/storage/v1/upload/resumable",
+                    headers={
+                        **headers,
+                        'upload-defer-length': '1',
+                        'x-upsert': 'true',
+                        'upload-metadata': ','.join([
+                            f"bucketName {encode(bucket_name)}",
+                            f"objectName {encode(storage_path)}",
+                            f"contentType {encode(mime_type)}"
+                        ])
+                    }
+                )
+                created.raise_for_status()
+                upload_url = created.headers['location']
+
+                async def send_part(part: bytes, offset: int, final: bool):
+                    part_headers = {
+                        **headers,
+                        'upload-offset': str(offset),
+                        'content-type': 'application/offset+octet-stream'
+                    }
+                    if final:
+                        part_headers['upload-length'] = str(offset + len(part))
+                    response = await http.patch(upload_url, headers=part_headers, content=part)
+                    response.raise_for_status()
+
+                # Hold back one full part so the last PATCH can declare the total length
+                buffer = bytearray()
+                offset = 0
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    digest.update(chunk)
+                    total_size += len(chunk)
+                    buffer.extend(chunk)
+                    while len(buffer) > UPLOAD_PART_SIZE:
+                        part = bytes(buffer[:UPLOAD_PART_SIZE])
+                        del buffer[:UPLOAD_PART_SIZE]
+                        await send_part(part, offset, final=False)
+                        offset += len(part)
+                await send_part(bytes(buffer), offset, final=True)
+        except Exception as e:
+            logger.error(f"Error streaming document upload: {e}")
+            if upload_url:
+                try:
+                    async with httpx.AsyncClient() as http:
+                        await http.delete(upload_url, headers=headers)
+                except Exception:
+                    pass
+            return None
+
+        try:
+            update_data = {
+                'is_uploaded': True,
+                'uploaded_at': datetime.utcnow().isoformat(),
+                'file_path': storage_path,
+                'mime_type': mime_type,
+                'file_size': total_size,
+                'content_sha256': digest.hexdigest()
+            }
+
+            result = self.supabase.table('documents').update(update_data).eq('id', document_id).eq('organization_id', self.organization_id).execute()
+            if not result.data:
+                return None
+            return update_data
+        except Exception as e:
+            logger.error(f"Error updating streamed document: {e}")
+            return None
+    
     # Alerts management
     async def get_alerts(self, active_only: bool = True) -> List[MultiTenantAlert]:
         try:
@@ -0,0 +1,111 @@
+from typing import Any, Dict, List
+from datetime import datetime, timedelta
+import os
+import logging
+
+from pymongo.errors import CollectionInvalid
+
+logger = logging.getLogger(__name__)
+
+# Raw analytics events live either in the classic `usage_metrics` collection
+# or, when USAGE_METRICS_TIMESERIES=true, in a native MongoDB (5.0+)
+# time-series collection. Time-series mode stores event_type/page/organization
+# as the bucket metaField and expires old events automatically.
+TIMESERIES_ENABLED = os.environ.get('USAGE_METRICS_TIMESERIES', 'false').lower() == 'true'
+TIMESERIES_COLLECTION = os.environ.get('USAGE_METRICS_TIMESERIES_COLLECTION', 'usage_events')
+LEGACY_COLLECTION = 'usage_metrics'
+RETENTION_DAYS = int(os.environ.get('USAGE_METRICS_RETENTION_DAYS', '395'))
+
+META_FIELDS = ("event_type", "page", "organization_id")
+
+
+def collection(db):
+    """The collection raw events are written to and read from"""
+    return db[TIMESERIES_COLLECTION] if TIMESERIES_ENABLED else db[LEGACY_COLLECTION]
+
+
+def field(name: str) -> str:
+    """Document path of an event field in the active storage mode"""
+    if TIMESERIES_ENABLED and name in META_FIELDS:
+        return f"meta.{name}"
+    return name
+
+
+def to_document(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a flat UsageMetric dict for storage"""
+    if not TIMESERIES_ENABLED:
+        return event
+    document = {k: v for k, v in event.items() if k not in META_FIELDS and v is not None}
+    document["meta"] = {name: event.get(name) for name in META_FIELDS}
+    return document
+
+
+def from_document(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a stored event back into UsageMetric field names"""
+    meta = document.get("meta")
+    if not meta:
+        return document
+    flat = {k: v for k, v in document.items() if k != "meta"}
+    flat.update(meta)
+    return flat
+
+
+async def ensure_collection(db):
+    if not TIMESERIES_ENABLED:
+        # Client-supplied event ids double as dedup keys for batched analytics
+        await db[LEGACY_COLLECTION].create_index("id", unique=True)
+        return
+
+    try:
+        await db.create_collection(
+            TIMESERIES_COLLECTION,
+            timeseries={"timeField": "timestamp", "metaField": "meta", "granularity": "minutes"},
+            expireAfterSeconds=RETENTION_DAYS * 24 * 3600
+        )
+        logger.info(f"Created time-series collection {TIMESERIES_COLLECTION}")
+    except CollectionInvalid:
+        pass
+    # Time-series collections can't have unique indexes; dedup is in-process only
+    await db[TIMESERIES_COLLECTION].create_index([("meta.event_type", 1), ("timestamp", 1)])
+    await db[TIMESERIES_COLLECTION].create_index([("meta.organization_id", 1), ("timestamp", 1)])
+
+
+async def migrate_to_timeseries(db, batch_size: int = 5000) -> Dict[str, Any]:
+    """
+    Copy historic usage_metrics into the time-series collection, oldest first.
+    Progress is checkpointed by timestamp so the copy can be resumed; events
+    older than the retention window are skipped since they'd expire at once.
+    """
+    if not TIMESERIES_ENABLED:
+        return {"status": "skipped", "reason": "USAGE_METRICS_TIMESERIES is not enabled"}
+
+    await ensure_collection(db)
+    state = await db.migrations.find_one({"_id": "usage_metrics_timeseries"}) or {}
+    retention_start = datetime.utcnow() - timedelta(days=RETENTION_DAYS)
+    watermark = max(state.get("watermark") or retention_start, retention_start)
+    copied = 0
+
+    while True:
+        # Every event sharing the boundary timestamp is copied in the same batch
+        # so the strict $gt watermark never skips or re-copies any
+        batch: List[Dict[str, Any]] = await db[LEGACY_COLLECTION].find(
+            {"timestamp": {"$gt": watermark}}, {"_id": 0}
+        ).sort("timestamp", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        boundary = batch[-1]["timestamp"]
+        if len(batch) == batch_size:
+            ties = await db[LEGACY_COLLECTION].find({"timestamp": boundary}, {"_id": 0}).to_list(None)
+            batch = [e for e in batch if e["timestamp"] != boundary] + ties
+
+        await db[TIMESERIES_COLLECTION].insert_many([to_document(e) for e in batch], ordered=False)
+        copied += len(batch)
+        watermark = boundary
+        await db.migrations.update_one(
+            {"_id": "usage_metrics_timeseries"},
+            {"$set": {"watermark": watermark, "updated_at": datetime.utcnow()}, "$inc": {"copied": len(batch)}},
+            upsert=True
+        )
+
+    logger.info(f"Copied {copied} usage events into {TIMESERIES_COLLECTION}")
+    return {"status": "completed", "copied": copied, "watermark": watermark}
@@ -0,0 +1,305 @@
+from collections import deque
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from datetime import datetime
+import asyncio
+import fcntl
+import os
+import time
+import logging
+
+from bson import json_util
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest")
+SPOOL_JSON_OPTIONS = json_util.JSONOptions(tz_aware=False)
+
+
+class _Spool:
+    """
+    Append-only JSON-lines segments holding every record that has been
+    accepted but not yet flushed. A segment is deleted once all of its records
+    are written (or dropped by the overflow policy), so whatever is left on
+    disk after a crash is the unflushed backlog plus any written or dropped
+    records that share a segment with it. Each process holds an
+    exclusive flock on the segments it owns, so several workers can share one
+    spool directory and only recover segments whose owner is gone.
+    """
+
+    def __init__(self, directory: Path, segment_records: int):
+        self.directory = directory
+        self.segment_records = segment_records
+        self._files: Dict[str, Any] = {}
+        self._pending: Dict[str, int] = {}
+        self._active: Optional[str] = None
+        self._active_count = 0
+        self._seq = 0
+
+    def _open_locked(self, name: str, mode: str):
+        handle = open(self.directory / name, mode)
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return None
+        return handle
+
+    def recover(self) -> List[Tuple[str, Any]]:
+        """Claim segments left behind by dead processes and return their records"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for path in sorted(self.directory.glob("*.jsonl")):
+            if path.name in self._files:
+                continue
+            handle = self._open_locked(path.name, "r")
+            if handle is None:
+                continue  # owned by a live process
+            records = []
+            for line in handle:
+                try:
+                    records.append(json_util.loads(line, json_options=SPOOL_JSON_OPTIONS))
+                except ValueError:
+                    # A crash mid-write leaves at most one torn final line
+                    logger.warning(f"Skipping unreadable spool line in {path.name}")
+            self._files[path.name] = handle
+            self._pending[path.name] = len(records)
+            entries.extend((path.name, record) for record in records)
+            self._release_if_done(path.name)
+        return entries
+
+    def append(self, record: Any) -> Optional[str]:
+        if self._active is None or self._active_count >= self.segment_records:
+            self._rotate()
+        handle = self._files[self._active]
+        handle.write(json_util.dumps(record, json_options=SPOOL_JSON_OPTIONS) + "\n")
+        # Hand the line to the OS now so it survives a process crash
+        handle.flush()
+        self._active_count += 1
+        self._pending[self._active] += 1
+        return self._active
+
+    def release(self, segment: Optional[str], count: int = 1):
+        if segment is None:
+            return
+        self._pending[segment] -= count
+        self._release_if_done(segment)
+
+    def sync(self):
+        """fsync the active segment (called from the flush loop, not per record)"""
+        if self._active is not None:
+            os.fsync(self._files[self._active].fileno())
+
+    def close(self):
+        self._rotate(reopen=False)
+        for handle in self._files.values():
+            handle.close()
+        self._files.clear()
+
+    def backlog(self) -> int:
+        return sum(self._pending.values())
+
+    def _rotate(self, reopen: bool = True):
+        previous = self._active
+        if previous is not None:
+            self.sync()
+            self._active = None
+            self._release_if_done(previous)
+        if reopen:
+            self._seq += 1
+            name = f"{int(time.time() * 1000):013d}-{os.getpid()}-{self._seq:06d}.jsonl"
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._files[name] = self._open_locked(name, "a")
+            self._pending[name] = 0
+            self._active = name
+            self._active_count = 0
+
+    def _release_if_done(self, segment: str):
+        if self._pending.get(segment, 1) > 0:
+            return
+        if segment == self._active:
+            # Everything written so far is flushed; start a fresh segment next time
+            self._active = None
+        handle = self._files.pop(segment)
+        os.unlink(self.directory / segment)
+        handle.close()
+        del self._pending[segment]
+
+
+class WriteBehindBuffer:
+    """
+    Bounded in-process buffer that accepts records without awaiting the
+    database and flushes them in batches from a background task, either when
+    `batch_size` records are waiting or every `flush_interval` seconds.
+
+    When the buffer is full the overflow policy decides what is lost:
+    "drop_oldest" evicts the oldest waiting record, "drop_newest" rejects the
+    incoming one. Failed flushes are retried with backoff.
+
+    With `spool_dir` set, records are also appended to a local spool (see
+    _Spool) and anything not flushed before a crash or a failed shutdown
+    drain is re-queued by the next start(). Records must then be BSON/JSON
+    serializable, and the flush function should be idempotent since a crash
+    between a write and the spool cleanup replays that batch.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush_fn: Callable[[List[Any]], Awaitable[None]],
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        overflow: str = "drop_oldest",
+        spool_dir: Optional[str] = None,
+        spool_segment_records: int = 1000
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}")
+        self.name = name
+        self.flush_fn = flush_fn
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+
+        self._spool = _Spool(Path(spool_dir), spool_segment_records) if spool_dir else None
+        # Entries are (spool segment or None, record)
+        self._queue: deque = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._stats = {
+            "accepted": 0,
+            "dropped": 0,
+            "written": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "last_flush_at": None,
+            "last_flush_size": 0,
+            "last_error": None,
+            "recovered": 0,
+            "spool_errors": 0
+        }
+
+    def submit(self, record: Any) -> bool:
+        """Enqueue a record without blocking; returns False if it was dropped"""
+        if len(self._queue) >= self.max_queue:
+            self._stats["dropped"] += 1
+            if self.overflow == "drop_newest":
+                return False
+            self._release(self._queue.popleft()[0])
+        self._queue.append((self._spool_record(record), record))
+        self._stats["accepted"] += 1
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def submit_many(self, records: List[Any]) -> int:
+        """Enqueue several records; returns how many were accepted"""
+        return sum(1 for record in records if self.submit(record))
+
+    async def start(self):
+        if self._task is None:
+            self._stopping = False
+            if self._spool is not None:
+                recovered = self._spool.recover()
+                if recovered:
+                    logger.info(f"{self.name}: re-queued {len(recovered)} spooled records")
+                self._queue.extendleft(reversed(recovered))
+                self._stats["recovered"] += len(recovered)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background flusher and write out everything still buffered"""
+        self._stopping = True
+        if self._task is not None:
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        while self._queue:
+            if not await self._flush_once():
+                if self._spool is not None:
+                    logger.error(f"{self.name}: leaving {len(self._queue)} records in the spool at shutdown")
+                else:
+                    logger.error(f"{self.name}: discarding {len(self._queue)} records at shutdown")
+                    self._stats["dropped"] += len(self._queue)
+                self._queue.clear()
+        if self._spool is not None:
+            self._spool.close()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "queued": len(self._queue),
+            "max_queue": self.max_queue,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "overflow_policy": self.overflow,
+            "spool_backlog": self._spool.backlog() if self._spool is not None else None,
+            **self._stats
+        }
+
+    def _spool_record(self, record: Any) -> Optional[str]:
+        if self._spool is None:
+            return None
+        try:
+            return self._spool.append(record)
+        except Exception as e:
+            # Keep the record in memory; it just isn't crash-safe
+            self._stats["spool_errors"] += 1
+            logger.error(f"{self.name}: could not spool record: {e}")
+            return None
+
+    def _release(self, segment: Optional[str]):
+        if self._spool is not None:
+            self._spool.release(segment)
+
+    async def _flush_once(self) -> bool:
+        batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+        if not batch:
+            return True
+        try:
+            await self.flush_fn([record for _, record in batch])
+        except Exception as e:
+            self._stats["flush_errors"] += 1
+            self._stats["last_error"] = str(e)
+            logger.error(f"{self.name}: flush of {len(batch)} records failed: {e}")
+            # Put the batch back in front, keeping within the bound
+            room = self.max_queue - len(self._queue)
+            if room < len(batch):
+                self._stats["dropped"] += len(batch) - room
+                for segment, _ in batch[:len(batch) - max(room, 0)]:
+                    self._release(segment)
+                batch = batch[len(batch) - room:] if room > 0 else []
+            self._queue.extendleft(reversed(batch))
+            return False
+
+        for segment, _ in batch:
+            self._release(segment)
+        self._stats["written"] += len(batch)
+        self._stats["flushes"] += 1
+        self._stats["last_flush_at"] = datetime.utcnow()
+        self._stats["last_flush_size"] = len(batch)
+        return True
+
+    async def _run(self):
+        backoff = self.flush_interval
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            ok = True
+            while ok and self._queue and not self._stopping:
+                ok = await self._flush_once()
+                if len(self._queue) < self.batch_size:
+                    break
+            backoff = self.flush_interval if ok else min(backoff * 2, 30.0)
+            if self._spool is not None:
+                try:
+                    self._spool.sync()
+                except OSError as e:
+                    logger.error(f"{self.name}: spool fsync failed: {e}")
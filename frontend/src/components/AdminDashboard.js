@@ -15,6 +15,7 @@ import LogoManagement from './LogoManagement';
 const AdminDashboard = ({ api, onLogout }) => {
   const [activeTab, setActiveTab] = useState('analytics');
   const [analytics, setAnalytics] = useState(null);
+  const [cohorts, setCohorts] = useState(null);
   const [applications, setApplications] = useState([]);
   const [resources, setResources] = useState([]);
   const [messages, setMessages] = useState([]);
@@ -57,6 +58,7 @@ const AdminDashboard = ({ api, onLogout }) => {
       setLoading(true);
       await Promise.all([
         fetchAnalytics(),
+        fetchCohorts(),
         fetchApplications(),
         fetchResources(),
         fetchMessages()
@@ -77,6 +79,15 @@ const AdminDashboard = ({ api, onLogout }) => {
     }
   };
 
+  const fetchCohorts = async () => {
+    try {
+      const response = await axios.get(`${api}/admin/analytics/cohorts`);
+      setCohorts(response.data);
+    } catch (err) {
+      console.error('Error fetching cohorts:', err);
+    }
+  };
+
   const fetchApplications = async () => {
     try {
       const response = await axios.get(`${api}/admin/applications`);
@@ -290,6 +301,20 @@ const AdminDashboard = ({ api, onLogout }) => {
               <div className="metric-sub">Last 30 days</div>
             </div>
           </div>
+          
+          {analytics.unique_visitors && (
+            <div className="metric-card">
+              <div className="metric-icon">👥</div>
+              <div className="metric-content">
+                <div className="metric-value">~{analytics.unique_visitors.unique_visitors}</div>
+                <div className="metric-label">Unique Visitors</div>
+                <div className="metric-sub">
+                  ~{analytics.unique_visitors.unique_sessions} sessions, last 30 days
+                  (±{(analytics.unique_visitors.relative_error * 100).toFixed(1)}%)
+                </div>
+              </div>
+            </div>
+          )}
         </div>
       )}
       
@@ -306,6 +331,36 @@ const AdminDashboard = ({ api, onLogout }) => {
           </div>
         </div>
       )}
+      
+      {cohorts && cohorts.cohort_sizes.some((size) => size > 0) && (
+        <div className="analytics-section">
+          <h4>Weekly Retention (returning / applied by week)</h4>
+          <table className="cohort-table">
+            <thead>
+              <tr>
+                <th>First seen</th>
+                <th>Visitors</th>
+                {cohorts.cohort_sizes.map((_, week) => (
+                  <th key={week}>Week {week}</th>
+                ))}
+              </tr>
+            </thead>
+            <tbody>
+              {cohorts.cohorts.map((cohort, row) => (
+                <tr key={cohort}>
+                  <td>{cohort}</td>
+                  <td>{cohorts.cohort_sizes[row]}</td>
+                  {cohorts.retention_rate[row].map((rate, week) => (
+                    <td key={week}>
+                      {rate === null ? '' : `${rate}% / ${cohorts.application_rate[row][week]}%`}
+                    </td>
+                  ))}
+                </tr>
+              ))}
+            </tbody>
+          </table>
+        </div>
+      )}
     </div>
   );
 
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 
-const AlertsTab = ({ api }) => {
+const AlertsTab = ({ api, live }) => {
   const [alerts, setAlerts] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
@@ -10,9 +10,26 @@ const AlertsTab = ({ api }) => {
     fetchAlerts();
   }, []);
 
-  const fetchAlerts = async () => {
+  useEffect(() => {
+    if (!live) return undefined;
+    return live.subscribe('alerts', ({ event, data }) => {
+      if (event === 'created') {
+        setAlerts((current) => [data, ...current.filter((alert) => alert.id !== data.id)]);
+      } else if (event === 'updated') {
+        setAlerts((current) => data.is_active === false
+          ? current.filter((alert) => alert.id !== data.id)
+          : current.map((alert) => (alert.id === data.id ? { ...alert, ...data } : alert)));
+      } else if (event === 'deleted' || event === 'deactivated') {
+        setAlerts((current) => current.filter((alert) => alert.id !== data.id));
+      } else if (event === 'resync') {
+        fetchAlerts(false);
+      }
+    });
+  }, [live]);
+
+  const fetchAlerts = async (showLoading = true) => {
     try {
-      setLoading(true);
+      if (showLoading) setLoading(true);
       const response = await axios.get(`${api}/alerts`);
       setAlerts(response.data);
       setError(null);
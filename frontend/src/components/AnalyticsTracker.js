@@ -1,30 +1,103 @@
 // Analytics tracking utility
+//
+// Events are buffered and sent in batches to /analytics/track/batch using a
+// compact schema:
+//   { s: sessionId, v: visitorId, e: [{ i: dedupId, t: eventType, p: page, c: clientTimeMs, m: metadata }] }
+// The buffer is flushed when it fills, on a timer, and via navigator.sendBeacon
+// when the page is hidden or unloaded. Each event carries a unique id so the
+// backend can drop duplicates if a batch is retried.
+const MAX_BATCH_SIZE = 20;
+const FLUSH_INTERVAL_MS = 5000;
+const VISITOR_ID_KEY = 'dndc_visitor_id';
+
 class AnalyticsTracker {
   constructor(apiUrl) {
     this.apiUrl = apiUrl;
     this.sessionId = this.generateSessionId();
+    this.visitorId = this.getVisitorId();
+    this.eventCounter = 0;
+    this.queue = [];
+    this.flushTimer = null;
+
+    this.handleVisibilityChange = () => {
+      if (document.visibilityState === 'hidden') {
+        this.flush({ beacon: true });
+      }
+    };
+    this.handlePageHide = () => this.flush({ beacon: true });
+
+    if (typeof window !== 'undefined') {
+      document.addEventListener('visibilitychange', this.handleVisibilityChange);
+      window.addEventListener('pagehide', this.handlePageHide);
+    }
   }
 
   generateSessionId() {
     return 'session_' + Math.random().toString(36).substr(2, 9) + '_' + Date.now();
   }
 
-  async track(eventType, page, metadata = {}) {
+  // Anonymous id kept across sessions so the backend can estimate unique visitors
+  getVisitorId() {
     try {
-      await fetch(`${this.apiUrl}/analytics/track`, {
+      let visitorId = localStorage.getItem(VISITOR_ID_KEY);
+      if (!visitorId) {
+        visitorId = 'visitor_' + Math.random().toString(36).substr(2, 12) + '_' + Date.now();
+        localStorage.setItem(VISITOR_ID_KEY, visitorId);
+      }
+      return visitorId;
+    } catch (error) {
+      return null;
+    }
+  }
+
+  track(eventType, page, metadata = {}) {
+    this.eventCounter += 1;
+    const event = {
+      i: `${this.sessionId}_${this.eventCounter}`,
+      t: eventType,
+      p: page,
+      c: Date.now()
+    };
+    if (metadata && Object.keys(metadata).length > 0) {
+      event.m = metadata;
+    }
+    this.queue.push(event);
+
+    if (this.queue.length >= MAX_BATCH_SIZE) {
+      this.flush();
+    } else if (!this.flushTimer) {
+      this.flushTimer = setTimeout(() => this.flush(), FLUSH_INTERVAL_MS);
+    }
+  }
+
+  flush({ beacon = false } = {}) {
+    if (this.flushTimer) {
+      clearTimeout(this.flushTimer);
+      this.flushTimer = null;
+    }
+    if (this.queue.length === 0) {
+      return;
+    }
+
+    const events = this.queue.splice(0, this.queue.length);
+    const url = `${this.apiUrl}/analytics/track/batch`;
+
+    for (let start = 0; start < events.length; start += MAX_BATCH_SIZE) {
+      // Plain string body is sent as text/plain, which avoids a CORS preflight
+      const body = JSON.stringify({ s: this.sessionId, v: this.visitorId, e: events.slice(start, start + MAX_BATCH_SIZE) });
+
+      if (beacon && navigator.sendBeacon && navigator.sendBeacon(url, body)) {
+        continue;
+      }
+
+      fetch(url, {
         method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          event_type: eventType,
-          page: page,
-          user_session: this.sessionId,
-          metadata: metadata
-        })
+        headers: { 'Content-Type': 'text/plain' },
+        body,
+        keepalive: true
+      }).catch((error) => {
+        console.warn('Analytics tracking failed:', error);
       });
-    } catch (error) {
-      console.warn('Analytics tracking failed:', error);
     }
   }
 
@@ -57,4 +130,4 @@ class AnalyticsTracker {
   }
 }
 
-export default AnalyticsTracker;
\ No newline at end of file
+export default AnalyticsTracker;
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 
-const ApplicationTracker = ({ api }) => {
+const ApplicationTracker = ({ api, analytics }) => {
   const [applications, setApplications] = useState([]);
   const [selectedApplication, setSelectedApplication] = useState(null);
   const [loading, setLoading] = useState(true);
@@ -46,6 +46,11 @@ const ApplicationTracker = ({ api }) => {
     try {
       setLoading(true);
       const response = await axios.post(`${api}/applications`, newApplication);
+      if (analytics) {
+        analytics.track('application_created', 'applications', {
+          application_type: newApplication.application_type
+        });
+      }
       await fetchApplications();
       setSelectedApplication(response.data);
       setShowNewApplicationForm(false);
@@ -1,7 +1,8 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
+import { MAX_FOLLOWED_APPLICATIONS } from '../lib/liveChannel';
 
-const EnterpriseApplicationTracker = ({ api }) => {
+const EnterpriseApplicationTracker = ({ api, live }) => {
   const [applications, setApplications] = useState([]);
   const [selectedApp, setSelectedApp] = useState(null);
   const [loading, setLoading] = useState(true);
@@ -13,9 +14,38 @@ const EnterpriseApplicationTracker = ({ api }) => {
     fetchApplications();
   }, []);
 
-  const fetchApplications = async () => {
+  const filteredApplications = applications.filter(app => {
+    const matchesStatus = filterStatus === 'all' || app.status === filterStatus;
+    const matchesSearch = app.applicant_name.toLowerCase().includes(searchQuery.toLowerCase()) ||
+                          app.application_type.toLowerCase().includes(searchQuery.toLowerCase());
+    return matchesStatus && matchesSearch;
+  });
+
+  // Follow status changes over the live channel for the selected application
+  // and the ones on screen; a token covers at most MAX_FOLLOWED_APPLICATIONS
+  const applicationIds = [...new Set([
+    ...(selectedApp ? [selectedApp.id] : []),
+    ...filteredApplications.map((app) => app.id)
+  ])].slice(0, MAX_FOLLOWED_APPLICATIONS).join(',');
+  useEffect(() => {
+    if (!live || !applicationIds) return undefined;
+    const ids = applicationIds.split(',');
+    live.followApplications(ids);
+    const unsubscribers = ids.map((id) => live.subscribe(`applications:${id}`, ({ event, data }) => {
+      if (event === 'resync') {
+        fetchApplications(false);
+        return;
+      }
+      const apply = (app) => (app && app.id === id ? { ...app, ...data } : app);
+      setApplications((current) => current.map(apply));
+      setSelectedApp(apply);
+    }));
+    return () => unsubscribers.forEach((unsubscribe) => unsubscribe());
+  }, [live, applicationIds]);
+
+  const fetchApplications = async (showLoading = true) => {
     try {
-      setLoading(true);
+      if (showLoading) setLoading(true);
       const response = await axios.get(`${api}/applications`);
       setApplications(response.data);
       if (response.data.length > 0 && !selectedApp) {
@@ -58,13 +88,6 @@ const EnterpriseApplicationTracker = ({ api }) => {
     return 'upcoming';
   };
 
-  const filteredApplications = applications.filter(app => {
-    const matchesStatus = filterStatus === 'all' || app.status === filterStatus;
-    const matchesSearch = app.applicant_name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-                          app.application_type.toLowerCase().includes(searchQuery.toLowerCase());
-    return matchesStatus && matchesSearch;
-  });
-
   if (loading) {
     return (
       <div style={{ padding: '2rem', textAlign: 'center' }}>
@@ -1,6 +1,8 @@
 import React, { useState } from 'react';
 import axios from 'axios';
 
+const LOAN_TERMS = [15, 20, 25, 30];
+
 const FinancialCalculator = ({ api }) => {
   const [activeCalculator, setActiveCalculator] = useState('loan');
   const [results, setResults] = useState(null);
@@ -28,16 +30,24 @@ const FinancialCalculator = ({ api }) => {
     monthly_utility_cost: 200
   });
 
+  // All terms are priced in one batch request so switching the term afterwards
+  // doesn't need another round trip
   const calculateLoan = async () => {
     try {
       setLoading(true);
       setError(null);
       
-      const response = await axios.post(`${api}/calculate/loan`, null, {
-        params: loanData
+      const response = await axios.post(`${api}/calculate/loan/batch`, {
+        grid: {
+          loan_amounts: [loanData.loan_amount],
+          interest_rates: [loanData.interest_rate],
+          loan_term_years: LOAN_TERMS
+        }
       });
       
-      setResults(response.data);
+      const scenarios = response.data.scenarios;
+      const selected = scenarios.find(s => s.loan_term_years === loanData.loan_term_years) || scenarios[0];
+      setResults({ ...selected, scenarios });
     } catch (err) {
       setError('Failed to calculate loan payment');
       console.error('Error calculating loan:', err);
@@ -46,6 +56,18 @@ const FinancialCalculator = ({ api }) => {
     }
   };
 
+  const selectLoanTerm = (term) => {
+    setLoanData({...loanData, loan_term_years: term});
+    const scenario = results?.scenarios?.find(s => (
+      s.loan_term_years === term &&
+      s.loan_amount === loanData.loan_amount &&
+      s.interest_rate === loanData.interest_rate
+    ));
+    if (scenario) {
+      setResults({ ...scenario, scenarios: results.scenarios });
+    }
+  };
+
   const checkIncomeQualification = async () => {
     try {
       setLoading(true);
@@ -118,12 +140,11 @@ const FinancialCalculator = ({ api }) => {
         <label>Loan Term (Years)</label>
         <select
           value={loanData.loan_term_years}
-          onChange={(e) => setLoanData({...loanData, loan_term_years: parseInt(e.target.value)})}
+          onChange={(e) => selectLoanTerm(parseInt(e.target.value))}
         >
-          <option value={15}>15 years</option>
-          <option value={20}>20 years</option>
-          <option value={25}>25 years</option>
-          <option value={30}>30 years</option>
+          {LOAN_TERMS.map(term => (
+            <option key={term} value={term}>{term} years</option>
+          ))}
         </select>
       </div>
       <button className="btn-primary" onClick={calculateLoan} disabled={loading}>
@@ -142,6 +163,17 @@ const FinancialCalculator = ({ api }) => {
           <div className="result-item">
             <strong>Total Cost:</strong> {formatCurrency(results.total_cost)}
           </div>
+          {results.scenarios && (
+            <div className="term-comparison">
+              <h5>Compare Terms</h5>
+              {results.scenarios.map(scenario => (
+                <div key={scenario.loan_term_years} className="result-item">
+                  <strong>{scenario.loan_term_years} years:</strong> {formatCurrency(scenario.monthly_payment)}/month,
+                  {' '}{formatCurrency(scenario.total_interest)} interest
+                </div>
+              ))}
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -16,7 +16,7 @@ const NotificationCenter = ({ api, analytics, isOpen, onClose }) => {
     try {
       setLoading(true);
       const response = await axios.get(`${api}/notifications`, {
-        params: { unread_only: filter === 'unread' }
+        params: { user_id: analytics.visitorId, unread_only: filter === 'unread' }
       });
       setNotifications(response.data);
     } catch (err) {
@@ -28,7 +28,9 @@ const NotificationCenter = ({ api, analytics, isOpen, onClose }) => {
 
   const markAsRead = async (notificationId) => {
     try {
-      await axios.put(`${api}/notifications/${notificationId}/read`);
+      await axios.put(`${api}/notifications/${notificationId}/read`, null, {
+        params: { user_id: analytics.visitorId }
+      });
       setNotifications(prev =>
         prev.map(n => n.id === notificationId ? { ...n, is_read: true } : n)
       );
@@ -40,7 +42,9 @@ const NotificationCenter = ({ api, analytics, isOpen, onClose }) => {
 
   const markAllAsRead = async () => {
     try {
-      await axios.put(`${api}/notifications/mark-all-read?user_id=guest`);
+      await axios.put(`${api}/notifications/mark-all-read`, null, {
+        params: { user_id: analytics.visitorId }
+      });
       setNotifications(prev => prev.map(n => ({ ...n, is_read: true })));
       analytics.trackButtonClick('mark_all_notifications_read', 'notifications');
     } catch (err) {
@@ -82,7 +82,7 @@ const ProgramsTab = ({ api, analytics }) => {
       setApplicationData({});
       
       if (analytics) {
-        analytics.trackEvent('program_application_submitted', {
+        analytics.track('program_application_submitted', 'programs', {
           program_name: selectedProgram.name,
           program_type: selectedProgram.type
         });
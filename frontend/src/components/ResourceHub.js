@@ -16,6 +16,7 @@ import ProgramManagement from './ProgramManagement';
 import NeighborhoodMap from './NeighborhoodMap';
 import CommunityBoard from './CommunityBoard';
 import NotificationCenter from './NotificationCenter';
+import LiveChannel from '../lib/liveChannel';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -31,6 +32,7 @@ const ResourceHub = () => {
   const [activeAdminTab, setActiveAdminTab] = useState('dashboard');
   const dropdownRef = useRef(null);
   const [analytics] = useState(new AnalyticsTracker(API));
+  const [live] = useState(() => new LiveChannel(API, analytics.visitorId));
   const { isNative, platform, scheduleNotification } = useCapacitor();
   const [showNotifications, setShowNotifications] = useState(false);
   const [unreadCount, setUnreadCount] = useState(0);
@@ -53,11 +55,26 @@ const ResourceHub = () => {
     // Track initial page view
     analytics.trackPageView('resources');
     
-    // Fetch unread notification count
+    // Unread count is pushed over the live channel, which sends a fresh
+    // count on every (re)subscribe; "resync" means updates were dropped.
+    // Poll every 30 seconds while the channel can't connect.
+    let notificationInterval = null;
     fetchUnreadCount();
-    
-    // Poll for new notifications every 30 seconds
-    const notificationInterval = setInterval(fetchUnreadCount, 30000);
+    const unsubscribeNotifications = live.subscribe('notifications', (message) => {
+      if (message.event === 'unread_count') {
+        setUnreadCount(message.data.unread_count);
+      } else if (message.event === 'resync') {
+        fetchUnreadCount();
+      }
+    });
+    const unsubscribeStatus = live.onStatus((connected) => {
+      if (connected && notificationInterval) {
+        clearInterval(notificationInterval);
+        notificationInterval = null;
+      } else if (!connected && !notificationInterval) {
+        notificationInterval = setInterval(fetchUnreadCount, 30000);
+      }
+    });
     
     // Show native app welcome message
     if (isNative) {
@@ -81,13 +98,17 @@ const ResourceHub = () => {
     document.addEventListener('mousedown', handleClickOutside);
     return () => {
       document.removeEventListener('mousedown', handleClickOutside);
-      clearInterval(notificationInterval);
+      unsubscribeStatus();
+      unsubscribeNotifications();
+      if (notificationInterval) clearInterval(notificationInterval);
     };
-  }, [analytics, isNative, platform, scheduleNotification]);
+  }, [analytics, live, isNative, platform, scheduleNotification]);
 
   const fetchUnreadCount = async () => {
     try {
-      const response = await axios.get(`${API}/notifications/unread-count`);
+      const response = await axios.get(`${API}/notifications/unread-count`, {
+        params: { user_id: analytics.visitorId }
+      });
       setUnreadCount(response.data.unread_count);
     } catch (err) {
       console.error('Error fetching unread count:', err);
@@ -133,7 +154,7 @@ const ResourceHub = () => {
   };
 
   const renderTabContent = () => {
-    const commonProps = { api: API, analytics, isNative, platform };
+    const commonProps = { api: API, analytics, live, isNative, platform };
     
     switch (activeTab) {
       case 'resources':
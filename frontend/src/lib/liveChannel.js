@@ -0,0 +1,217 @@
+import axios from 'axios';
+
+// One live connection per client for alerts, notifications and application
+// status. Components call subscribe(topic, handler) and get
+// { topic, event, data } messages; a "resync" event means updates were
+// dropped because the client fell behind, so refetch. The channel connects
+// to the /live WebSocket and falls back to the /live/stream SSE endpoint after
+// repeated WebSocket failures (proxies that block upgrades). Tokens come from
+// POST /live/token and name the application ids the client may follow.
+// onStatus(listener) reports whether the channel is connected, so callers
+// can fall back to polling while it isn't.
+const RECONNECT_MIN_MS = 1000;
+const RECONNECT_MAX_MS = 30000;
+const WEBSOCKET_FAILURES_BEFORE_SSE = 3;
+// Matches MAX_APPLICATIONS in backend/live_channel.py
+export const MAX_FOLLOWED_APPLICATIONS = 50;
+
+// Close codes sent by the server: 1008 client too slow, 1013 worker full
+const SERVER_CLOSE_CODES = [1008, 1013];
+
+class LiveChannel {
+  constructor(api, userId) {
+    this.api = api;
+    this.userId = userId;
+    this.handlers = new Map(); // topic -> Set of handlers
+    this.statusListeners = new Set();
+    this.connected = false;
+    this.applicationIds = [];
+    this.socket = null;
+    this.stream = null;
+    this.transport = typeof WebSocket !== 'undefined' ? 'websocket' : 'sse';
+    this.failures = 0; // consecutive failed attempts of any kind, for backoff
+    this.socketFailures = 0; // consecutive WebSocket transport failures
+    this.reconnectTimer = null;
+    this.closed = true;
+  }
+
+  onStatus(listener) {
+    this.statusListeners.add(listener);
+    listener(this.connected);
+    return () => this.statusListeners.delete(listener);
+  }
+
+  setConnected(connected) {
+    if (connected === this.connected) return;
+    this.connected = connected;
+    this.statusListeners.forEach((listener) => listener(connected));
+  }
+
+  subscribe(topic, handler) {
+    if (!this.handlers.has(topic)) {
+      this.handlers.set(topic, new Set());
+      this.send({ op: 'subscribe', topics: [topic] });
+    }
+    this.handlers.get(topic).add(handler);
+    this.open();
+
+    return () => {
+      const handlers = this.handlers.get(topic);
+      if (!handlers) return;
+      handlers.delete(handler);
+      if (handlers.size === 0) {
+        this.handlers.delete(topic);
+        this.send({ op: 'unsubscribe', topics: [topic] });
+      }
+      if (this.handlers.size === 0) this.close();
+    };
+  }
+
+  followApplications(applicationIds) {
+    // Application topics are fixed by the token, so ids it doesn't cover
+    // mean a new token (narrowing the set, e.g. while filtering, doesn't)
+    const ids = [...new Set(applicationIds)].slice(0, MAX_FOLLOWED_APPLICATIONS).sort();
+    if (ids.every((id) => this.applicationIds.includes(id))) return;
+    this.applicationIds = ids;
+    if (!this.closed) this.reconnect(0);
+  }
+
+  open() {
+    if (!this.closed) return;
+    this.closed = false;
+    this.connect();
+  }
+
+  close() {
+    this.closed = true;
+    clearTimeout(this.reconnectTimer);
+    this.disconnect();
+  }
+
+  async connect() {
+    if (this.transport === 'sse' && typeof EventSource === 'undefined') {
+      return; // no transport at all; callers keep polling
+    }
+    let token;
+    try {
+      const response = await axios.post(`${this.api}/live/token`, {
+        user_id: this.userId,
+        application_ids: this.applicationIds
+      });
+      token = response.data.token;
+    } catch (err) {
+      console.error('Error fetching live channel token:', err);
+      this.failures += 1;
+      this.scheduleReconnect();
+      return;
+    }
+    if (this.closed) return;
+
+    if (this.transport === 'websocket') {
+      this.connectWebSocket(token);
+    } else {
+      this.connectStream(token);
+    }
+  }
+
+  connectWebSocket(token) {
+    const url = `${this.api.replace(/^http/, 'ws')}/live?${new URLSearchParams({ token })}`;
+    const socket = new WebSocket(url);
+    this.socket = socket;
+
+    socket.onopen = () => {
+      this.failures = 0;
+      this.socketFailures = 0;
+      this.setConnected(true);
+      socket.send(JSON.stringify({ op: 'subscribe', topics: [...this.handlers.keys()] }));
+      // Anything published while disconnected was missed
+      this.handlers.forEach((_, topic) => this.dispatch({ topic, event: 'resync', data: {} }));
+    };
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      if (message.op === 'batch') {
+        message.messages.forEach((item) => this.dispatch(item));
+      } else if (message.op === 'subscribed' && message.denied.length > 0) {
+        console.warn('Live channel topics not allowed:', message.denied);
+      }
+    };
+    socket.onclose = (event) => {
+      if (this.socket !== socket) return;
+      this.socket = null;
+      this.setConnected(false);
+      this.failures += 1;
+      // Slow-client and worker-full closes are the server's choice, not a
+      // sign that WebSockets are blocked; they only back off
+      if (event.code !== 1000 && !SERVER_CLOSE_CODES.includes(event.code)) {
+        this.socketFailures += 1;
+        if (this.socketFailures >= WEBSOCKET_FAILURES_BEFORE_SSE && typeof EventSource !== 'undefined') {
+          this.transport = 'sse';
+          this.socketFailures = 0;
+        }
+      }
+      this.scheduleReconnect();
+    };
+  }
+
+  connectStream(token) {
+    const params = new URLSearchParams({ token, topics: [...this.handlers.keys()].join(',') });
+    const stream = new EventSource(`${this.api}/live/stream?${params}`);
+    this.stream = stream;
+
+    stream.addEventListener('subscribed', () => {
+      this.failures = 0;
+      this.setConnected(true);
+      this.handlers.forEach((_, topic) => this.dispatch({ topic, event: 'resync', data: {} }));
+    });
+    stream.onmessage = (event) => this.dispatch(JSON.parse(event.data));
+    stream.onerror = () => {
+      // Browser reconnects would reuse the same (possibly expired) token and
+      // topic list, so reconnect ourselves with a fresh one
+      if (this.stream !== stream) return;
+      stream.close();
+      this.stream = null;
+      this.setConnected(false);
+      this.failures += 1;
+      this.scheduleReconnect();
+    };
+  }
+
+  send(message) {
+    if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+      this.socket.send(JSON.stringify(message));
+    } else if (this.stream) {
+      // SSE topics are fixed per request
+      this.reconnect(0);
+    }
+  }
+
+  dispatch(message) {
+    const handlers = this.handlers.get(message.topic);
+    if (handlers) handlers.forEach((handler) => handler(message));
+  }
+
+  disconnect() {
+    const { socket, stream } = this;
+    this.socket = null;
+    this.stream = null;
+    if (socket) socket.close(1000);
+    if (stream) stream.close();
+    this.setConnected(false);
+  }
+
+  reconnect(delay) {
+    clearTimeout(this.reconnectTimer);
+    this.disconnect();
+    this.reconnectTimer = setTimeout(() => {
+      if (!this.closed) this.connect();
+    }, delay);
+  }
+
+  scheduleReconnect() {
+    if (this.closed) return;
+    const delay = Math.min(RECONNECT_MIN_MS * 2 ** Math.max(this.failures - 1, 0), RECONNECT_MAX_MS);
+    this.reconnect(delay * (0.5 + Math.random() / 2));
+  }
+}
+
+export default LiveChannel;
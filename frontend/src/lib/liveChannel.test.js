@@ -0,0 +1,123 @@
+import axios from 'axios';
+import LiveChannel, { MAX_FOLLOWED_APPLICATIONS } from './liveChannel';
+
+jest.mock('axios');
+
+class FakeSocket {
+  static OPEN = 1;
+  static instances = [];
+
+  constructor(url) {
+    this.url = url;
+    this.readyState = 0;
+    this.sent = [];
+    FakeSocket.instances.push(this);
+  }
+
+  send(message) {
+    this.sent.push(JSON.parse(message));
+  }
+
+  close() {}
+}
+
+const flush = async () => {
+  for (let i = 0; i < 10; i += 1) await Promise.resolve();
+};
+
+// Advance to the next reconnect attempt and return how long it waited
+const nextAttempt = async () => {
+  const delay = jest.getTimerCount() ? jest.advanceTimersToNextTimer() : null;
+  await flush();
+  return delay;
+};
+
+describe('LiveChannel', () => {
+  let timeoutSpy;
+
+  beforeEach(() => {
+    jest.useFakeTimers();
+    timeoutSpy = jest.spyOn(global, 'setTimeout');
+    jest.spyOn(Math, 'random').mockReturnValue(1); // no jitter
+    FakeSocket.instances = [];
+    global.WebSocket = FakeSocket;
+    jest.spyOn(console, 'error').mockImplementation(() => {});
+  });
+
+  afterEach(() => {
+    jest.restoreAllMocks();
+    jest.useRealTimers();
+    delete global.WebSocket;
+  });
+
+  const lastDelay = () => timeoutSpy.mock.calls[timeoutSpy.mock.calls.length - 1][1];
+
+  test('backs off exponentially while the token request fails', async () => {
+    axios.post.mockRejectedValue({ response: { status: 422 } });
+    const channel = new LiveChannel('http://api.test/api', null);
+    channel.subscribe('alerts', () => {});
+    await flush();
+
+    const delays = [];
+    for (let i = 0; i < 7; i += 1) {
+      delays.push(lastDelay());
+      await nextAttempt();
+    }
+    expect(delays).toEqual([1000, 2000, 4000, 8000, 16000, 30000, 30000]);
+    expect(axios.post).toHaveBeenCalledTimes(8);
+    channel.close();
+  });
+
+  test('backs off when the server closes with worker full, without leaving WebSockets', async () => {
+    axios.post.mockResolvedValue({ data: { token: 'token' } });
+    const channel = new LiveChannel('http://api.test/api', 'visitor-1');
+    channel.subscribe('alerts', () => {});
+    await flush();
+
+    const delays = [];
+    for (let i = 0; i < 4; i += 1) {
+      FakeSocket.instances[FakeSocket.instances.length - 1].onclose({ code: 1013 });
+      delays.push(lastDelay());
+      await nextAttempt();
+    }
+    expect(delays).toEqual([1000, 2000, 4000, 8000]);
+    expect(channel.transport).toBe('websocket');
+    channel.close();
+  });
+
+  test('reports connection status for polling fallbacks', async () => {
+    axios.post.mockResolvedValue({ data: { token: 'token' } });
+    const channel = new LiveChannel('http://api.test/api', 'visitor-1');
+    const statuses = [];
+    channel.onStatus((connected) => statuses.push(connected));
+    channel.subscribe('notifications', () => {});
+    await flush();
+
+    const socket = FakeSocket.instances[0];
+    socket.readyState = FakeSocket.OPEN;
+    socket.onopen();
+    expect(socket.sent[0]).toEqual({ op: 'subscribe', topics: ['notifications'] });
+    socket.onclose({ code: 1006 });
+    expect(statuses).toEqual([false, true, false]);
+    channel.close();
+  });
+
+  test('follows at most MAX_FOLLOWED_APPLICATIONS and only renews the token for new ids', async () => {
+    axios.post.mockResolvedValue({ data: { token: 'token' } });
+    const channel = new LiveChannel('http://api.test/api', 'visitor-1');
+    channel.subscribe('alerts', () => {});
+    await flush();
+
+    const ids = Array.from({ length: 80 }, (_, i) => `app-${i}`);
+    channel.followApplications(ids);
+    await nextAttempt();
+    const lastRequest = axios.post.mock.calls[axios.post.mock.calls.length - 1][1];
+    expect(lastRequest.application_ids).toHaveLength(MAX_FOLLOWED_APPLICATIONS);
+
+    const requests = axios.post.mock.calls.length;
+    channel.followApplications(ids.slice(0, 3));
+    await nextAttempt();
+    expect(axios.post).toHaveBeenCalledTimes(requests);
+    channel.close();
+  });
+});
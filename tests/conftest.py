@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# The backend is a flat module directory run from backend/ (uvicorn server:app)
+BACKEND = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND))
+
+# server.py reads these at import; the client connects lazily, so no Mongo is needed
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "dndc_test")
+os.environ.setdefault("LIVE_CHANNEL_SECRET", "test-secret")
+# Calculator endpoints spool their analytics records; keep that out of the tree
+os.environ.setdefault("CALCULATOR_RESULTS_SPOOL_DIR", tempfile.mkdtemp(prefix="calculator_results_"))
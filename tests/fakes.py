@@ -0,0 +1,290 @@
+"""Small in-memory stand-in for the parts of motor the backend modules use"""
+from collections import defaultdict
+from types import SimpleNamespace
+import copy
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+_MISSING = object()
+
+
+def _get(doc, path):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, list):
+            # Like Mongo, "items.field" matches any element's field
+            value = [item[part] for item in value if isinstance(item, dict) and part in item]
+            continue
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _compare(value, op, operand):
+    if op == "$in":
+        return (None if value is _MISSING else value) in operand
+    if op == "$nin":
+        return (None if value is _MISSING else value) not in operand
+    if op == "$ne":
+        return (None if value is _MISSING else value) != operand
+    if op == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if value is _MISSING or value is None:
+        return False
+    return {
+        "$gt": lambda: value > operand,
+        "$gte": lambda: value >= operand,
+        "$lt": lambda: value < operand,
+        "$lte": lambda: value <= operand,
+    }[op]()
+
+
+def _sort_key(field):
+    # Mongo orders missing and null before any value
+    def key(doc):
+        value = _get(doc, field)
+        return (0, 0) if value is _MISSING or value is None else (1, value)
+    return key
+
+
+def matches(doc, query):
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+            continue
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+            continue
+        value = _get(doc, key)
+        if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                return False
+        elif isinstance(value, list) and not isinstance(condition, list):
+            if condition not in value:
+                return False
+        elif (None if value is _MISSING else value) != condition:
+            return False
+    return True
+
+
+def _apply_update(doc, update, inserting):
+    for op, fields in update.items():
+        for path, value in fields.items():
+            *parents, key = path.split(".")
+            target = doc
+            for part in parents:
+                target = target.setdefault(part, {})
+            if op == "$set" or (op == "$setOnInsert" and inserting):
+                target[key] = value
+            elif op == "$inc":
+                target[key] = target.get(key, 0) + value
+            elif op == "$max":
+                target[key] = max(target.get(key, value), value)
+            elif op == "$unset":
+                target.pop(key, None)
+            elif op == "$addToSet":
+                items = target.setdefault(key, [])
+                if value not in items:
+                    items.append(value)
+            elif op == "$pull":
+                condition = value if isinstance(value, dict) else {"$in": [value]}
+                target[key] = [item for item in target.get(key, []) if not matches({"v": item}, {"v": condition})]
+
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        result = {k: copy.deepcopy(doc[k]) for k in include if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    return {k: copy.deepcopy(v) for k, v in doc.items() if projection.get(k, 1)}
+
+
+class FakeCursor:
+    # Sorts see whole documents; the projection applies to what is returned
+    def __init__(self, docs, projection=None):
+        self._docs = docs
+        self._projection = projection
+
+    def sort(self, key, direction=1):
+        if isinstance(key, list):
+            for field, order in reversed(key):
+                self._docs.sort(key=_sort_key(field), reverse=order < 0)
+        else:
+            self._docs.sort(key=_sort_key(key), reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        if n:
+            self._docs = self._docs[:n]
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    async def to_list(self, length=None):
+        docs = self._docs if length is None else self._docs[:length]
+        return [_project(d, self._projection) for d in docs]
+
+    def __aiter__(self):
+        self._iter = iter([_project(d, self._projection) for d in self._docs])
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+        self._next_id = 0
+        self.unique_keys = []
+
+    def _insert(self, doc):
+        doc = copy.deepcopy(doc)
+        if "_id" not in doc:
+            self._next_id += 1
+            doc["_id"] = f"oid-{self._next_id}"
+        for existing in self.docs:
+            if existing["_id"] == doc["_id"]:
+                raise DuplicateKeyError("duplicate _id")
+        self.docs.append(doc)
+        return doc
+
+    async def create_index(self, *args, **kwargs):
+        return "index"
+
+    def find(self, query=None, projection=None):
+        return FakeCursor([d for d in self.docs if matches(d, query or {})], projection)
+
+    async def find_one(self, query=None, projection=None, sort=None):
+        cursor = self.find(query, projection)
+        if sort:
+            cursor.sort(sort)
+        docs = await cursor.to_list(1)
+        return docs[0] if docs else None
+
+    async def distinct(self, key, query=None):
+        values = []
+        for doc in self.docs:
+            value = _get(doc, key)
+            if matches(doc, query or {}) and value is not _MISSING and value not in values:
+                values.append(value)
+        return values
+
+    async def count_documents(self, query):
+        return sum(1 for d in self.docs if matches(d, query))
+
+    async def insert_one(self, doc):
+        return SimpleNamespace(inserted_id=self._insert(doc)["_id"])
+
+    async def insert_many(self, docs):
+        return SimpleNamespace(inserted_ids=[self._insert(d)["_id"] for d in docs])
+
+    def _upsert_doc(self, query):
+        seed = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+        return seed
+
+    async def update_one(self, query, update, upsert=False):
+        for doc in self.docs:
+            if matches(doc, query):
+                before = copy.deepcopy(doc)
+                _apply_update(doc, update, inserting=False)
+                return SimpleNamespace(matched_count=1, modified_count=int(before != doc), upserted_id=None)
+        if upsert:
+            doc = self._upsert_doc(query)
+            _apply_update(doc, update, inserting=True)
+            inserted = self._insert(doc)
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=inserted["_id"])
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+
+    async def update_many(self, query, update, upsert=False):
+        matched = modified = 0
+        for doc in self.docs:
+            if matches(doc, query):
+                before = copy.deepcopy(doc)
+                _apply_update(doc, update, inserting=False)
+                matched += 1
+                modified += int(before != doc)
+        return SimpleNamespace(matched_count=matched, modified_count=modified)
+
+    async def replace_one(self, query, replacement, upsert=False):
+        for i, doc in enumerate(self.docs):
+            if matches(doc, query):
+                self.docs[i] = {"_id": doc["_id"], **copy.deepcopy(replacement)}
+                return SimpleNamespace(matched_count=1)
+        if upsert:
+            self._insert({**self._upsert_doc(query), **replacement})
+        return SimpleNamespace(matched_count=0)
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE, sort=None):
+        candidates = [d for d in self.docs if matches(d, query)]
+        if sort:
+            for field, order in reversed(sort):
+                candidates.sort(key=_sort_key(field), reverse=order < 0)
+        if candidates:
+            doc = candidates[0]
+            before = _project(doc, projection)
+            _apply_update(doc, update, inserting=False)
+            return _project(doc, projection) if return_document == ReturnDocument.AFTER else before
+        if not upsert:
+            return None
+        doc = self._upsert_doc(query)
+        _apply_update(doc, update, inserting=True)
+        inserted = self._insert(doc)
+        return _project(inserted, projection) if return_document == ReturnDocument.AFTER else None
+
+    async def find_one_and_delete(self, query, projection=None):
+        for doc in self.docs:
+            if matches(doc, query):
+                self.docs.remove(doc)
+                return _project(doc, projection)
+        return None
+
+    async def delete_one(self, query):
+        for doc in self.docs:
+            if matches(doc, query):
+                self.docs.remove(doc)
+                return SimpleNamespace(deleted_count=1)
+        return SimpleNamespace(deleted_count=0)
+
+    async def delete_many(self, query):
+        keep = [d for d in self.docs if not matches(d, query)]
+        deleted = len(self.docs) - len(keep)
+        self.docs = keep
+        return SimpleNamespace(deleted_count=deleted)
+
+    async def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            doc = getattr(request, "_doc", None)
+            if type(request).__name__ == "UpdateOne":
+                await self.update_one(request._filter, doc, upsert=bool(request._upsert))
+            elif type(request).__name__ == "DeleteOne":
+                await self.delete_one(request._filter)
+            elif type(request).__name__ == "InsertOne":
+                self._insert(doc)
+        return SimpleNamespace(acknowledged=True)
+
+
+class FakeDb:
+    def __init__(self):
+        self._collections = defaultdict(FakeCollection)
+
+    def __getitem__(self, name):
+        return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self._collections[name]
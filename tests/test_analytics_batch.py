@@ -0,0 +1,55 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+@pytest.fixture
+def client():
+    # Not used as a context manager, so startup (Mongo indexes, background loops) doesn't run
+    return TestClient(server.app)
+
+
+@pytest.fixture(autouse=True)
+def clear_recent_ids():
+    server._recent_event_ids.clear()
+    yield
+    server._recent_event_ids.clear()
+
+
+def batch(*event_ids):
+    return {"s": "session-1", "v": "visitor-1", "e": [{"i": i, "t": "page_view", "p": "resources"} for i in event_ids]}
+
+
+@pytest.mark.parametrize("body", ["[]", "1", "\"text\"", "not json"])
+def test_batch_rejects_bodies_that_are_not_objects(client, body):
+    response = client.post("/api/analytics/track/batch", content=body, headers={"Content-Type": "text/plain"})
+    assert response.status_code == 400
+
+
+def test_batch_rejects_invalid_batch(client):
+    response = client.post("/api/analytics/track/batch", json={"s": "session-1"})
+    assert response.status_code == 422
+
+
+def test_dropped_event_is_accepted_on_retry(client, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(server.usage_metrics_writer, "submit", lambda doc: False)
+    first = client.post("/api/analytics/track/batch", json=batch("evt-1")).json()
+    assert first["dropped"] == 1
+
+    monkeypatch.setattr(server.usage_metrics_writer, "submit", lambda doc: submitted.append(doc) or True)
+    retry = client.post("/api/analytics/track/batch", json=batch("evt-1")).json()
+    assert retry["accepted"] == 1 and retry["duplicates"] == 0
+    assert [doc["id"] for doc in submitted] == ["evt-1"]
+
+    again = client.post("/api/analytics/track/batch", json=batch("evt-1", "evt-1")).json()
+    assert again["duplicates"] == 2
+
+
+def test_duplicate_within_one_batch_is_queued_once(client, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(server.usage_metrics_writer, "submit", lambda doc: submitted.append(doc) or True)
+    result = client.post("/api/analytics/track/batch", json=batch("evt-2", "evt-2")).json()
+    assert result == {"status": "queued", "accepted": 1, "duplicates": 1, "dropped": 0}
+    assert len(submitted) == 1
@@ -0,0 +1,83 @@
+import asyncio
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import analytics_funnels
+from tests.fakes import FakeDb
+
+FRONTEND = Path(__file__).resolve().parent.parent / "frontend" / "src"
+
+
+def tracked_event_types():
+    types = set()
+    for path in FRONTEND.rglob("*.js"):
+        types.update(re.findall(r"\.track\('([a-z_]+)'", path.read_text()))
+    return types | {"page_view", "button_click", "form_submit", "document_upload", "calculator_use", "search", "error"}
+
+
+def test_default_funnel_steps_are_events_the_app_sends():
+    sent = tracked_event_types()
+    # ApplicationTracker is never rendered, so its events can't count
+    sent.discard("application_created")
+    for funnel in analytics_funnels.DEFAULT_FUNNELS:
+        for step in funnel["steps"]:
+            assert step["event_type"] in sent, (funnel["name"], step["event_type"])
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def event(event_type, at, page=None, session="s1"):
+    return {"event_type": event_type, "page": page, "user_session": session, "timestamp": at, "organization_id": "org"}
+
+
+def setup_db():
+    db = FakeDb()
+    analytics_funnels.invalidate_definitions()
+    run(analytics_funnels.seed_default_funnels(db))
+    funnel = next(f for f in db[analytics_funnels.FUNNELS].docs if f["name"] == "Financial calculator to application")
+    return db, funnel
+
+
+def daily_steps(db, funnel):
+    totals = {}
+    for doc in db[analytics_funnels.DAILY].docs:
+        if doc["funnel_id"] == funnel["id"]:
+            for step, count in doc.get("steps", {}).items():
+                totals[step] = totals.get(step, 0) + count
+    return totals
+
+
+def test_calculator_funnel_converts_on_program_application():
+    db, funnel = setup_db()
+    start = datetime(2026, 3, 2, 10)
+    run(analytics_funnels.apply_events(db, [
+        event("page_view", start, page="calculator"),
+        event("program_application_submitted", start + timedelta(hours=1), page="programs"),
+    ]))
+    assert daily_steps(db, funnel) == {"0": 1, "1": 1}
+    # Converted sessions leave no progress state behind
+    assert db[analytics_funnels.SESSIONS].docs == []
+
+
+def test_funnel_progress_carries_across_batches_and_expires_after_window():
+    db, funnel = setup_db()
+    start = datetime(2026, 3, 2, 10)
+    run(analytics_funnels.apply_events(db, [event("page_view", start, page="calculator")]))
+    analytics_funnels.invalidate_definitions()
+    late = start + timedelta(hours=funnel["window_hours"] + 1)
+    run(analytics_funnels.apply_events(db, [event("program_application_submitted", late)]))
+    assert daily_steps(db, funnel) == {"0": 1}
+
+
+def test_seed_repoints_previously_seeded_calculator_funnel():
+    db = FakeDb()
+    run(db[analytics_funnels.FUNNELS].insert_one(analytics_funnels.new_funnel(
+        "Financial calculator to application",
+        [{"event_type": "page_view", "page": "calculator"}, {"event_type": "application_created"}]
+    )))
+    run(analytics_funnels.seed_default_funnels(db))
+    steps = db[analytics_funnels.FUNNELS].docs[0]["steps"]
+    assert steps[-1]["event_type"] == "program_application_submitted"
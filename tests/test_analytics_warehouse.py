@@ -0,0 +1,55 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import analytics_warehouse
+import usage_events
+from tests.fakes import FakeDb
+
+
+@pytest.fixture(autouse=True)
+def warehouse_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(analytics_warehouse, "WAREHOUSE_ROOT", tmp_path)
+    return tmp_path
+
+
+def seed_events(db, timestamps):
+    collection = usage_events.collection(db)
+    for i, ts in enumerate(timestamps):
+        asyncio.run(collection.insert_one({"id": f"e{i}", "event_type": "page_view", "user_session": "s", "timestamp": ts}))
+    return collection
+
+
+def test_first_snapshot_skips_documents_without_a_time():
+    db = FakeDb()
+    now = datetime.utcnow()
+    collection = seed_events(db, [now - timedelta(days=1), now])
+    asyncio.run(collection.insert_one({"id": "legacy", "event_type": "page_view"}))
+    asyncio.run(collection.insert_one({"id": "null", "event_type": "page_view", "timestamp": None}))
+
+    result = asyncio.run(analytics_warehouse.snapshot(db, ["usage_events"]))
+
+    assert result["datasets"]["usage_events"]["rows"] == 2
+    assert result["datasets"]["usage_events"]["partitions"] == 2
+    frame = analytics_warehouse.load("usage_events", now - timedelta(days=2), now + timedelta(seconds=1))
+    assert sorted(frame["id"]) == ["e0", "e1"]
+
+
+def test_first_snapshot_of_dataset_with_only_untimed_documents_writes_nothing():
+    db = FakeDb()
+    asyncio.run(usage_events.collection(db).insert_one({"id": "legacy", "event_type": "page_view"}))
+    result = asyncio.run(analytics_warehouse.snapshot(db, ["usage_events"]))
+    assert result["datasets"]["usage_events"] == {"partitions": 0, "rows": 0, "watermark": None}
+    assert analytics_warehouse.describe()["usage_events"]["files"] == 0
+
+
+def test_snapshot_partitions_load_back_by_time_range():
+    db = FakeDb()
+    day = datetime(2026, 3, 2, 12)
+    seed_events(db, [day, day + timedelta(hours=1), day + timedelta(days=1)])
+    asyncio.run(analytics_warehouse._snapshot_partitioned(
+        db, "usage_events", analytics_warehouse.DATASETS["usage_events"], None, day + timedelta(days=2)
+    ))
+    frame = analytics_warehouse.load("usage_events", day - timedelta(days=1), day + timedelta(days=3))
+    assert len(frame) == 3
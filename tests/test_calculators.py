@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+import calculators
+
+
+def test_loan_payments_matches_closed_form():
+    result = calculators.loan_payments(200000, 6, 30)
+    assert float(result["monthly_payment"]) == pytest.approx(1199.10, abs=0.01)
+    assert float(result["total_cost"]) == pytest.approx(1199.101 * 360, abs=1)
+
+
+def test_loan_payments_zero_rate_repays_evenly():
+    result = calculators.loan_payments(12000, 0, 1)
+    assert float(result["monthly_payment"]) == 1000.0
+    assert float(result["total_interest"]) == 0.0
+
+
+def test_loan_payments_broadcasts_scenarios():
+    result = calculators.loan_payments([100000, 200000], 5, [15, 30])
+    assert result["monthly_payment"].shape == (2,)
+    single = calculators.loan_payments(200000, 5, 30)
+    assert result["monthly_payment"][1] == single["monthly_payment"]
+
+
+def test_loan_payments_stay_finite_at_model_bounds():
+    # LoanScenario / LoanScenarioGrid cap rates at 30% and terms at 40 years
+    result = calculators.loan_payments(1e9, 30, 40)
+    assert np.isfinite(result["total_cost"]).all()
+
+
+def test_amortization_schedule_repays_principal():
+    schedule = calculators.amortization_schedule(200000, 6, 30)
+    assert len(schedule["period"]) == 360
+    assert schedule["balance"][-1] == 0.0
+    assert schedule["principal"].sum() == pytest.approx(200000, abs=1)
+    assert (np.diff(schedule["balance"]) < 0).all()
+    assert schedule["payment"][0] == pytest.approx(1199.10, abs=0.01)
+
+
+def test_amortization_schedule_zero_rate():
+    schedule = calculators.amortization_schedule(12000, 0, 1)
+    assert (schedule["interest"] == 0).all()
+    assert (schedule["payment"] == 1000).all()
+    assert schedule["balance"][-1] == 0.0
+
+
+def test_amortization_extra_payments_end_the_loan_early():
+    base = calculators.amortization_schedule(200000, 6, 30)
+    extra = calculators.amortization_schedule(200000, 6, 30, extra_monthly_payment=500, extra_payment_start=13)
+    assert len(extra["period"]) < len(base["period"])
+    assert extra["payment"][11] == base["payment"][11]
+    assert extra["payment"][12] == pytest.approx(base["payment"][12] + 500)
+    assert extra["interest"].sum() < base["interest"].sum()
+    assert extra["balance"][-1] == 0.0
+    # The final payment only covers what is left
+    assert 0 < extra["payment"][-1] <= extra["payment"][-2]
+    assert extra["principal"].sum() == pytest.approx(200000, abs=1)
+
+
+def test_amortization_one_time_payment():
+    schedule = calculators.amortization_schedule(100000, 5, 15, one_time_payment=20000, one_time_payment_period=6)
+    base = calculators.amortization_schedule(100000, 5, 15)
+    assert schedule["balance"][5] == pytest.approx(base["balance"][5] - 20000, abs=0.01)
+    assert len(schedule["period"]) < len(base["period"])
+
+
+def test_amortization_lump_sum_clearing_the_balance():
+    schedule = calculators.amortization_schedule(10000, 4, 5, one_time_payment=50000, one_time_payment_period=3)
+    assert list(schedule["period"]) == [1, 2, 3]
+    assert schedule["balance"][-1] == 0.0
+    assert schedule["principal"].sum() == pytest.approx(10000, abs=0.01)
+
+
+def test_max_affordable_price_round_trips_through_loan_payments():
+    price = calculators.max_affordable_price(2000, 6.5, 30, down_payment=40000)
+    payment = calculators.loan_payments(float(price) - 40000, 6.5, 30)["monthly_payment"]
+    assert float(payment) == pytest.approx(2000, abs=0.01)
+
+
+def test_max_affordable_price_includes_tax_and_insurance():
+    price = float(calculators.max_affordable_price(2500, 6, 30, down_payment=20000,
+                                                   property_tax_rate=0.012, monthly_insurance=150))
+    principal_interest = float(calculators.loan_payments(price - 20000, 6, 30)["monthly_payment"])
+    assert principal_interest + price * 0.012 / 12 + 150 == pytest.approx(2500, abs=0.01)
+
+
+def test_max_affordable_price_never_below_down_payment():
+    prices = calculators.max_affordable_price([80, 3000], [7, 0], 30, down_payment=50000, monthly_insurance=80)
+    assert prices[0] == 50000  # budget only covers insurance
+    assert prices[1] == pytest.approx(50000 + (3000 - 80) * 360, abs=0.01)
+    # A high tax rate can't push the price under the down payment either
+    assert calculators.max_affordable_price(100, 7, 30, down_payment=50000, property_tax_rate=0.5) == 50000
@@ -0,0 +1,176 @@
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+import deadline_scheduler
+from deadline_scheduler import JOBS, JobScheduler
+import server
+from tests.fakes import FakeDb
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_as_datetime_normalizes_to_naive_utc():
+    aware = datetime(2026, 12, 1, 5, tzinfo=timezone(timedelta(hours=-5)))
+    assert deadline_scheduler.as_datetime(aware) == datetime(2026, 12, 1, 10)
+    assert deadline_scheduler.as_datetime("2026-12-01T00:00:00Z") == datetime(2026, 12, 1)
+    # A date deadline lasts through that day
+    assert deadline_scheduler.as_datetime("2026-12-01") == datetime(2026, 12, 2)
+    assert deadline_scheduler.as_datetime(date(2026, 12, 1)) == datetime(2026, 12, 2)
+    assert deadline_scheduler.as_datetime("not a date") is None
+
+
+def pending_jobs(db):
+    return sorted(job["_id"] for job in db[JOBS].docs if job["status"] == "pending")
+
+
+def test_plan_deadline_accepts_aware_deadlines():
+    db = FakeDb()
+    scheduler = JobScheduler(db)
+    deadline = datetime.now(timezone.utc) + timedelta(days=10)
+    kept = run(deadline_scheduler.plan_deadline(scheduler, "alert", "a1", "Apply", deadline))
+    assert kept == len(deadline_scheduler.REMINDER_DAYS) + 1
+    run_ats = [job["run_at"] for job in db[JOBS].docs]
+    assert all(ts.tzinfo is None for ts in run_ats)
+
+
+def test_replanning_cancels_jobs_for_the_old_deadline():
+    db = FakeDb()
+    scheduler = JobScheduler(db)
+    first = datetime.utcnow() + timedelta(days=10)
+    run(deadline_scheduler.plan_deadline(scheduler, "alert", "a1", "Apply", first))
+    run(deadline_scheduler.plan_deadline(scheduler, "alert", "a1", "Apply", first + timedelta(days=5)))
+    stamp = deadline_scheduler._stamp(first + timedelta(days=5))
+    assert pending_jobs(db) and all(key.endswith(stamp) for key in pending_jobs(db))
+    run(deadline_scheduler.plan_deadline(scheduler, "alert", "a1", "Apply", None))
+    assert pending_jobs(db) == []
+
+
+def test_past_deadline_expires_immediately_without_reminders():
+    db = FakeDb()
+    scheduler = JobScheduler(db)
+    run(deadline_scheduler.plan_deadline(scheduler, "alert", "a1", "Apply", datetime.utcnow() - timedelta(hours=1)))
+    assert [job["kind"] for job in db[JOBS].docs] == ["alert_expire"]
+
+
+def due_job(db, scheduler, kind="reminder", key="job-1"):
+    run(scheduler.schedule(key, kind, datetime.utcnow() - timedelta(seconds=1), {"n": 1}))
+    return db[JOBS].docs[0]
+
+
+def test_fire_runs_handler_once_and_marks_done():
+    db = FakeDb()
+    scheduler = JobScheduler(db)
+    calls = []
+
+    async def handler(payload):
+        calls.append(payload)
+    scheduler.register("reminder", handler)
+    job = due_job(db, scheduler)
+    run(scheduler._fire("job-1"))
+    run(scheduler._fire("job-1"))
+    assert calls == [{"n": 1}]
+    assert job["status"] == "done"
+    assert scheduler._stats["skipped"] == 1
+    # A finished job isn't rescheduled
+    run(scheduler.schedule("job-1", "reminder", datetime.utcnow(), {"n": 2}))
+    assert job["status"] == "done"
+
+
+def test_failed_job_backs_off_then_gives_up():
+    db = FakeDb()
+    scheduler = JobScheduler(db)
+
+    async def handler(payload):
+        raise RuntimeError("boom")
+    scheduler.register("reminder", handler)
+    job = due_job(db, scheduler)
+
+    run(scheduler._fire("job-1"))
+    assert job["status"] == "pending" and job["attempts"] == 1
+    assert job["run_at"] > datetime.utcnow() + timedelta(seconds=90)
+
+    for _ in range(deadline_scheduler.MAX_ATTEMPTS - 1):
+        job["run_at"] = datetime.utcnow() - timedelta(seconds=1)
+        run(scheduler._fire("job-1"))
+    assert job["status"] == "failed" and job["error"] == "boom"
+
+
+def test_cancelled_job_is_skipped():
+    db = FakeDb()
+    scheduler = JobScheduler(db)
+    scheduler.register("reminder", lambda payload: pytest.fail("cancelled job ran"))
+    run(scheduler.schedule("job-1", "reminder", datetime.utcnow() - timedelta(seconds=1), {}, source="alert:a1"))
+    run(scheduler.cancel("alert:a1"))
+    run(scheduler._fire("job-1"))
+    assert db[JOBS].docs[0]["status"] == "cancelled"
+
+
+def test_only_one_worker_holds_the_lease():
+    db = FakeDb()
+    first, second = JobScheduler(db), JobScheduler(db)
+    assert run(first._acquire_lease()) is True
+    assert run(second._acquire_lease()) is False
+    # Renewal by the holder still works
+    assert run(first._acquire_lease()) is True
+    db[deadline_scheduler.LEASES].docs[0]["expires_at"] = datetime.utcnow() - timedelta(seconds=1)
+    assert run(second._acquire_lease()) is True
+
+
+def test_moved_job_fires_at_its_new_time_only():
+    db = FakeDb()
+    scheduler = JobScheduler(db)
+    scheduler.is_leader = True
+    fired = []
+
+    async def handler(payload):
+        fired.append(payload["n"])
+    scheduler.register("reminder", handler)
+
+    async def scenario():
+        await scheduler.schedule("job-1", "reminder", datetime.utcnow() - timedelta(seconds=1), {"n": 1})
+        await scheduler.schedule("job-1", "reminder", datetime.utcnow() + timedelta(minutes=5), {"n": 2})
+        await scheduler._fire_due()
+    run(scenario())
+    assert fired == []
+    # The outdated heap entry was popped and skipped; the new one is still queued
+    assert scheduler._heap == [(scheduler._queued["job-1"], "job-1")]
+    assert scheduler._queued["job-1"] > datetime.utcnow()
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    db = FakeDb()
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "deadline_jobs", JobScheduler(db))
+    return db
+
+
+def test_create_alert_with_offset_deadline(fake_server):
+    client = TestClient(server.app)
+    response = client.post("/api/alerts", json={
+        "title": "Applications close", "message": "Apply soon", "alert_type": "deadline",
+        "deadline": (datetime.utcnow() + timedelta(days=10)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    })
+    assert response.status_code == 200, response.text
+    stored = fake_server.alerts.docs[0]
+    assert stored["deadline"].tzinfo is None
+    assert any(job["kind"] == "alert_expire" for job in fake_server[JOBS].docs)
+
+
+def test_notifications_past_expiry_are_hidden_before_the_job_runs(fake_server):
+    now = datetime.utcnow()
+    base = {"notification_type": "general", "message": "m", "is_read": False, "created_at": now}
+    fake_server.notifications.docs.extend([
+        {**base, "id": "live", "title": "live", "expires_at": now + timedelta(days=1)},
+        {**base, "id": "lapsed", "title": "lapsed", "expires_at": now - timedelta(minutes=1)},
+        {**base, "id": "flagged", "title": "flagged", "expired": True},
+        {**base, "id": "forever", "title": "forever"},
+    ])
+    response = TestClient(server.app).get("/api/notifications")
+    assert response.status_code == 200
+    assert sorted(n["id"] for n in response.json()) == ["forever", "live"]
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import document_optimizer
+import server
+import storage
+from tests.fakes import FakeDb
+
+ORG = "org-1"
+
+
+@pytest.fixture
+def fake_server(monkeypatch, tmp_path):
+    db = FakeDb()
+    db.documents.docs.append({"id": "doc-1", "name": "Pay stub", "description": "Most recent"})
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(storage, "UPLOAD_ROOT", tmp_path)
+    monkeypatch.setattr(document_optimizer, "OPTIMIZATION_ENABLED", False)
+    return db
+
+
+def upload(content, route="upload"):
+    return TestClient(server.app).post(
+        f"/api/documents/{route}/doc-1",
+        files={"file": ("stub.pdf", content, "application/pdf")},
+        headers={"X-Organization-Id": ORG}
+    )
+
+
+def usage(db):
+    return asyncio.run(storage.get_usage(db, ORG))
+
+
+def stored_files(tmp_path):
+    return [path for path in tmp_path.rglob("*") if path.is_file()]
+
+
+@pytest.mark.parametrize("route", ["upload", "replace"])
+def test_uploading_again_replaces_the_stored_file(fake_server, tmp_path, route):
+    assert upload(b"a" * 100).status_code == 200
+    response = upload(b"b" * 40, route)
+    assert response.status_code == 200, response.text
+
+    assert usage(fake_server)["bytes_used"] == 40
+    assert usage(fake_server)["file_count"] == 1
+    files = stored_files(tmp_path)
+    assert [str(path) for path in files] == [response.json()["file_path"]]
+    assert files[0].read_bytes() == b"b" * 40
+
+
+def test_reupload_also_removes_the_optimized_original(fake_server, tmp_path):
+    upload(b"a" * 100)
+    # What the optimizer leaves behind: a smaller copy plus the original
+    document = fake_server.documents.docs[0]
+    optimized = tmp_path / "optimized.pdf"
+    optimized.write_bytes(b"o" * 30)
+    document.update(original_file_path=document["file_path"], file_path=str(optimized))
+    asyncio.run(storage.record_usage(fake_server, ORG, 30, 1))
+
+    assert upload(b"c" * 10).status_code == 200
+    assert usage(fake_server)["bytes_used"] == 10
+    assert usage(fake_server)["file_count"] == 1
+    assert len(stored_files(tmp_path)) == 1
+
+
+def test_over_quota_upload_is_rejected_without_touching_the_current_file(fake_server, tmp_path, monkeypatch):
+    monkeypatch.setitem(storage.PLAN_STORAGE_QUOTAS, "professional", 150)
+    assert upload(b"a" * 100).status_code == 200
+    # Replacing the file frees its 100 bytes, so up to 150 fits
+    assert upload(b"b" * 150).status_code == 200
+    assert upload(b"c" * 151).status_code == 413
+
+    assert usage(fake_server)["bytes_used"] == 150
+    files = stored_files(tmp_path)
+    assert [str(path) for path in files] == [fake_server.documents.docs[0]["file_path"]]
+
+
+def test_save_upload_stops_once_over_the_limit(tmp_path):
+    class Source:
+        reads = 0
+
+        def read(self, size):
+            self.reads += 1
+            return b"x" * size
+
+    source = Source()
+    target = tmp_path / "big.bin"
+    assert storage.save_upload(source, target, 3 * storage.UPLOAD_CHUNK_BYTES) is None
+    assert source.reads == 4
+    assert not target.exists()
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from hyperloglog import HyperLogLog
+
+
+def ids(prefix, n):
+    return [f"{prefix}-{i}" for i in range(n)]
+
+
+@pytest.mark.parametrize("n", [0, 1, 50, 1000, 20000, 200000])
+def test_count_is_within_error_bounds(n):
+    sketch = HyperLogLog()
+    sketch.add_many(ids("visitor", n))
+    # Three standard errors, plus slack for tiny cardinalities
+    assert abs(sketch.count() - n) <= 3 * sketch.relative_error * n + 2
+
+
+def test_duplicates_do_not_change_the_estimate():
+    once, twice = HyperLogLog(), HyperLogLog()
+    once.add_many(ids("s", 5000))
+    twice.add_many(ids("s", 5000) * 2)
+    assert once == twice
+
+
+def test_merge_equals_sketch_of_union():
+    monday, tuesday, both = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    monday.add_many(ids("v", 3000))
+    tuesday.add_many(ids("v", 3000)[1500:] + ids("w", 1500))
+    both.add_many(ids("v", 3000) + ids("w", 1500))
+    assert monday.merge(tuesday) == both
+    assert abs(both.count() - 4500) <= 3 * both.relative_error * 4500
+
+
+def test_merge_rejects_different_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(precision=10).merge(HyperLogLog(precision=12))
+
+
+def test_bytes_round_trip():
+    sketch = HyperLogLog(precision=10)
+    sketch.add_many(ids("x", 777))
+    restored = HyperLogLog.from_bytes(sketch.to_bytes(), precision=10)
+    assert restored == sketch and restored.count() == sketch.count()
+    # Registers must stay writable after loading
+    restored.add("another")
+
+
+def test_hash_is_stable_across_processes():
+    # blake2b, not the salted builtin hash(); stored sketches depend on this
+    assert HyperLogLog._hash("visitor-1") == HyperLogLog._hash("visitor-1")
+    sketch = HyperLogLog(precision=4)
+    sketch.add("visitor-1")
+    assert np.count_nonzero(sketch.registers) == 1
+
+
+def test_precision_bounds():
+    with pytest.raises(ValueError):
+        HyperLogLog(precision=3)
+    with pytest.raises(ValueError):
+        HyperLogLog(precision=17)
@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import live_channel
+from live_channel import LiveChannelError, LiveHub
+import server
+from tests.fakes import FakeDb
+
+
+def claims(apps=(), sub="visitor-1"):
+    token = live_channel.issue_token(sub, "org-1", list(apps))["token"]
+    return live_channel.verify_token(token)
+
+
+def test_token_round_trip_and_rejection():
+    assert claims(["a1"])["apps"] == ["a1"]
+    with pytest.raises(LiveChannelError):
+        live_channel.verify_token(None)
+    with pytest.raises(LiveChannelError):
+        live_channel.verify_token("not-a-token")
+
+
+def test_subscriptions_are_limited_by_the_token():
+    hub = LiveHub()
+    connection = hub.connect(claims(["a1"]))
+    allowed, denied = hub.subscribe(connection, ["alerts", "notifications", "applications:a1", "applications:a2", "other"])
+    assert allowed == ["alerts", "notifications", "applications:a1"]
+    assert denied == ["applications:a2", "other"]
+
+
+def test_anonymous_token_only_sees_broadcasts():
+    hub = LiveHub()
+    connection = hub.connect(claims(sub=None))
+    hub.subscribe(connection, ["notifications"])
+    assert connection.topics["notifications"] == ["notifications:*"]
+    assert connection.user_id is None
+
+
+def test_publish_reaches_only_subscribers_with_client_topic_names():
+    hub = LiveHub()
+    mine, other = hub.connect(claims(["a1"])), hub.connect(claims(sub="visitor-2"))
+    hub.subscribe(mine, ["alerts", "notifications", "applications:a1"])
+    hub.subscribe(other, ["notifications"])
+    hub.publish("alerts:org-1", "created", {"id": "x"})
+    hub.publish("notifications:visitor-1", "notification", {})
+    hub.publish("notifications:*", "notification", {})
+    hub.publish("applications:a1", "updated", {"id": "a1"})
+    topics = [mine.queue.get_nowait()["topic"] for _ in range(mine.queue.qsize())]
+    assert topics == ["alerts", "notifications", "notifications", "applications:a1"]
+    assert other.queue.qsize() == 1
+
+
+def test_overflow_collapses_backlog_into_one_resync_per_topic():
+    hub = LiveHub()
+    connection = hub.connect(claims(["a1"]))
+    hub.subscribe(connection, ["alerts", "applications:a1"])
+    for i in range(live_channel.QUEUE_SIZE - 1):
+        hub.publish("alerts:org-1", "created", {"id": i})
+    hub.publish("applications:a1", "updated", {})
+    hub.publish("alerts:org-1", "created", {"id": "overflow"})
+
+    messages = [connection.queue.get_nowait() for _ in range(connection.queue.qsize())]
+    assert messages == [
+        {"topic": "alerts", "event": "resync", "data": {}},
+        {"topic": "applications:a1", "event": "resync", "data": {}},
+    ]
+    assert connection.dropped == live_channel.QUEUE_SIZE
+    assert hub.metrics()["resyncs"] == 1
+    # Once drained, messages queue normally again
+    hub.publish("alerts:org-1", "created", {"id": "next"})
+    assert connection.queue.get_nowait()["data"] == {"id": "next"}
+
+
+def test_connection_limit_and_disconnect_cleanup():
+    hub = LiveHub(max_connections=1)
+    connection = hub.connect(claims())
+    hub.subscribe(connection, ["alerts"])
+    with pytest.raises(LiveChannelError):
+        hub.connect(claims())
+    hub.disconnect(connection)
+    assert hub.metrics()["connections"] == 0 and hub.metrics()["topics"] == 0
+    hub.connect(claims())
+
+
+def test_unread_count_follows_batches_with_notification_changes():
+    hub = LiveHub()
+    connection = hub.connect(claims())
+
+    async def unread_count(user_id):
+        return 7
+    batch = [{"topic": "notifications", "event": "notification", "data": {}}]
+    result = asyncio.run(live_channel.with_unread_counts(connection, batch, unread_count))
+    assert result[-1] == {"topic": "notifications", "event": "unread_count", "data": {"unread_count": 7}}
+    counts_only = [{"topic": "notifications", "event": "unread_count", "data": {"unread_count": 1}}]
+    assert asyncio.run(live_channel.with_unread_counts(connection, list(counts_only), unread_count)) == counts_only
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeDb()
+    monkeypatch.setattr(server, "db", db)
+    return db
+
+
+def test_token_endpoint_caps_applications_instead_of_failing(fake_db):
+    fake_db.applications.docs.extend({"id": f"app-{i}"} for i in range(60))
+    requested = [f"app-{i}" for i in range(60)] + ["missing"]
+    response = TestClient(server.app).post("/api/live/token", json={"user_id": "visitor-1", "application_ids": requested})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["application_ids"] == requested[:live_channel.MAX_APPLICATIONS]
+    assert body["ignored_application_ids"] == requested[live_channel.MAX_APPLICATIONS:]
+    assert live_channel.verify_token(body["token"])["apps"] == body["application_ids"]
+
+
+def test_token_endpoint_accepts_missing_user(fake_db):
+    response = TestClient(server.app).post("/api/live/token", json={"user_id": None, "application_ids": ["nope"]})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["unknown_application_ids"] == ["nope"]
+    assert "sub" not in live_channel.verify_token(body["token"])
@@ -0,0 +1,44 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    documents = []
+    monkeypatch.setattr(server, "record_calculation", lambda collection, document: documents.append((collection, document)))
+    return documents
+
+
+@pytest.fixture
+def client():
+    return TestClient(server.app)
+
+
+@pytest.mark.parametrize("grid", [
+    {"loan_amounts": [200000], "interest_rates": [6], "loan_term_years": [10 ** 6]},
+    {"loan_amounts": [200000], "interest_rates": [10 ** 6], "loan_term_years": [30]},
+    {"loan_amounts": [-1], "interest_rates": [6], "loan_term_years": [30]},
+    {"loan_amounts": [200000], "interest_rates": [6], "loan_term_years": [0]},
+])
+def test_grid_values_out_of_bounds_are_rejected(client, recorded, grid):
+    response = client.post("/api/calculate/loan/batch", json={"grid": grid})
+    assert response.status_code == 422
+    assert recorded == []
+
+
+def test_grid_prices_every_combination_and_counts_as_one_calculation(client, recorded):
+    response = client.post("/api/calculate/loan/batch", json={
+        "grid": {"loan_amounts": [200000], "interest_rates": [6], "loan_term_years": [15, 20, 25, 30]}
+    })
+    assert response.status_code == 200
+    assert response.json()["count"] == 4
+    documents = [document for _, document in recorded]
+    assert len({d["batch_id"] for d in documents}) == 1
+    # The dashboard counts documents with batch_index missing or 0
+    assert [d["batch_index"] for d in documents] == [0, 1, 2, 3]
+
+
+def test_empty_batch_is_rejected(client, recorded):
+    assert client.post("/api/calculate/loan/batch", json={}).status_code == 400
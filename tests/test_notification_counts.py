@@ -0,0 +1,145 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import notification_counts as counts
+import notification_receipts as receipts
+from tests.fakes import FakeDb
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    counts.count_cache.invalidate()
+    yield
+    counts.count_cache.invalidate()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def notify(db, notification_id, user_id=None, **fields):
+    # What server.insert_notification stores
+    notification = counts.prepare({"id": notification_id, "user_id": user_id, "is_read": False, **fields})
+    if user_id is None:
+        notification["seq"] = await receipts.next_sequence(db)
+    await db.notifications.insert_one(notification)
+    await counts.created(db, notification)
+    return notification
+
+
+async def stored_counter(db, key):
+    return await counts._read(db, key)
+
+
+def test_personal_notifications_count_until_read():
+    async def scenario():
+        db = FakeDb()
+        await notify(db, "p1", "ada")
+        await notify(db, "p2", "ada")
+        await notify(db, "p3", "ben")
+        assert await counts.unread_count(db, "ada") == 2
+
+        first = await counts.mark_read(db, "p1", "ada")
+        assert first["changed"] is True
+        again = await counts.mark_read(db, "p1", "ada")
+        assert again["changed"] is False
+        assert await counts.unread_count(db, "ada") == 1
+        assert await counts.unread_count(db, "ben") == 1
+        assert await counts.mark_read(db, "missing", "ada") is None
+
+    run(scenario())
+
+
+def test_concurrent_reads_of_one_notification_decrement_once():
+    async def scenario():
+        db = FakeDb()
+        await notify(db, "p1", "ada")
+        results = await asyncio.gather(*(counts.mark_read(db, "p1", "ada") for _ in range(5)))
+        assert [r["changed"] for r in results].count(True) == 1
+        assert await stored_counter(db, "ada") == 0
+
+    run(scenario())
+
+
+def test_broadcasts_count_per_reader():
+    async def scenario():
+        db = FakeDb()
+        await notify(db, "b1")
+        await notify(db, "b2")
+        assert await counts.unread_count(db, "ada") == 2
+
+        await counts.mark_read(db, "b1", "ada")
+        assert await counts.unread_count(db, "ada") == 1
+        assert await counts.unread_count(db, "ben") == 2
+        # Without a reader there are no receipts
+        assert await counts.unread_count(db, None) == 2
+        with pytest.raises(ValueError):
+            await counts.mark_read(db, "b1", None)
+
+    run(scenario())
+
+
+def test_mark_all_read_then_new_notifications_count_again():
+    async def scenario():
+        db = FakeDb()
+        await notify(db, "p1", "ada")
+        await notify(db, "b1")
+        assert await counts.unread_count(db, "ada") == 2
+
+        assert await counts.mark_all_read(db, "ada") is True
+        assert await counts.unread_count(db, "ada") == 0
+        assert await counts.mark_all_read(db, "ada") is False
+
+        await notify(db, "b2")
+        await notify(db, "p2", "ada")
+        assert await counts.unread_count(db, "ada") == 2
+        assert await counts.unread_count(db, "ben") == 2
+
+    run(scenario())
+
+
+def test_expired_notifications_stop_counting_once():
+    async def scenario():
+        db = FakeDb()
+        soon = datetime.utcnow() + timedelta(hours=1)
+        await notify(db, "p1", "ada", expires_at=soon)
+        await notify(db, "b1", expires_at=soon)
+        await notify(db, "gone", "ada", expires_at=datetime.utcnow() - timedelta(minutes=1))
+        assert await counts.unread_count(db, "ada") == 2
+
+        # Not due yet
+        assert await counts.expire(db, "p1") is False
+        past = datetime.utcnow() - timedelta(seconds=1)
+        await db.notifications.update_many({}, {"$set": {"expires_at": past}})
+        assert await counts.expire(db, "p1") is True
+        assert await counts.expire(db, "p1") is False
+        assert await counts.expire(db, "b1") is True
+        assert await counts.unread_count(db, "ada") == 0
+        assert await stored_counter(db, counts.BROADCAST) == 0
+
+    run(scenario())
+
+
+def test_sync_and_delete_follow_the_counted_flag():
+    async def scenario():
+        db = FakeDb()
+        await notify(db, "p1", "ada")
+        await notify(db, "p2", "ada", is_read=True)
+        assert await stored_counter(db, "ada") == 1
+
+        # An admin edit marks p1 read and p2 unread
+        await db.notifications.update_one({"id": "p1"}, {"$set": {"is_read": True}})
+        await db.notifications.update_one({"id": "p2"}, {"$set": {"is_read": False}})
+        await counts.sync(db, "p1")
+        await counts.sync(db, "p2")
+        await counts.sync(db, "p2")
+        assert await stored_counter(db, "ada") == 1
+
+        await counts.deleted(db, await db.notifications.find_one_and_delete({"id": "p1"}))
+        assert await stored_counter(db, "ada") == 1
+        await counts.deleted(db, await db.notifications.find_one_and_delete({"id": "p2"}))
+        assert await stored_counter(db, "ada") == 0
+
+    run(scenario())
@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import pytest
+
+import notification_events as events
+from notification_events import NotificationBroker
+
+
+def publish_all(broker, *targets):
+    for n, target in enumerate(targets):
+        broker.publish(target, "notification", {"n": n})
+    return [entry[0] for entry in broker._recent]
+
+
+def test_replays_events_after_last_event_id_for_that_user():
+    broker = NotificationBroker()
+    ids = publish_all(broker, None, "ada", "ben", None)
+    _, replayed = broker.subscribe("ada", ids[0])
+    assert [entry[0] for entry in replayed] == [ids[1], ids[3]]
+    _, up_to_date = broker.subscribe("ada", ids[3])
+    assert up_to_date == []
+
+
+@pytest.mark.parametrize("last_event_id", [None, "", "otherworker-3", "garbage"])
+def test_unrecoverable_ids_mean_resync(last_event_id):
+    broker = NotificationBroker()
+    publish_all(broker, None, None)
+    assert broker.subscribe("ada", last_event_id)[1] is None
+
+
+def test_ids_older_than_the_buffer_mean_resync(monkeypatch):
+    monkeypatch.setattr(events, "REPLAY_BUFFER", 3)
+    broker = NotificationBroker()
+    ids = publish_all(broker, None, None, None)
+    publish_all(broker, None, None)
+    # ids[0]'s successor has been evicted
+    assert broker.subscribe("ada", ids[0])[1] is None
+    assert len(broker.subscribe("ada", ids[2])[1]) == 2
+
+
+def test_stalled_subscriber_is_cut_off(monkeypatch):
+    monkeypatch.setattr(events, "SUBSCRIBER_QUEUE", 2)
+
+    async def scenario():
+        broker = NotificationBroker()
+        subscriber, _ = broker.subscribe("ada")
+        publish_all(broker, None, "ada", None, "ben")
+        return subscriber, broker.metrics()
+
+    subscriber, metrics = asyncio.run(scenario())
+    assert subscriber.overflowed
+    assert subscriber.queue.qsize() == 2
+    assert metrics["overflowed"] == 1 and metrics["delivered"] == 2
+
+
+def test_connection_limit():
+    broker = NotificationBroker(max_connections=1)
+    subscriber, _ = broker.subscribe("ada")
+    with pytest.raises(events.StreamLimitReached):
+        broker.subscribe("ben")
+    broker.unsubscribe(subscriber)
+    broker.subscribe("ben")
+    assert broker.metrics()["rejected"] == 1
+
+
+def parse(chunk):
+    fields = dict(line.split(": ", 1) for line in chunk.strip().splitlines())
+    return fields.get("id"), fields["event"], json.loads(fields["data"])
+
+
+def test_stream_replays_then_reports_the_count_and_live_events():
+    async def scenario():
+        broker = NotificationBroker()
+        ids = publish_all(broker, None, "ada")
+        subscriber, replayed = broker.subscribe("ada", ids[0])
+        unread = iter([4, 5])
+
+        async def unread_count(user_id):
+            return next(unread)
+
+        async def is_disconnected():
+            return False
+
+        body = events.stream(broker, subscriber, replayed, unread_count, is_disconnected)
+        chunks = [await body.__anext__() for _ in range(3)]
+        broker.publish("ada", "notification_read", {"id": "x"})
+        chunks += [await body.__anext__() for _ in range(2)]
+        await body.aclose()
+        return ids, chunks, broker.metrics()
+
+    ids, chunks, metrics = asyncio.run(scenario())
+    assert chunks[0] == f"retry: {events.RECONNECT_MS}\n\n"
+    assert parse(chunks[1]) == (ids[1], "notification", {"n": 1})
+    assert parse(chunks[2]) == (None, "unread_count", {"unread_count": 4, "resync": False})
+    assert parse(chunks[3])[1:] == ("notification_read", {"id": "x"})
+    assert parse(chunks[4]) == (None, "unread_count", {"unread_count": 5})
+    # Closing the stream unsubscribes it
+    assert metrics["connections"] == 0
@@ -0,0 +1,106 @@
+import asyncio
+
+import notification_receipts as receipts
+from tests.fakes import FakeDb
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def broadcast(db, counted=True):
+    seq = await receipts.next_sequence(db)
+    await db.notifications.insert_one({"id": f"n-{seq}", "user_id": None, "counted": counted, "seq": seq})
+    return seq
+
+
+async def unread_seqs(db, user_id):
+    state = await receipts.read_state(db, user_id)
+    cursor = db.notifications.find(receipts.unread_filter(state)).sort("seq", 1)
+    return [n["seq"] for n in await cursor.to_list()]
+
+
+def test_reading_a_broadcast_only_changes_that_readers_state():
+    async def scenario():
+        db = FakeDb()
+        first, second = await broadcast(db), await broadcast(db)
+        assert await receipts.mark_read(db, "ada", second) is True
+        assert await receipts.mark_read(db, "ada", second) is False
+        assert await unread_seqs(db, "ada") == [first]
+        assert await unread_seqs(db, "ben") == [first, second]
+        assert await receipts.unread_broadcasts(db, "ben") == 2
+        assert await db[receipts.COLLECTION].find_one({"_id": "ben"}) is None
+
+    run(scenario())
+
+
+def test_mark_all_read_leaves_later_broadcasts_unread():
+    async def scenario():
+        db = FakeDb()
+        await broadcast(db)
+        read_one = await broadcast(db)
+        await receipts.mark_read(db, "ada", read_one)
+
+        assert await receipts.mark_all_read(db, "ada") is True
+        assert await receipts.mark_all_read(db, "ada") is False
+        state = await receipts.read_state(db, "ada")
+        assert state["watermark"] == read_one and state["read"] == []
+        assert await receipts.unread_broadcasts(db, "ada") == 0
+
+        latest = await broadcast(db)
+        assert await unread_seqs(db, "ada") == [latest]
+        # Never-seen readers get a state document from mark-all-read alone
+        assert await receipts.mark_all_read(db, "ben") is True
+        assert (await receipts.read_state(db, "ben"))["watermark"] == latest
+
+    run(scenario())
+
+
+def test_read_exceptions_fold_into_the_watermark():
+    async def scenario():
+        db = FakeDb()
+        first, second, third = await broadcast(db), await broadcast(db), await broadcast(db)
+        await receipts.mark_read(db, "ada", second)
+        await receipts.mark_read(db, "ada", third)
+        state = await receipts.read_state(db, "ada")
+        # `first` is still unread, so the reads above it stay exceptions
+        assert state["watermark"] == 0 and sorted(state["read"]) == [second, third]
+
+        await receipts.mark_read(db, "ada", first)
+        state = await receipts.read_state(db, "ada")
+        assert state["watermark"] == third and state["read"] == []
+        assert receipts.is_read(state, second)
+        assert not receipts.is_read(state, await broadcast(db))
+
+    run(scenario())
+
+
+def test_compaction_skips_broadcasts_that_are_no_longer_active():
+    async def scenario():
+        db = FakeDb()
+        expired = await broadcast(db, counted=False)
+        read = await broadcast(db)
+        unread = await broadcast(db)
+        await receipts.mark_read(db, "ada", read)
+        state = await receipts.read_state(db, "ada")
+        assert state["watermark"] == read and state["read"] == []
+        assert receipts.is_read(state, expired)
+        assert await unread_seqs(db, "ada") == [unread]
+
+    run(scenario())
+
+
+def test_assign_missing_sequences_numbers_old_broadcasts_in_order():
+    async def scenario():
+        db = FakeDb()
+        await db.notifications.insert_many([
+            {"id": "b", "user_id": None, "created_at": 2},
+            {"id": "a", "user_id": None, "created_at": 1},
+            {"id": "personal", "user_id": "ada", "created_at": 0},
+        ])
+        assert await receipts.assign_missing_sequences(db) == 2
+        seqs = {n["id"]: n.get("seq") for n in db.notifications.docs}
+        assert seqs == {"a": 1, "b": 2, "personal": None}
+        assert await receipts.current_sequence(db) == 2
+
+    run(scenario())
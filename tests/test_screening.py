@@ -0,0 +1,114 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import screening
+import server
+from tests.fakes import FakeDb
+
+CSV = b"""name,household_size,annual_income,monthly_utility_cost
+Ada,1,30000,120
+Ben,4,52000,90
+Cy,3,95000,150
+Dee,8,41000,400
+Eve,11,41000,400
+Fay,2,0,80
+Gus,0,20000,50
+Hal,two,20000,50
+Ivy,2,n/a,50
+"""
+
+NDJSON = b"\n".join(json.dumps(row).encode() for row in [
+    {"id": 1, "household_size": 2, "monthly_income": 1500, "monthly_utility_cost": 200},
+    {"id": 2, "household_size": 5, "monthly_income": 2800, "monthly_utility_cost": 170},
+    {"id": 3, "household_size": 9, "monthly_income": 3100, "monthly_utility_cost": 60},
+    {"id": 4, "household_size": 1, "monthly_income": 9000, "monthly_utility_cost": 300},
+    {"id": 5, "household_size": 3, "monthly_income": 0, "monthly_utility_cost": 100},
+    {"id": 6, "household_size": 2.5, "monthly_income": 1000, "monthly_utility_cost": 100},
+])
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, "db", FakeDb())
+    return TestClient(server.app)
+
+
+def bulk(client, content, filename):
+    response = client.post("/api/calculate/screening/bulk", files={"file": (filename, content)})
+    assert response.status_code == 200, response.text
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def single_qualification(client, size, annual_income):
+    response = client.post("/api/calculate/income-qualification",
+                           params={"household_size": size, "annual_income": annual_income})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def single_utility(client, size, monthly_income, cost):
+    return client.post("/api/calculate/utility-assistance", params={
+        "household_size": size, "monthly_income": monthly_income,
+        "utility_type": "combined", "monthly_utility_cost": cost
+    })
+
+
+def assert_matches_single_endpoints(client, row):
+    qualification = single_qualification(client, row["household_size"], row["annual_income"])
+    for key in ("area_median_income", "max_income_limit", "qualification_percentage", "qualifies"):
+        assert row[key] == pytest.approx(qualification[key]), key
+
+    utility = single_utility(client, row["household_size"], row["monthly_income"], row["monthly_utility_cost"])
+    assert utility.status_code == 200, utility.text
+    assert row["assistance_percentage"] == utility.json()["assistance_percentage"]
+    assert row["assistance_amount"] == pytest.approx(utility.json()["assistance_amount"])
+
+
+def test_csv_rows_match_the_single_household_calculators(client):
+    response = client.post("/api/calculate/screening/bulk", params={"format": "ndjson"},
+                           files={"file": ("intake.csv", CSV)})
+    assert response.status_code == 200, response.text
+    rows = {row["name"]: row for row in map(json.loads, response.text.splitlines())}
+
+    for name in ("Ada", "Ben", "Cy", "Dee", "Eve"):
+        assert rows[name]["error"] is None
+        assert_matches_single_endpoints(client, rows[name])
+    # Households over 8 use the 8-person limits, like the single calculators
+    assert rows["Eve"]["max_income_limit"] == rows["Dee"]["max_income_limit"]
+
+    for name, error in (("Gus", "invalid household_size"), ("Hal", "invalid household_size"), ("Ivy", "invalid income")):
+        assert rows[name]["error"] == error
+        assert rows[name]["qualifies"] is None and rows[name]["assistance_amount"] is None
+
+    summary = json.loads(response.headers["X-Screening-Summary"])
+    assert summary["households"] == 9 and summary["invalid_rows"] == 3
+
+
+def test_ndjson_rows_match_the_single_household_calculators(client):
+    rows = {row["id"]: row for row in bulk(client, NDJSON, "intake.ndjson")}
+    for household_id in (1, 2, 3, 4):
+        assert rows[household_id]["error"] is None
+        assert_matches_single_endpoints(client, rows[household_id])
+    assert rows[6]["error"] == "invalid household_size"
+
+
+def test_zero_income_qualifies_but_gets_no_utility_estimate(client):
+    response = client.post("/api/calculate/screening/bulk", params={"format": "ndjson"},
+                           files={"file": ("intake.csv", CSV)})
+    fay = next(row for row in map(json.loads, response.text.splitlines()) if row["name"] == "Fay")
+    assert fay["error"] is None
+    assert fay["qualifies"] == single_qualification(client, 2, 0)["qualifies"] is True
+    # Burden is undefined at zero income; the single calculator can't price it either
+    assert fay["utility_burden"] is None and fay["assistance_amount"] is None
+    assert single_utility(client, 2, 0, 80).status_code == 400
+
+
+def test_oversized_upload_is_rejected_before_parsing(client, monkeypatch):
+    monkeypatch.setattr(screening, "MAX_UPLOAD_BYTES", len(CSV) - 1)
+    parsed = []
+    monkeypatch.setattr(screening, "parse_households", lambda *args: parsed.append(args))
+    response = client.post("/api/calculate/screening/bulk", files={"file": ("intake.csv", CSV)})
+    assert response.status_code == 413
+    assert parsed == []
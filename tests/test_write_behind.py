@@ -0,0 +1,160 @@
+import asyncio
+
+import pytest
+
+from write_behind import WriteBehindBuffer
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class Sink:
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+
+    async def __call__(self, records):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database unavailable")
+        self.batches.append(list(records))
+
+    @property
+    def records(self):
+        return [record for batch in self.batches for record in batch]
+
+
+def test_rejects_unknown_overflow_policy():
+    with pytest.raises(ValueError):
+        WriteBehindBuffer("events", Sink(), overflow="block")
+
+
+def test_drop_oldest_keeps_the_newest_records():
+    sink = Sink()
+    buffer = WriteBehindBuffer("events", sink, max_queue=3, batch_size=10)
+    assert buffer.submit_many(range(5)) == 5
+    run(buffer.stop())
+    assert sink.records == [2, 3, 4]
+    assert buffer.metrics()["dropped"] == 2
+
+
+def test_drop_newest_rejects_incoming_records():
+    sink = Sink()
+    buffer = WriteBehindBuffer("events", sink, max_queue=3, batch_size=10, overflow="drop_newest")
+    assert buffer.submit_many(range(5)) == 3
+    assert buffer.submit(5) is False
+    run(buffer.stop())
+    assert sink.records == [0, 1, 2]
+
+
+def test_flushes_in_batches():
+    sink = Sink()
+    buffer = WriteBehindBuffer("events", sink, batch_size=2)
+    buffer.submit_many(range(5))
+    run(buffer.stop())
+    assert sink.batches == [[0, 1], [2, 3], [4]]
+    assert buffer.metrics()["written"] == 5
+
+
+def test_failed_flush_requeues_the_batch_in_order():
+    sink = Sink(failures=1)
+    buffer = WriteBehindBuffer("events", sink, batch_size=2)
+    buffer.submit_many(range(3))
+
+    assert run(buffer._flush_once()) is False
+    assert [record for _, record in buffer._queue] == [0, 1, 2]
+    assert run(buffer._flush_once()) is True
+    assert sink.batches == [[0, 1]]
+    assert buffer.metrics()["flush_errors"] == 1
+
+
+def test_failed_flush_requeue_respects_the_bound():
+    buffer = None
+
+    async def refill_then_fail(records):
+        # A record arriving during the failed write takes a freed slot
+        buffer.submit(3)
+        raise RuntimeError("database unavailable")
+
+    buffer = WriteBehindBuffer("events", refill_then_fail, max_queue=3, batch_size=2)
+    buffer.submit_many(range(3))
+
+    assert run(buffer._flush_once()) is False
+    # Only the newer record of the failed batch fits back in
+    assert [record for _, record in buffer._queue] == [1, 2, 3]
+    assert buffer.metrics()["dropped"] == 1
+
+
+def crash(buffer):
+    # A dead process: its spool files stay on disk and its locks go away
+    for handle in buffer._spool._files.values():
+        handle.close()
+
+
+def test_spool_replays_unflushed_records_after_a_crash(tmp_path):
+    crashed = WriteBehindBuffer("results", Sink(), spool_dir=str(tmp_path), spool_segment_records=2)
+    crashed.submit_many([{"n": i} for i in range(5)])
+    assert crashed.metrics()["spool_backlog"] == 5
+    crash(crashed)
+
+    sink = Sink()
+    restarted = WriteBehindBuffer("results", sink, spool_dir=str(tmp_path))
+
+    async def restart():
+        await restarted.start()
+        restarted.submit({"n": 5})
+        await restarted.stop()
+
+    run(restart())
+    # Recovered records go ahead of new ones
+    assert sink.records == [{"n": i} for i in range(6)]
+    assert restarted.metrics()["recovered"] == 5
+    assert list(tmp_path.glob("*.jsonl")) == []
+
+
+def test_spool_segments_are_removed_once_flushed(tmp_path):
+    buffer = WriteBehindBuffer("results", Sink(), batch_size=2, spool_dir=str(tmp_path), spool_segment_records=2)
+    buffer.submit_many([{"n": i} for i in range(3)])
+    assert len(list(tmp_path.glob("*.jsonl"))) == 2
+    run(buffer._flush_once())
+    assert len(list(tmp_path.glob("*.jsonl"))) == 1
+    assert buffer.metrics()["spool_backlog"] == 1
+    run(buffer.stop())
+    assert list(tmp_path.glob("*.jsonl")) == []
+
+
+def test_dropped_records_leave_the_spool(tmp_path):
+    # Segments are released whole, so one record per segment shows each drop
+    buffer = WriteBehindBuffer("results", Sink(), max_queue=2, spool_dir=str(tmp_path), spool_segment_records=1)
+    buffer.submit_many([{"n": i} for i in range(4)])
+    assert buffer.metrics()["spool_backlog"] == 2
+    crash(buffer)
+
+    restarted = WriteBehindBuffer("results", Sink(), spool_dir=str(tmp_path))
+    assert [record for _, record in restarted._spool.recover()] == [{"n": 2}, {"n": 3}]
+
+
+def test_failed_shutdown_drain_keeps_records_for_the_next_start(tmp_path):
+    buffer = WriteBehindBuffer("results", Sink(failures=1), spool_dir=str(tmp_path))
+    buffer.submit_many([{"n": 0}, {"n": 1}])
+    run(buffer.stop())
+    assert buffer.metrics()["dropped"] == 0
+
+    sink = Sink()
+    restarted = WriteBehindBuffer("results", sink, spool_dir=str(tmp_path))
+
+    async def restart():
+        await restarted.start()
+        await restarted.stop()
+
+    run(restart())
+    assert sink.records == [{"n": 0}, {"n": 1}]
+
+
+def test_live_owner_segments_are_not_recovered(tmp_path):
+    owner = WriteBehindBuffer("results", Sink(), spool_dir=str(tmp_path))
+    owner.submit({"n": 0})
+    other = WriteBehindBuffer("results", Sink(), spool_dir=str(tmp_path))
+    assert other._spool.recover() == []
+    crash(owner)